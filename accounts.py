@@ -0,0 +1,102 @@
+"""
+accounts.py - Instagram accounts the poster publishes to, and which products go to which account
+
+accounts.json lists the accounts; products are routed by category, and
+accounts without categories take whatever no other account claims:
+    [
+      {"name": "gadgets", "account_id": "1784...", "access_token_env": "GADGETS_TOKEN",
+       "categories": ["Electronics"], "posts_per_hour": 10},
+      {"name": "pandaloon", "account_id": "1784...", "access_token": "EAA...", "channel": "instagram"}
+    ]
+"channel" is the ASIN index channel holding the account's posting history
+(default "instagram:<name>"); "instagram" keeps the single-account history.
+Products are routed by the site section they are listed in, so a missing or
+unknown category counts as the site's default one.
+"""
+
+import json
+import os
+import re
+
+from asin_index import INSTAGRAM
+
+ACCOUNTS_FILE = "accounts.json"
+
+
+class Account:
+    """Credentials, quota and history channel of one Instagram account"""
+
+    def __init__(self, name, account_id, access_token, categories=None, posts_per_hour=None, channel=None):
+        self.name = name
+        self.account_id = account_id
+        self.access_token = access_token
+        self.categories = set(categories) if categories else None  # None: catch-all
+        self.posts_per_hour = posts_per_hour  # None: the poster's default budget
+        self.channel = channel or f"{INSTAGRAM}:{name}"
+
+    @property
+    def queue_table(self):
+        """Posting queue table; the legacy single-account history keeps the original table"""
+        return "post_jobs" if self.channel == INSTAGRAM else f"post_jobs_{re.sub(r'[^A-Za-z0-9]', '_', self.name)}"
+
+    @classmethod
+    def from_config(cls, entry):
+        token = entry.get('access_token') or os.environ.get(entry.get('access_token_env', ''), '')
+        if not entry.get('name') or not entry.get('account_id') or not token:
+            raise ValueError(f"Account entry needs name, account_id and access_token(_env): {entry.get('name')!r}")
+        return cls(entry['name'], entry['account_id'], token, entry.get('categories'),
+                   entry.get('posts_per_hour'), entry.get('channel'))
+
+
+def load_accounts(path=ACCOUNTS_FILE):
+    """Accounts configured in path, or [] when the file does not exist"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        accounts = [Account.from_config(entry) for entry in json.load(f)]
+    names = [account.name for account in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate account names in {path}")
+    # Names like 'a-b' and 'a_b' would share a posting queue
+    tables = [account.queue_table for account in accounts]
+    shared = sorted({table for table in tables if tables.count(table) > 1})
+    if shared:
+        raise ValueError(f"Accounts in {path} share a posting queue ({', '.join(shared)}): rename them")
+    return accounts
+
+
+class AccountRouter:
+    """Routes products to accounts by category.
+
+    With the site's categories, a product's category is normalized the way
+    the site does it (unknown ones go to default_category) before routing.
+    """
+
+    def __init__(self, accounts, categories=None, default_category=None):
+        self.accounts = list(accounts)
+        self.categories = categories
+        self.default_category = default_category
+        self.catch_all = [account for account in self.accounts if account.categories is None]
+
+    def category(self, product):
+        category = product.get('category') or self.default_category
+        if self.categories is not None and category not in self.categories:
+            category = self.default_category
+        return category
+
+    def accounts_for(self, product):
+        """Accounts a product should be posted to"""
+        category = self.category(product)
+        claimed = [account for account in self.accounts if account.categories and category in account.categories]
+        return claimed or self.catch_all
+
+    def accepts(self, account):
+        """Predicate for the products routed to one account"""
+        return lambda product: account in self.accounts_for(product)
+
+    def unclaimed(self):
+        """Site categories no account posts (products listed there are never posted)"""
+        if self.catch_all or self.categories is None:
+            return []
+        claimed = set().union(*(account.categories for account in self.accounts))
+        return [category for category in self.categories if category not in claimed]
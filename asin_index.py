@@ -0,0 +1,109 @@
+"""
+asin_index.py - Shared on-disk ASIN index used for deduplication by the site and the poster
+"""
+
+import sqlite3
+from datetime import datetime
+
+from product_store import BUSY_TIMEOUT_SECONDS, STORE_FILE
+
+# Channels an ASIN can be recorded in
+SITE = "site"
+INSTAGRAM = "instagram"
+RETIRED = "retired"  # Evicted from the site by retention, kept so the feed does not re-add them
+
+
+class AsinIndex:
+    def __init__(self, db_file=STORE_FILE):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the index table if it does not exist yet"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS asin_index (
+                    asin TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    ref TEXT,
+                    first_seen TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (asin, channel)
+                ) WITHOUT ROWID""")
+
+    def contains(self, asin, channel):
+        """Whether the ASIN is recorded in the channel"""
+        row = self.conn.execute(
+            "SELECT 1 FROM asin_index WHERE asin = ? AND channel = ?", (asin, channel)).fetchone()
+        return row is not None
+
+    def get_ref(self, asin, channel):
+        """Reference stored with the ASIN (e.g. an Instagram post ID), or None"""
+        row = self.conn.execute(
+            "SELECT ref FROM asin_index WHERE asin = ? AND channel = ?", (asin, channel)).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, asin, channel, ref=None):
+        """Record an ASIN in a channel, committed immediately"""
+        self.upsert_many([asin], channel, ref)
+
+    def upsert_many(self, asins, channel, ref=None):
+        """Record several ASINs in one transaction"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO asin_index (asin, channel, ref, first_seen, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(asin, channel) DO UPDATE SET
+                    ref = COALESCE(excluded.ref, asin_index.ref),
+                    updated_at = excluded.updated_at""",
+                [(asin, channel, ref, now, now) for asin in asins])
+
+    def remove(self, asin, channel):
+        """Forget an ASIN in a channel"""
+        self.remove_many([asin], channel)
+
+    def remove_many(self, asins, channel):
+        """Forget several ASINs in one transaction"""
+        with self.conn:
+            self.conn.executemany("DELETE FROM asin_index WHERE asin = ? AND channel = ?",
+                                  [(asin, channel) for asin in asins])
+
+    def first_seen(self, channel):
+        """{asin: first_seen timestamp} of every ASIN in a channel"""
+        rows = self.conn.execute("SELECT asin, first_seen FROM asin_index WHERE channel = ?", (channel,))
+        return dict(rows)
+
+    def prune(self, channel, before):
+        """Forget ASINs of a channel last updated before a timestamp; returns how many"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM asin_index WHERE channel = ? AND updated_at < ?", (channel, before))
+        return cursor.rowcount
+
+    def posted_where(self, asin, prefix=INSTAGRAM):
+        """[(channel, ref)] of the channels an ASIN is recorded in, e.g. every Instagram account"""
+        return self.conn.execute(
+            "SELECT channel, ref FROM asin_index WHERE asin = ? AND (channel = ? OR channel LIKE ?) ORDER BY channel",
+            (asin, prefix, f"{prefix}:%")).fetchall()
+
+    def channel_counts(self, prefix=INSTAGRAM):
+        """{channel: ASIN count} of a channel and its sub-channels (instagram, instagram:<account>, ...)"""
+        return dict(self.conn.execute(
+            "SELECT channel, COUNT(*) FROM asin_index WHERE channel = ? OR channel LIKE ? GROUP BY channel",
+            (prefix, f"{prefix}:%")))
+
+    def count(self, channel):
+        """Number of ASINs recorded in a channel"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM asin_index WHERE channel = ?", (channel,)).fetchone()[0]
+
+    def clear(self, channel):
+        """Forget every ASIN in a channel"""
+        with self.conn:
+            self.conn.execute("DELETE FROM asin_index WHERE channel = ?", (channel,))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,271 @@
+"""
+benchmark.py - Reproducible timings for site generation and posting on synthetic catalogs
+
+Every scenario runs in a fresh temporary directory, so the real site, store
+and metrics are never touched. Results are written as JSON; pass a previous
+result file as --baseline to fail (exit code 1) when a timing regressed:
+    python benchmark.py --sizes 1000 10000 --output benchmarks/baseline.json
+    python benchmark.py --sizes 1000 10000 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+import instagram_poster
+from carousel import CarouselPipeline, group_products
+from generate_html import WebsiteUpdater
+from mock_graph_api import MockGraphAPI
+from posting_pipeline import PostingPipeline
+
+SIZES = (1000, 10000, 100000)
+MODES = ("soup", "template", "sharded")
+CATEGORIES = ("Electronics", "Home & Decor", "Fitness")
+WARM_NEW_ITEMS = 100  # New products in the feed of the warm run
+LOOKUP_REPEATS = 50  # Calls averaged per lookup timing
+POSTER_ITEMS = 200
+POSTER_MODES = ("pipeline", "carousel")
+UNLIMITED_POSTS_PER_HOUR = 10 ** 9
+RESULTS_DIR = "benchmarks"
+MAX_REGRESSION = 0.25  # Allowed slowdown against the baseline
+MIN_GATED_SECONDS = 0.01  # Timings below this are too noisy to gate on
+
+
+def synthetic_products(count, start=0, seed=42):
+    """Products shaped like insta_ready.json entries; the same arguments give the same catalog"""
+    rng = random.Random(seed + start)
+    products = []
+    for i in range(start, start + count):
+        asin = f"B{i:09d}"
+        original = rng.randint(500, 20000)
+        discount = rng.randint(10, 80)
+        price = original * (100 - discount) // 100
+        name = f"Synthetic Product {i} {rng.choice(('Pro', 'Mini', 'Max', 'Lite'))} Edition"
+        products.append({
+            'name': name,
+            'asin': asin,
+            'price': f"₹{price:,}",
+            'original_price': f"₹{original:,}",
+            'discount': f"{discount}%",
+            'rating': f"{rng.uniform(3.0, 5.0):.1f}",
+            'image_url': f"https://m.media-amazon.com/images/I/{asin}._SX679_.jpg",
+            'affiliate_link': f"https://www.amazon.in/dp/{asin}?tag=pandaloon-21",
+            'caption': f"🔥 DEAL ALERT! 🔥\n\n{name}\n\n💥 {discount}% OFF\n💰 Just ₹{price:,}",
+            'category': CATEGORIES[rng.randrange(len(CATEGORIES))],
+            'scraped_at': '2025-01-01 00:00:00',
+        })
+    return products
+
+
+def write_feed(path, products):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(products, f, ensure_ascii=False)
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    """Run inside a temporary directory that is removed afterwards"""
+    previous = os.getcwd()
+    path = tempfile.mkdtemp(prefix="pandaloon-bench-")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def timed(func, *args):
+    """Seconds taken by func(*args), with its console output suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+
+def bench_update_html(mode, size):
+    """Cold run on an empty site, then a warm run with the same feed plus a few new products"""
+    with scratch_dir():
+        products = synthetic_products(size)
+        write_feed("insta_ready.json", products)
+        cold = timed(WebsiteUpdater(render_mode=mode).update_html)
+        write_feed("insta_ready.json", products + synthetic_products(WARM_NEW_ITEMS, start=size))
+        warm = timed(WebsiteUpdater(render_mode=mode).update_html)
+    return {'cold': cold, 'warm': warm}
+
+
+def bench_lookups(size):
+    """get_existing_asins and get_or_create_category_section on a page holding `size` products"""
+    updater = WebsiteUpdater()
+    fragments = {category: [] for category in CATEGORIES}
+    for product in synthetic_products(size):
+        fragments[product['category']].append(updater.renderer.render_product(product))
+    soup = BeautifulSoup(updater.renderer.render_page(fragments, ''), 'html.parser')
+
+    existing_asins = timed(updater.get_existing_asins, soup)
+
+    def lookups():
+        for _ in range(LOOKUP_REPEATS):
+            for category in CATEGORIES:
+                updater.get_or_create_category_section(soup, category)
+
+    section_lookup = timed(lookups) / (LOOKUP_REPEATS * len(CATEGORIES))
+    return {'get_existing_asins': existing_asins, 'get_or_create_category_section': section_lookup}
+
+
+def bench_poster(count, mode='pipeline'):
+    """Post `count` products against the local mock Graph API, one per post or as carousels"""
+    api = MockGraphAPI(processing_polls=0).start()
+    base_url = instagram_poster.BASE_URL
+    instagram_poster.BASE_URL = api.base_url
+    try:
+        with scratch_dir():
+            poster = instagram_poster.InstagramAutoPoster()
+            products = synthetic_products(count)
+            if mode == 'carousel':
+                pipeline = CarouselPipeline(poster, posts_per_hour=UNLIMITED_POSTS_PER_HOUR,
+                                            max_workers=instagram_poster.PIPELINE_WORKERS)
+                products = group_products(products)
+            else:
+                pipeline = PostingPipeline(poster, posts_per_hour=UNLIMITED_POSTS_PER_HOUR,
+                                           max_workers=instagram_poster.PIPELINE_WORKERS)
+            elapsed = timed(pipeline.run, products)
+            latency = poster.client.latency_summary()
+            posted, failed = len(poster.posted), len(poster.failed)
+            publishes = len(api.published)
+            poster.client.close()
+            poster.asin_index.close()
+    finally:
+        instagram_poster.BASE_URL = base_url
+        api.stop()
+    return {
+        'seconds': elapsed,
+        'posted': posted,
+        'failed': failed,
+        'posts_per_second': round(posted / elapsed, 2) if elapsed else 0,
+        'publish_calls': publishes,
+        'products_per_publish': round(posted / publishes, 2) if publishes else 0,
+        'latency_ms': latency,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, modes, poster_items, repeat):
+    """Run every scenario; each timing is the best of `repeat` runs"""
+    timings = {}
+    details = {}
+
+    def record(name, seconds):
+        timings[name] = round(min(seconds, timings.get(name, seconds)), 6)
+
+    for size in sizes:
+        for attempt in range(repeat):
+            for mode in modes:
+                print(f"⏱️  update_html {mode} {size:,} products (run {attempt + 1}/{repeat})", flush=True)
+                for phase, seconds in bench_update_html(mode, size).items():
+                    record(f"update_html.{mode}.{size}.{phase}", seconds)
+            print(f"⏱️  lookups on a {size:,} product page (run {attempt + 1}/{repeat})", flush=True)
+            for name, seconds in bench_lookups(size).items():
+                record(f"{name}.{size}", seconds)
+
+    if poster_items:
+        for attempt in range(repeat):
+            for mode in POSTER_MODES:
+                print(f"⏱️  poster {mode}, {poster_items} products (run {attempt + 1}/{repeat})", flush=True)
+                name = f"poster.{mode}.{poster_items}"
+                result = bench_poster(poster_items, mode)
+                if name not in details or result['seconds'] < details[name]['seconds']:
+                    details[name] = result
+                record(name, result['seconds'])
+
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': list(sizes),
+        'modes': list(modes),
+        'repeat': repeat,
+        'timings': timings,
+        'details': details,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Print timings next to the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':<52} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, seconds in results['timings'].items():
+        previous = baseline['timings'].get(name)
+        if previous is None:
+            print(f"{name:<52} {'-':>10} {seconds:>10.4f} {'new':>8}")
+            continue
+        change = (seconds - previous) / previous if previous else 0.0
+        regressed = previous >= MIN_GATED_SECONDS and change > max_regression
+        flag = " ❌" if regressed else ""
+        print(f"{name:<52} {previous:>10.4f} {seconds:>10.4f} {change:>+7.0%}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark site generation and posting on synthetic catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help="catalog sizes to generate")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help="update_html modes to time")
+    parser.add_argument('--poster-items', type=int, default=POSTER_ITEMS,
+                        help="products posted against the mock Graph API (0 skips the poster)")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per scenario, the fastest is kept")
+    parser.add_argument('--output', metavar='FILE', help=f"result file (default: {RESULTS_DIR}/<timestamp>.json)")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against an earlier result file")
+    parser.add_argument('--max-regression', type=float, default=MAX_REGRESSION,
+                        help="allowed slowdown against the baseline, e.g. 0.25 for 25%%")
+    args = parser.parse_args()
+
+    print("📈 PANDALOON BENCHMARKS")
+    print("=" * 60)
+    results = run_benchmarks(args.sizes, args.modes, args.poster_items, max(1, args.repeat))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if not args.baseline:
+        for name, seconds in results['timings'].items():
+            print(f"   {name:<52} {seconds:.4f}s")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.max_regression)
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0%}")
+        return 1
+    print(f"\n✅ No regressions beyond {args.max_regression:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
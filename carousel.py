@@ -0,0 +1,160 @@
+"""
+carousel.py - Carousel posting: up to 10 products per post, grouped by category or discount
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from posting_pipeline import TokenBucket
+from product_fields import discount_percent
+
+CAROUSEL_SIZE = 10  # Instagram's limit on carousel children
+MIN_CAROUSEL_SIZE = 2  # Smaller batches are published as single-image posts
+CAPTION_LIMIT = 2200  # Instagram caption length limit
+HASHTAG_LIMIT = 30  # Instagram hashtag limit per caption
+DISCOUNT_TIERS = (70, 50, 30, 0)  # Discount groups: 70%+, 50-69%, 30-49%, below 30%
+GROUP_BY = ('category', 'discount')
+
+HASHTAG = re.compile(r'#\w+')
+
+
+def group_label(product, group_by):
+    if group_by == 'discount':
+        tier = next(tier for tier in DISCOUNT_TIERS if discount_percent(product) >= tier)
+        return f"{tier}%+ OFF" if tier else "Hot"
+    return product.get('category') or "Top"
+
+
+def group_products(products, group_by='category', size=CAROUSEL_SIZE):
+    """[(label, products)] batches of up to `size`, groups in order of their first product"""
+    groups = {}
+    for product in products:
+        groups.setdefault(group_label(product, group_by), []).append(product)
+    return [(label, items[i:i + size]) for label, items in groups.items() for i in range(0, len(items), size)]
+
+
+def caption_summary(product):
+    """Name, discount, price and link lines taken from a product's caption (falling back to its fields)"""
+    lines = [line.strip() for line in product.get('caption', '').splitlines() if line.strip()]
+    # Captions open with an alert line, followed by the product name
+    name = lines[1] if len(lines) > 1 and not lines[1].startswith(('💥', '💰')) else product['name']
+    discount = next((line for line in lines if line.startswith('💥')), None)
+    price = next((line for line in lines if line.startswith('💰')), f"💰 {product['price']}")
+    link = next((line for line in lines if line.startswith('🔗')), None)
+    return [name, ' | '.join(filter(None, (discount, price))), link]
+
+
+def compose_caption(label, products, limit=CAPTION_LIMIT):
+    """One caption for a carousel: a line per product in slide order plus the products' hashtags"""
+    header = f"🔥 {len(products)} {label.upper()} DEALS 🔥\n\n👉 Swipe through, every deal is linked in bio"
+    hashtags = []
+    for product in products:
+        for tag in HASHTAG.findall(product.get('caption', '')):
+            if tag.lower() not in (seen.lower() for seen in hashtags) and len(hashtags) < HASHTAG_LIMIT:
+                hashtags.append(tag)
+    footer = ' '.join(hashtags)
+
+    blocks = []
+    for position, product in enumerate(products, 1):
+        name, offer, link = caption_summary(product)
+        blocks.append('\n'.join(filter(None, (f"{position}. {name}", f"   {offer}", f"   {link}" if link else None))))
+
+    def join(blocks):
+        return '\n\n'.join([header] + blocks + [footer]).strip()
+
+    caption = join(blocks)
+    if len(caption) > limit:
+        # Drop the links first, then trailing products, until the caption fits
+        blocks = [block.split('\n   🔗')[0] for block in blocks]
+        while blocks and len(join(blocks)) > limit:
+            blocks.pop()
+        caption = join(blocks)
+    return caption[:limit]
+
+
+class CarouselPipeline:
+    """Publishes products as carousel posts.
+
+    Child containers for every batch are created and polled on a thread pool
+    up front; each batch's carousel container is then created, waited for and
+    published in order, taking one token from the posts-per-hour budget per
+    carousel. Batches too small for a carousel (or left with a single child
+    after failures) are posted as single-image posts.
+    """
+
+    def __init__(self, poster, posts_per_hour, max_workers=4, bucket=None):
+        self.poster = poster
+        self.max_workers = max_workers
+        self.bucket = bucket or TokenBucket(posts_per_hour)
+
+    def run(self, batches):
+        """Post [(label, products)] batches; results are recorded on the poster"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            children = [
+                [executor.submit(self.poster.prepare_carousel_item, product) for product in products]
+                if len(products) >= MIN_CAROUSEL_SIZE else None
+                for _, products in batches
+            ]
+            for (label, products), futures in zip(batches, children):
+                if futures is None:
+                    self.post_single(products[0])
+                    continue
+
+                ready = []
+                for product, future in zip(products, futures):
+                    success, result = future.result()
+                    if success:
+                        ready.append((product, result))
+                    else:
+                        self.fail(product, result)
+                if len(ready) < MIN_CAROUSEL_SIZE:
+                    for product, _ in ready:
+                        self.post_single(product)
+                    continue
+                self.post_carousel(label, ready)
+
+    def acquire(self):
+        wait = self.bucket.wait_time()
+        if wait >= 1:
+            print(f"⏳ Rate limit: next publish in {wait:.0f}s")
+        self.bucket.acquire()
+
+    def post_carousel(self, label, ready):
+        products = [product for product, _ in ready]
+        caption = compose_caption(label, products)
+        success, result = self.poster.prepare_carousel([creation_id for _, creation_id in ready], caption)
+        if success:
+            self.acquire()
+            try:
+                success, result = self.poster.publish_container(result)
+            except Exception as e:
+                success, result = False, str(e)
+        self.poster.metrics.incr('carousels', status='published' if success else 'failed')
+        if not success:
+            for product in products:
+                self.fail(product, result)
+            return
+        print(f"✅ {datetime.now().strftime('%I:%M:%S %p')} Published {label} carousel "
+              f"({len(products)} products) - Post ID: {result}")
+        self.poster.metrics.incr('carousel_products', len(products))
+        for product in products:
+            self.poster.record_success(product, result)
+
+    def post_single(self, product):
+        success, result = self.poster.prepare_post(product)
+        if success:
+            self.acquire()
+            try:
+                success, result = self.poster.publish_container(result)
+            except Exception as e:
+                success, result = False, str(e)
+        if success:
+            print(f"✅ {datetime.now().strftime('%I:%M:%S %p')} Published {product['name'][:50]} - Post ID: {result}")
+            self.poster.record_success(product, result)
+        else:
+            self.fail(product, result)
+
+    def fail(self, product, error):
+        print(f"❌ FAILED: {product['name'][:50]} - {error}")
+        self.poster.record_failure(product, error)
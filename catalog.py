@@ -0,0 +1,97 @@
+"""
+catalog.py - In-memory product catalog indexed by ASIN and by category
+"""
+
+
+class CatalogRecord:
+    """One product on the site: where it goes, when it was added and how it renders"""
+
+    __slots__ = ('asin', 'category', 'seq', 'content_hash', 'fragment')
+
+    def __init__(self, asin, category, seq, content_hash, fragment):
+        self.asin = asin
+        self.category = category
+        self.seq = seq
+        self.content_hash = content_hash
+        self.fragment = fragment
+
+
+class Catalog:
+    """Products keyed by ASIN, plus per-category lists kept in insertion order.
+
+    Adding a product appends to its category list, so a batch costs O(batch)
+    however many products are already listed; newest-first views simply walk
+    the lists backwards. Pages are rendered from the catalog rather than by
+    editing a parsed HTML tree.
+    """
+
+    def __init__(self, categories):
+        self.by_asin = {}
+        self.by_category = {category: [] for category in categories}
+        self.last_seq = 0
+
+    @classmethod
+    def from_store(cls, store, categories, fragments=True):
+        """Load every stored product (one query, in insertion order).
+
+        Without fragments only the bookkeeping columns are loaded, for callers
+        that read rendered HTML from the store per category as they need it.
+        """
+        catalog = cls(categories)
+        for asin, category, seq, product_hash, fragment in store.records(fragments):
+            catalog.add(asin, category, product_hash, fragment, seq=seq)
+        return catalog
+
+    def __len__(self):
+        return len(self.by_asin)
+
+    def __contains__(self, asin):
+        return asin in self.by_asin
+
+    def get(self, asin):
+        return self.by_asin.get(asin)
+
+    def add(self, asin, category, content_hash, fragment, seq=None):
+        """Add a new product as the newest of its category; returns its record"""
+        if seq is None:
+            seq = self.last_seq + 1
+        self.last_seq = max(self.last_seq, seq)
+        record = CatalogRecord(asin, category, seq, content_hash, fragment)
+        self.by_asin[asin] = record
+        self.by_category.setdefault(category, []).append(record)
+        return record
+
+    def update(self, asin, category, content_hash, fragment):
+        """Replace a product's content, keeping its position; returns its record"""
+        record = self.by_asin[asin]
+        if category != record.category:
+            self.by_category[record.category].remove(record)
+            records = self.by_category.setdefault(category, [])
+            index = len(records)
+            while index and records[index - 1].seq > record.seq:
+                index -= 1
+            records.insert(index, record)
+            record.category = category
+        record.content_hash = content_hash
+        record.fragment = fragment
+        return record
+
+    def remove_many(self, asins):
+        """Drop products; each affected category list is rebuilt once"""
+        removed = [self.by_asin.pop(asin) for asin in asins if asin in self.by_asin]
+        for category in {record.category for record in removed}:
+            self.by_category[category] = [record for record in self.by_category[category]
+                                          if self.by_asin.get(record.asin) is record]
+        return removed
+
+    def newest(self, category, limit=None):
+        """Records of a category, newest first"""
+        records = self.by_category.get(category, [])
+        if limit is not None:
+            records = records[max(0, len(records) - limit):]
+        return records[::-1]
+
+    def fragments_by_category(self, limit=None):
+        """{category: fragments newest first}, the input of TemplateRenderer.render_page"""
+        return {category: [record.fragment for record in self.newest(category, limit)]
+                for category in self.by_category}
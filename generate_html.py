@@ -1,15 +1,60 @@
 from bs4 import BeautifulSoup
+import argparse
 import json
 import os
 from datetime import datetime
+from asin_index import AsinIndex, RETIRED, SITE
+from catalog import Catalog
+from git_publisher import GitPublisher
+from link_check import LinkChecker
+from metrics import Metrics
+from price_history import TOP_DEALS, PriceHistory
+from product_feed import ProductFeed
+from product_fields import CATEGORIES, DEFAULT_CATEGORY
+from product_store import ProductStore, STORE_FILE, content_hash
+from retention import ARCHIVE_DIR, DealArchive, RetentionPolicy
+from search_index import SearchIndexBuilder
+from site_watcher import DEBOUNCE_SECONDS, POLL_SECONDS, SiteWatcher
+from sharded_site import ShardedSiteBuilder
+from static_build import BUILD_DIR, StaticBuild
+from template_renderer import TOP_DEALS_TITLE, TemplateRenderer
+
+INGEST_BATCH = 200  # New products rendered (and their images processed) per batch
+
+
+def extract_asin(url):
+    """Extract the ASIN from an Amazon product URL, or return None"""
+    if '/dp/' not in url:
+        return None
+    return url.split('/dp/')[1].split('?')[0]
+
 
 class WebsiteUpdater:
-    def __init__(self):
+    def __init__(self, render_mode="soup"):
         self.html_file = "index.html"
         self.json_file = "insta_ready.json"
-        self.existing_asins = set()
+        self.extra_json_files = []  # Further feeds (JSON array or JSON lines) merged in the same pass
+        self.store_file = STORE_FILE
+        # "soup" rewrites index.html, "template" renders it from the store,
+        # "sharded" renders paginated category pages plus a small index.html
+        self.render_mode = render_mode
+        self.process_images = False  # Resize product images into images/cache (store-backed modes)
+        # Store-backed modes: re-render changed products and drop ones missing from the feed
+        self.refresh = False
+        self.changes = None  # Change set of the last run: {'added': [...], 'updated': [...], 'removed': [...]}
+        self.changes_file = None  # Optional JSON file the change set is written to
+        self.changed_seqs = {}  # Category -> oldest sequence number touched by an update or removal
+        self.search = False  # Store-backed modes: keep search/ up to date and add a search box
+        self.check_links = False  # Quarantine feed products whose image or affiliate link is broken
+        self.track_prices = False  # Store-backed modes: record feed prices and add a top deals section
+        self.retention = None  # RetentionPolicy evicting expired and overflowing deals on each run
+        self.archive = None  # DealArchive receiving evicted deals (optional)
+        self.asin_index = None  # Shared ASIN index, open while update_html runs
+        self.metrics = None  # Metrics of the current/last update_html run
+        self.prom_file = None  # Optional Prometheus text file written after each run
         # Define valid categories
-        self.valid_categories = ["Electronics", "Home & Decor", "Fitness"]
+        self.valid_categories = list(CATEGORIES)
+        self.renderer = TemplateRenderer(self.valid_categories)
         
     def load_existing_html(self):
         """Load existing HTML or create new one"""
@@ -23,74 +68,48 @@ class WebsiteUpdater:
     
     def create_new_html(self):
         """Create new HTML structure with category sections"""
-        html_template = """<!DOCTYPE html>
-<html lang='en'>
-<head>
-<meta charset='UTF-8'>
-<title>PandaLoon Deals</title>
-<meta name='viewport' content='width=device-width, initial-scale=1'>
-<style>
-body { background-color: #f9f3e7; color: #3d2b1f; font-family: 'Segoe UI', sans-serif; margin: 0; }
-header { background-color: #b08968; padding: 20px; text-align: center; }
-header img { height: 60px; }
-h1 { color: white; font-size: 28px; margin: 10px 0; }
-section { padding: 20px; }
-h2 { color: #6b4c3b; border-bottom: 2px solid #c7a17a; padding-bottom: 10px; margin-top: 30px; }
-.product { background: #fff9f1; border: 1px solid #e1cdb5; padding: 15px; border-radius: 10px; margin-bottom: 20px; box-shadow: 0 2px 6px rgba(0,0,0,0.05); }
-.product img { width: 220px; height: auto; border-radius: 8px;}
-.product .title { font-weight: bold; margin: 10px 0 5px; }
-.product .price { color: #a86e39; font-weight: bold; }
-.product a { background: #a86e39; color: white; padding: 8px 12px; display: inline-block; margin-top: 10px; text-decoration: none; border-radius: 4px; }
-.updated { text-align: center; color: #888; font-size: 14px; margin: 20px; }
-</style>
-</head>
-<body>
-<header>
-  <img src='Pandaloon_logo.png' alt='PandaLoon Logo'>
-  <h1>PandaLoon Curated Deals</h1>
-</header>
-<!-- Category sections will be added here -->
-<div class="updated">Last updated: <span id="update-time"></span></div>
-</body>
-</html>"""
-        soup = BeautifulSoup(html_template, 'html.parser')
-        
-        # Create sections for each category
-        timestamp = soup.find('div', class_='updated')
-        for category in self.valid_categories:
-            section = soup.new_tag('section')
-            h2 = soup.new_tag('h2')
-            h2.string = category
-            section.append(h2)
-            timestamp.insert_before(section)
-        
-        return soup
+        # The page shell and empty sections come from the same templates as the template mode
+        return BeautifulSoup(self.renderer.render_page({}, ''), 'html.parser')
     
     def get_existing_asins(self, soup):
         """Extract ASINs from existing products to avoid duplicates"""
         asins = set()
         for link in soup.find_all('a', href=True):
-            href = link['href']
-            if '/dp/' in href:
-                # Extract ASIN from URL
-                parts = href.split('/dp/')
-                if len(parts) > 1:
-                    asin = parts[1].split('?')[0]
-                    asins.add(asin)
+            asin = extract_asin(link['href'])
+            if asin:
+                asins.add(asin)
         return asins
     
-    def get_or_create_category_section(self, soup, category):
-        """Get existing category section or create new one"""
-        # Normalize category name
+    def normalize_category(self, category, warn=True):
+        """Map unknown categories onto the default section"""
         if category not in self.valid_categories:
-            print(f"⚠️ Unknown category '{category}', defaulting to 'Home & Decor'")
-            category = "Home & Decor"
-        
-        # Look for existing category section
+            if warn:
+                print(f"⚠️ Unknown category '{category}', defaulting to '{DEFAULT_CATEGORY}'")
+            category = DEFAULT_CATEGORY
+        return category
+    
+    def index_category_sections(self, soup):
+        """Map category names to their sections with a single pass over the page"""
+        sections = {}
         for section in soup.find_all('section'):
             h2 = section.find('h2')
-            if h2 and h2.text == category:
-                return section
+            if h2 and h2.text not in sections:
+                sections[h2.text] = section
+        return sections
+    
+    def get_or_create_category_section(self, soup, category, sections=None):
+        """Get existing category section or create new one"""
+        category = self.normalize_category(category)
+        
+        # Look for existing category section, in the section index when one is given
+        if sections is not None:
+            if category in sections:
+                return sections[category]
+        else:
+            for section in soup.find_all('section'):
+                h2 = section.find('h2')
+                if h2 and h2.text == category:
+                    return section
         
         # Create new category section if not found
         print(f"📁 Creating new section for category: {category}")
@@ -105,6 +124,8 @@ h2 { color: #6b4c3b; border-bottom: 2px solid #c7a17a; padding-bottom: 10px; mar
             timestamp.insert_before(new_section)
         else:
             soup.body.append(new_section)
+        if sections is not None:
+            sections[category] = new_section
         
         return new_section
     
@@ -120,62 +141,378 @@ h2 { color: #6b4c3b; border-bottom: 2px solid #c7a17a; padding-bottom: 10px; mar
 """
         return BeautifulSoup(product_html, 'html.parser').find('div', class_='product')
     
-    def update_html(self):
-        """Main function to update HTML with new products organized by category"""
+    def product_from_element(self, product_elem):
+        """Recover product fields from a rendered product div"""
+        img = product_elem.find('img')
+        title = product_elem.find('div', class_='title')
+        price = product_elem.find('div', class_='price')
+        link = product_elem.find('a', href=True)
+        original = price.find('small') if price else None
+        return {
+            'name': title.get_text(strip=True) if title else '',
+            'asin': extract_asin(link['href']) if link else None,
+            'image_url': img.get('src', '') if img else '',
+            'price': price.find(string=True, recursive=False).strip() if price else '',
+            'original_price': original.get_text(strip=True)[len('(was '):-1] if original else '',
+            'affiliate_link': link['href'] if link else '',
+        }
+    
+    def import_existing_html(self, store):
+        """One-time import of the products already on index.html into the store"""
+        print(f"📥 Importing existing products from {self.html_file}")
+        with self.metrics.stage('load'):
+            with open(self.html_file, 'r', encoding='utf-8') as f:
+                soup = BeautifulSoup(f.read(), 'html.parser')
+        
+        imported = []
+        for section in soup.find_all('section'):
+            h2 = section.find('h2')
+            if h2 and h2.get_text(strip=True) == TOP_DEALS_TITLE:
+                continue  # Copies of products listed in their own categories
+            category = self.normalize_category(h2.get_text(strip=True) if h2 else '')
+            for product_elem in section.find_all('div', class_='product'):
+                product = self.product_from_element(product_elem)
+                if product['asin']:
+                    imported.append((category, product))
+        
+        # Page order is newest first, so the last product gets the lowest sequence number
+        imported.reverse()
+        fragments = self.render_products([product for _, product in imported])
+        with self.metrics.stage('store'):
+            for seq, ((category, product), fragment) in enumerate(zip(imported, fragments), 1):
+                store.upsert(product['asin'], category, content_hash(product), fragment, product, seq=seq)
+            store.commit()
+            self.asin_index.upsert_many([product['asin'] for _, product in imported], SITE)
+        print(f"📊 Imported {len(imported)} existing products")
+    
+    def render_products(self, products):
+        """Render product fragments, using resized image variants when the image stage is enabled"""
+        variants = {}
+        if self.process_images:
+            from image_pipeline import ImagePipeline  # Pillow is only needed for the image stage
+            with self.metrics.stage('images'):
+                pipeline = ImagePipeline(os.path.dirname(self.html_file) or '.')
+                variants = pipeline.process(product.get('image_url', '') for product in products)
+        with self.metrics.stage('render'):
+            return [self.renderer.render_product(product, variants.get(product.get('image_url', '')))
+                    for product in products]
+    
+    def add_to_store(self, store, catalog, products):
+        """Render a batch of new or changed products and write them to the catalog and the store in feed order.
+
+        The batch is committed on its own, so the store is not locked (for the
+        poster and the pipeline) while the feed is read, links are checked or
+        the next batch renders.
+        """
+        for product, fragment in zip(products, self.render_products(products)):
+            asin = product['asin']
+            category = self.normalize_category(product.get('category', 'Home & Decor'))
+            with self.metrics.stage('store'):
+                if asin in catalog:
+                    self.mark_changed(catalog.get(asin))  # Its old category page changes too
+                    record = catalog.update(asin, category, content_hash(product), fragment)
+                    self.mark_changed(record)
+                    self.changes['updated'].append(asin)
+                    action = "Updated in"
+                else:
+                    record = catalog.add(asin, category, content_hash(product), fragment)
+                    self.changes['added'].append(asin)
+                    action = "Added to"
+                store.upsert(asin, category, record.content_hash, fragment, product, seq=record.seq)
+            print(f"✅ {action} {category}: {product.get('name', '')[:40]}...")
+        with self.metrics.stage('store'):
+            store.commit()
+    
+    def mark_changed(self, record):
+        """Remember the oldest changed position per category (sharded pages re-render from there)"""
+        seqs = self.changed_seqs
+        seqs[record.category] = min(record.seq, seqs.get(record.category, record.seq))
+    
+    def remove_missing(self, store, catalog, seen):
+        """Drop products that are no longer in the feed"""
+        missing = [asin for asin in catalog.by_asin if asin not in seen]
+        with self.metrics.stage('store'):
+            for record in catalog.remove_many(missing):
+                self.mark_changed(record)
+                print(f"🗑️  Removed from {record.category}: {record.asin}")
+            store.delete(missing)
+        self.changes['removed'] = missing
+    
+    def is_unwanted(self, product):
+        """Whether retention keeps a feed product off the site (evicted before, or already expired)"""
+        if self.retention is None:
+            return False
+        if self.asin_index.contains(product['asin'], RETIRED):
+            return True
+        # The unknown category warning is printed once the product is added
+        category = self.normalize_category(product.get('category', 'Home & Decor'), warn=False)
+        return self.retention.is_expired(category, product.get('scraped_at'))
+    
+    def evict_from_catalog(self, store, catalog):
+        """Apply retention to every category of the catalog; evicted products leave the store"""
+        scraped_at = store.deal_times()
+        first_seen = self.asin_index.first_seen(SITE)
+        reasons = {}
+        for category in catalog.by_category:
+            deals = [(record.asin, scraped_at.get(record.asin) or first_seen.get(record.asin))
+                     for record in catalog.newest(category)]
+            reasons.update(self.retention.select(category, deals))
+        if not reasons:
+            return []
+        products = store.products(reasons) if self.archive else {}
+        for record in catalog.remove_many(reasons):
+            self.mark_changed(record)
+            if self.archive:
+                self.archive.add(products.get(record.asin, {'asin': record.asin}), record.category,
+                                 reasons[record.asin])
+            print(f"🧹 Evicted from {record.category} ({reasons[record.asin]}): {record.asin}")
+        store.delete(reasons)
+        return list(reasons)
+    
+    def evict_from_page(self, sections):
+        """Apply retention to the sections of the parsed page (products are listed newest first)"""
+        first_seen = self.asin_index.first_seen(SITE)
+        evicted = []
+        for category, section in sections.items():
+            elements = {}
+            for product_elem in section.find_all('div', class_='product'):
+                link = product_elem.find('a', href=True)
+                asin = extract_asin(link['href']) if link else None
+                if asin:
+                    elements[asin] = product_elem
+            deals = [(asin, first_seen.get(asin)) for asin in elements]
+            for asin, reason in self.retention.select(category, deals):
+                if self.archive:
+                    self.archive.add(self.product_from_element(elements[asin]), category, reason)
+                elements[asin].decompose()
+                evicted.append(asin)
+                print(f"🧹 Evicted from {category} ({reason}): {asin}")
+        return evicted
+    
+    def retire(self, evicted):
+        """Move evicted ASINs from the site index to the retired one and write the archive"""
+        self.asin_index.remove_many(evicted, SITE)
+        self.asin_index.upsert_many(evicted, RETIRED)
+        self.asin_index.prune(RETIRED, self.retention.retired_cutoff())
+        if self.archive:
+            for path in self.archive.flush():
+                print(f"🗄️  Archived evicted deals to {path}")
+    
+    def is_unchanged(self, catalog, product):
+        """Whether a feed product matches the stored product exactly"""
+        record = catalog.get(product['asin'])
+        return record is not None and record.content_hash == content_hash(product)
+    
+    def report_changes(self):
+        """Print the change set of the run and write it to changes_file if set"""
+        for kind in ('added', 'updated', 'removed', 'evicted'):
+            asins = self.changes[kind]
+            self.metrics.incr(f'products_{kind}', len(asins))
+            if asins:
+                print(f"   - {kind}: {len(asins)} ({', '.join(asins[:5])}{' ...' if len(asins) > 5 else ''})")
+        if self.changes_file:
+            with open(self.changes_file, 'w', encoding='utf-8') as f:
+                json.dump(self.changes, f, indent=2)
+            print(f"💾 Change set saved to {self.changes_file}")
+    
+    def open_feed(self, skip_asin):
+        """Stream products from all feed files, skipping ASINs that are already known"""
+        return ProductFeed([self.json_file] + self.extra_json_files,
+                           skip_asin=skip_asin and self.metrics.timed('dedupe', skip_asin))
+    
+    def feed_products(self, feed, checker):
+        """Products of a feed, minus the ones whose links fail pre-flight checks (when enabled)"""
+        products = self.metrics.timed_iter('load', feed)
+        if checker:
+            products = self.metrics.timed_iter('validate', checker.filter(products))
+        return products
+    
+    def open_link_checker(self):
+        return LinkChecker(self.store_file, metrics=self.metrics) if self.check_links else None
+    
+    def ingest_prices(self):
+        """Record the prices of every feed product (known ones too); returns the best deals' ASINs"""
+        history = PriceHistory(self.store_file, metrics=self.metrics)
+        try:
+            with self.metrics.stage('prices'):
+                appended, rescored = history.ingest(ProductFeed([self.json_file] + self.extra_json_files))
+                # Some of the best deals may not be on the site (unwanted or quarantined)
+                top_asins = history.top_deals(TOP_DEALS * 2)
+        finally:
+            history.close()
+        print(f"📈 Price history: {appended} price change(s) recorded, {rescored} product(s) re-ranked")
+        return top_asins
+    
+    def record_feed_metrics(self, feed, added=None):
+        self.metrics.incr('products_read', feed.read)
+        self.metrics.incr('products_invalid', feed.invalid)
+        self.metrics.incr('products_skipped', feed.skipped)
+        if added is not None:
+            self.metrics.incr('products_added', added)
+    
+    def update_html_from_store(self):
+        """Render the page as a projection of the product catalog, rendering fragments only for new
+        products (and, when refreshing, for products whose content hash changed)"""
+        store = ProductStore(self.store_file)
+        try:
+            if store.count() == 0 and os.path.exists(self.html_file):
+                self.import_existing_html(store)
+            
+            if not os.path.exists(self.json_file):
+                print(f"❌ {self.json_file} not found!")
+                return False
+            
+            top_asins = self.ingest_prices() if self.track_prices else []
+            with self.metrics.stage('load'):
+                # Sharded pages read their fragments from the store one category page at a time
+                catalog = Catalog.from_store(store, self.valid_categories,
+                                             fragments=self.render_mode != "sharded")
+            
+            self.changes = {'added': [], 'updated': [], 'removed': [], 'evicted': []}
+            self.changed_seqs = {}
+            seen = set()
+            if self.refresh:
+                # Every feed product is compared against its stored content hash
+                feed = self.open_feed(None)
+            else:
+                # Same duplicate rule as the soup mode: products already on the page are kept as-is
+                feed = self.open_feed(lambda asin: asin in catalog or self.asin_index.contains(asin, SITE))
+            batch = []
+            unchanged = 0
+            checker = self.open_link_checker()
+            # Quarantined products count as missing, so refreshing takes them off the site
+            for product in self.feed_products(feed, checker):
+                seen.add(product['asin'])
+                if self.is_unwanted(product):
+                    continue
+                if self.refresh and self.is_unchanged(catalog, product):
+                    unchanged += 1
+                    continue
+                batch.append(product)
+                if len(batch) == INGEST_BATCH:
+                    self.add_to_store(store, catalog, batch)
+                    batch = []
+            self.add_to_store(store, catalog, batch)
+            if self.refresh:
+                if feed.read > feed.invalid:
+                    self.remove_missing(store, catalog, seen)
+                else:
+                    print("⚠️ Feed has no valid products, keeping every stored product")
+            if self.retention:
+                with self.metrics.stage('retention'):
+                    self.changes['evicted'] = self.evict_from_catalog(store, catalog)
+            with self.metrics.stage('store'):
+                store.commit()
+            if checker:
+                # Verdicts are written once the store transaction is committed
+                checker.close()
+                print(f"🔗 Link check: {checker.summary()}")
+            self.record_feed_metrics(feed)
+            added_asins = self.changes['added']
+            
+            search_version, search_files = None, []
+            if self.search:
+                with self.metrics.stage('search'):
+                    index = SearchIndexBuilder(store, self.valid_categories, os.path.dirname(self.html_file) or '.')
+                    search_version, search_files = index.update()
+            
+            top_deals = store.fragments_for(top_asins)[:TOP_DEALS]
+            updated = datetime.now().strftime('%Y-%m-%d %I:%M %p')
+            if self.render_mode == "sharded":
+                # Sharded pages are serialized and written one by one
+                with self.metrics.stage('serialize'):
+                    written = ShardedSiteBuilder(store, self.renderer, self.html_file).build(
+                        updated, self.changed_seqs, search_version, top_deals)
+            else:
+                with self.metrics.stage('serialize'):
+                    html = self.renderer.render_page(catalog.fragments_by_category(), updated,
+                                                     search_version=search_version, top_deals=top_deals)
+                with self.metrics.stage('write'):
+                    with open(self.html_file, 'w', encoding='utf-8') as f:
+                        f.write(html)
+                written = [self.html_file]
+            written += search_files
+            with self.metrics.stage('dedupe'):
+                self.asin_index.upsert_many(added_asins, SITE)
+                self.asin_index.remove_many(self.changes['removed'], SITE)
+            if self.retention:
+                with self.metrics.stage('retention'):
+                    self.retire(self.changes['evicted'])
+            self.metrics.gauge('files_written', len(written))
+            
+            print("\n📊 Summary:")
+            if self.refresh:
+                print(f"📦 Read {feed.read} products, {unchanged} unchanged")
+            else:
+                print(f"📦 Read {feed.read} products, skipped {feed.skipped} duplicates")
+            print(f"✅ Added {len(added_asins)} new products")
+            self.report_changes()
+            print(f"📋 Total products: {len(catalog)}")
+            print(f"📄 Wrote {len(written)} file(s): {', '.join(written[:5])}{' ...' if len(written) > 5 else ''}")
+            return True
+        finally:
+            store.close()
+    
+    def update_html_in_place(self):
+        """Add new products to the parsed index.html and write it back"""
         # Load existing HTML
-        soup = self.load_existing_html()
+        with self.metrics.stage('load'):
+            soup = self.load_existing_html()
         
-        # Get existing ASINs to avoid duplicates
-        self.existing_asins = self.get_existing_asins(soup)
-        print(f"📊 Found {len(self.existing_asins)} existing products")
+        # The page is the source of truth: it may have been regenerated, replaced or reset since the
+        # last run, so the shared ASIN index is reconciled with it (first_seen is kept for the rest)
+        with self.metrics.stage('dedupe'):
+            page_asins = self.get_existing_asins(soup)
+            indexed = set(self.asin_index.first_seen(SITE))
+            self.asin_index.upsert_many(page_asins - indexed, SITE)
+            self.asin_index.remove_many(indexed - page_asins, SITE)
+        print(f"📊 Found {len(page_asins)} existing products")
         
         # Load new products from JSON
         if not os.path.exists(self.json_file):
             print(f"❌ {self.json_file} not found!")
             return False
         
-        with open(self.json_file, 'r', encoding='utf-8') as f:
-            new_products = json.load(f)
-        
-        print(f"📦 Found {len(new_products)} products in {self.json_file}")
+        # Stream new products, skipping ones already on the page
+        feed = self.open_feed(lambda asin: asin in page_asins)
+        checker = self.open_link_checker()
         
         # Track added products by category
         category_counts = {cat: 0 for cat in self.valid_categories}
         category_counts['Other'] = 0
-        added_count = 0
+        added_asins = []
+        sections = self.index_category_sections(soup)
         
-        for product in new_products:
-            asin = product.get('asin', '')
+        for product in self.feed_products(feed, checker):
+            asin = product['asin']
             category = product.get('category', 'Home & Decor')  # Default category if not specified
-            
-            print(f"🔍 Checking product: {product.get('name', '')[:30]}... (Category: {category})")
-            
-            # Skip if already exists
-            if asin in self.existing_asins:
-                print(f"⏭️  Skipping duplicate: {product.get('name', '')[:40]}...")
+            if self.is_unwanted(product):
                 continue
             
-            # Get or create the appropriate category section
-            target_section = self.get_or_create_category_section(soup, category)
-            
-            # Create product element
-            product_elem = self.create_product_element(product)
+            print(f"🔍 Checking product: {product.get('name', '')[:30]}... (Category: {category})")
             
-            # Find the h2 tag and add product after it (newest first)
-            h2_tag = target_section.find('h2')
-            if h2_tag:
-                # Insert right after the h2 tag (newest products at top)
-                next_sibling = h2_tag.next_sibling
-                if next_sibling and next_sibling.name == 'div':
-                    # There are existing products, insert before the first one
-                    h2_tag.insert_after(product_elem)
+            with self.metrics.stage('render'):
+                # Get or create the appropriate category section
+                target_section = self.get_or_create_category_section(soup, category, sections)
+                
+                # Create product element
+                product_elem = self.create_product_element(product)
+                
+                # Find the h2 tag and add product after it (newest first)
+                h2_tag = target_section.find('h2')
+                if h2_tag:
+                    # Insert right after the h2 tag (newest products at top)
+                    next_sibling = h2_tag.next_sibling
+                    if next_sibling and next_sibling.name == 'div':
+                        # There are existing products, insert before the first one
+                        h2_tag.insert_after(product_elem)
+                    else:
+                        # No products yet in this category
+                        target_section.append(product_elem)
                 else:
-                    # No products yet in this category
                     target_section.append(product_elem)
-            else:
-                target_section.append(product_elem)
             
-            added_count += 1
+            added_asins.append(asin)
             
             # Track category counts
             if category in self.valid_categories:
@@ -184,6 +521,14 @@ h2 { color: #6b4c3b; border-bottom: 2px solid #c7a17a; padding-bottom: 10px; mar
                 category_counts['Other'] += 1
             
             print(f"✅ Added to {category}: {product.get('name', '')[:40]}...")
+        if checker:
+            checker.close()
+            print(f"🔗 Link check: {checker.summary()}")
+        
+        evicted = []
+        if self.retention:
+            with self.metrics.stage('retention'):
+                evicted = self.evict_from_page(sections)
         
         # Update timestamp
         time_elem = soup.find('span', id='update-time')
@@ -207,28 +552,144 @@ h2 { color: #6b4c3b; border-bottom: 2px solid #c7a17a; padding-bottom: 10px; mar
             time_elem.string = datetime.now().strftime('%Y-%m-%d %I:%M %p')
         
         # Save updated HTML
-        with open(self.html_file, 'w', encoding='utf-8') as f:
-            f.write(str(soup.prettify()))
+        with self.metrics.stage('serialize'):
+            html = str(soup.prettify())
+        with self.metrics.stage('write'):
+            with open(self.html_file, 'w', encoding='utf-8') as f:
+                f.write(html)
+        with self.metrics.stage('dedupe'):
+            self.asin_index.upsert_many(added_asins, SITE)
+        if self.retention:
+            with self.metrics.stage('retention'):
+                self.retire(evicted)
+            self.metrics.incr('products_evicted', len(evicted))
+        self.record_feed_metrics(feed, len(added_asins))
         
         print(f"\n📊 Summary:")
-        print(f"✅ Added {added_count} new products")
+        print(f"📦 Read {feed.read} products, skipped {feed.skipped} duplicates")
+        print(f"✅ Added {len(added_asins)} new products")
+        if evicted:
+            print(f"🧹 Evicted {len(evicted)} old products")
         for cat, count in category_counts.items():
             if count > 0:
                 print(f"   - {cat}: {count} products")
         print(f"📄 Updated {self.html_file}")
         
         return True
+    
+    def update_html(self):
+        """Main function to update HTML with new products organized by category"""
+        self.metrics = Metrics("generate_html", prom_file=self.prom_file)
+        self.metrics.gauge('render_mode_info', 1, mode=self.render_mode)
+        self.asin_index = AsinIndex(self.store_file)
+        try:
+            if self.render_mode in ("template", "sharded"):
+                success = self.update_html_from_store()
+            else:
+                success = self.update_html_in_place()
+            self.metrics.incr('runs', status='success' if success else 'failed')
+            return success
+        except Exception:
+            self.metrics.incr('runs', status='error')
+            raise
+        finally:
+            self.asin_index.close()
+            self.asin_index = None
+            self.finish_metrics()
+    
+    def finish_metrics(self):
+        """Derive throughput and write the run's metrics"""
+        elapsed = self.metrics.elapsed()
+        added = self.metrics.counters.get('products_added', 0)
+        self.metrics.gauge('products_per_second', round(added / elapsed, 2) if elapsed else 0)
+        snapshot = self.metrics.flush()
+        stages = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in snapshot['stage_seconds'].items())
+        print(f"⏱️  {elapsed:.2f}s total ({stages})")
+
+def build_and_publish(updater, build_dir=None, publish=False):
+    """Optional steps after a successful update: static build, then git publishing"""
+    if build_dir:
+        build = StaticBuild(os.path.dirname(updater.html_file) or '.', build_dir)
+        written = build.run()
+        print(f"📦 Built {len(build.outputs)} file(s) into {build_dir}, {len(written)} changed")
+    if publish:
+        result = GitPublisher().publish()
+        print(f"🚀 Published: {len(result['staged'])} file(s) staged, "
+              f"{'committed' if result['commit'] else 'no commit'}, {'pushed' if result['pushed'] else 'not pushed'}")
 
 # Main execution
 if __name__ == "__main__":
     print("🌐 PANDALOON WEBSITE UPDATER WITH CATEGORIES")
     print("="*60)
     
-    updater = WebsiteUpdater()
-    success = updater.update_html()
+    parser = argparse.ArgumentParser(description="Update the PandaLoon deals page")
+    parser.add_argument('--mode', choices=['soup', 'template', 'sharded'], default='soup',
+                        help="soup: edit index.html in place, template: render from the product store, "
+                             "sharded: paginated category pages plus a small index page")
+    parser.add_argument('--feed', action='append', default=[], metavar='FILE',
+                        help="additional product feed to merge (JSON array or JSON lines), repeatable")
+    parser.add_argument('--images', action='store_true',
+                        help="template/sharded modes: serve resized WebP/JPEG variants from images/cache")
+    parser.add_argument('--prom-file', metavar='FILE',
+                        help="also write run metrics in Prometheus text format to FILE")
+    parser.add_argument('--refresh', action='store_true',
+                        help="template/sharded modes: re-render products whose price, discount or image "
+                             "changed and drop products that are no longer in the feed")
+    parser.add_argument('--changes-file', metavar='FILE',
+                        help="template/sharded modes: write the run's change set (added/updated/removed ASINs) as JSON")
+    parser.add_argument('--retention', action='store_true',
+                        help="evict deals past their category TTL or beyond the category size cap (see retention.py)")
+    parser.add_argument('--archive', nargs='?', const=ARCHIVE_DIR, metavar='DIR',
+                        help=f"with --retention: append evicted deals to monthly .jsonl.gz files in DIR "
+                             f"(default: {ARCHIVE_DIR})")
+    parser.add_argument('--build', nargs='?', const=BUILD_DIR, metavar='DIR',
+                        help=f"after updating, write a minified, fingerprinted, precompressed copy of the site "
+                             f"to DIR (default: {BUILD_DIR})")
+    parser.add_argument('--search', action='store_true',
+                        help="template/sharded modes: maintain a sharded search index in search/ and add a search box")
+    parser.add_argument('--check-links', action='store_true',
+                        help="check image and affiliate links of feed products first and quarantine broken ones "
+                             "(see link_check.py)")
+    parser.add_argument('--prices', action='store_true',
+                        help="template/sharded modes: record feed prices and add a top deals section "
+                             "(see price_history.py)")
+    parser.add_argument('--publish', action='store_true',
+                        help="after updating, commit and push the changed site files (see git_publisher.py)")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running and update again whenever the feed, the product store or images/ change")
+    parser.add_argument('--interval', type=float, default=POLL_SECONDS,
+                        help=f"with --watch: seconds between change checks (default: {POLL_SECONDS:g})")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help=f"with --watch: quiet seconds after the last change before updating "
+                             f"(default: {DEBOUNCE_SECONDS:g})")
+    args = parser.parse_args()
+    if args.archive and not args.retention:
+        parser.error("--archive needs --retention")
+    if args.refresh and args.mode == 'soup':
+        parser.error("--refresh needs --mode template or --mode sharded")
     
-    if success:
+    updater = WebsiteUpdater(render_mode=args.mode)
+    updater.extra_json_files = args.feed
+    updater.process_images = args.images
+    updater.prom_file = args.prom_file
+    updater.refresh = args.refresh
+    updater.changes_file = args.changes_file
+    if args.search and args.mode == 'soup':
+        parser.error("--search needs --mode template or --mode sharded")
+    updater.search = args.search
+    updater.check_links = args.check_links
+    if args.prices and args.mode == 'soup':
+        parser.error("--prices needs --mode template or --mode sharded")
+    updater.track_prices = args.prices
+    if args.retention:
+        updater.retention = RetentionPolicy()
+        updater.archive = DealArchive(args.archive) if args.archive else None
+    if args.watch:
+        SiteWatcher(updater, interval=args.interval, debounce=args.debounce,
+                    on_update=lambda: build_and_publish(updater, args.build, args.publish)).run()
+    elif updater.update_html():
         print("\n✅ Website updated successfully!")
         print(f"📄 Open {updater.html_file} in your browser")
+        build_and_publish(updater, args.build, args.publish)
     else:
         print("\n❌ Update failed!")
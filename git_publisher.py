@@ -0,0 +1,172 @@
+"""
+git_publisher.py - Incremental git publishing of the generated site
+
+Stages only site outputs whose content changed, never makes empty commits,
+coalesces several generator runs into one commit and pushes on a debounce
+interval:
+    python git_publisher.py                       # commit and push what changed
+    python git_publisher.py --commit-interval 600 --push-interval 1800
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+
+# What the hosted site is made of, relative to the repository root
+PUBLISH_PATHS = ("index.html", "deals", "images", "search", "Pandaloon_logo.png", "dist")
+REMOTE = "origin"
+BRANCH = "main"
+COMMIT_INTERVAL_SECONDS = 0  # Coalescing window: changes are committed at most this often
+PUSH_INTERVAL_SECONDS = 0  # Debounce: commits are pushed at most this often
+STATE_FILE = "pandaloon-publish.json"  # Kept inside .git, never committed
+MESSAGE_FILES = 20  # Changed files listed in the commit message
+
+
+class GitError(RuntimeError):
+    pass
+
+
+class GitPublisher:
+    """Publishes site outputs from a working tree to a remote branch.
+
+    Every call to publish() stages the changed outputs; git compares file
+    contents, so rewritten-but-identical files are not staged. A commit is
+    made only when something is staged and the coalescing window has passed,
+    and it is pushed only when the push interval has passed. Whatever is left
+    staged or unpushed is picked up by the next call (or by flush=True).
+    """
+
+    def __init__(self, repo_dir='.', remote=REMOTE, branch=BRANCH, paths=PUBLISH_PATHS,
+                 commit_interval=COMMIT_INTERVAL_SECONDS, push_interval=PUSH_INTERVAL_SECONDS, clock=time.time):
+        self.repo_dir = repo_dir
+        self.remote = remote
+        self.branch = branch
+        self.paths = paths
+        self.commit_interval = commit_interval
+        self.push_interval = push_interval
+        self.clock = clock
+        self.state_file = os.path.join(self.git('rev-parse', '--absolute-git-dir').strip(), STATE_FILE)
+        self.state = self.load_state()
+
+    def git(self, *args):
+        """Run a git command in the repository; raises GitError on a non-zero exit"""
+        result = subprocess.run(['git', *args], cwd=self.repo_dir, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise GitError(f"git {' '.join(args)} failed: {(result.stderr or result.stdout).strip()}")
+        return result.stdout
+
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'last_commit': 0, 'last_push': 0, 'pushed_head': None, 'pending_runs': 0}
+
+    def save_state(self):
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+
+    def changed_paths(self):
+        """Output files whose working tree content differs from the index (modified, new or deleted)"""
+        output = self.git('status', '--porcelain', '-z', '--no-renames', '--untracked-files=all',
+                          '--', *self.paths)
+        # Entries are "XY path"; Y is the working tree status, ' ' when the change is already staged
+        return [entry[3:] for entry in output.split('\0') if entry and entry[1] != ' ']
+
+    def stage(self):
+        """Stage changed outputs (including deletions); returns the paths staged"""
+        changed = self.changed_paths()
+        if changed:
+            self.git('add', '--all', '--', *changed)
+        return changed
+
+    def staged_paths(self):
+        """Staged outputs; anything else staged in the repository is left alone"""
+        return self.git('diff', '--cached', '--name-only', '--no-renames', '--', *self.paths).splitlines()
+
+    def commit(self):
+        """Commit the staged outputs; returns the new commit hash or None when nothing is staged"""
+        staged = self.staged_paths()
+        if not staged:
+            return None
+        runs = max(1, self.state['pending_runs'])
+        subject = f"Update deals: {len(staged)} file(s) from {runs} run(s)"
+        listed = staged[:MESSAGE_FILES]
+        body = '\n'.join(listed + ([f"... and {len(staged) - len(listed)} more"] if len(staged) > len(listed) else []))
+        self.git('commit', '--quiet', '-m', subject, '-m', body, '--', *staged)
+        self.state['last_commit'] = self.clock()
+        self.state['pending_runs'] = 0
+        return self.git('rev-parse', 'HEAD').strip()
+
+    def push(self):
+        """Push HEAD to the remote branch; returns True if something was pushed"""
+        head = self.git('rev-parse', 'HEAD').strip()
+        if head == self.state['pushed_head']:
+            return False
+        self.git('push', '--quiet', self.remote, f"HEAD:{self.branch}")
+        self.state['last_push'] = self.clock()
+        self.state['pushed_head'] = head
+        return True
+
+    def has_commits(self):
+        try:
+            self.git('rev-parse', '--verify', '--quiet', 'HEAD')
+            return True
+        except GitError:
+            return False
+
+    def publish(self, flush=False):
+        """Stage, then commit and push if their intervals have passed (or flush is set).
+
+        Returns {'staged': [...], 'commit': hash or None, 'pushed': bool}.
+        """
+        now = self.clock()
+        staged = self.stage()
+        if staged:
+            # Runs that changed nothing are not part of the next commit
+            self.state['pending_runs'] += 1
+        commit = None
+        pushed = False
+        try:
+            if flush or now - self.state['last_commit'] >= self.commit_interval:
+                commit = self.commit()
+            if self.has_commits() and (flush or now - self.state['last_push'] >= self.push_interval):
+                pushed = self.push()
+        finally:
+            self.save_state()
+        return {'staged': staged, 'commit': commit, 'pushed': pushed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commit and push changed site outputs")
+    parser.add_argument('paths', nargs='*', default=list(PUBLISH_PATHS),
+                        help=f"outputs to publish (default: {' '.join(PUBLISH_PATHS)})")
+    parser.add_argument('--repo', default='.', help="repository directory (default: current)")
+    parser.add_argument('--remote', default=REMOTE, help=f"remote name or URL (default: {REMOTE})")
+    parser.add_argument('--branch', default=BRANCH, help=f"remote branch (default: {BRANCH})")
+    parser.add_argument('--commit-interval', type=float, default=COMMIT_INTERVAL_SECONDS,
+                        help="seconds to coalesce runs into one commit (default: commit every run)")
+    parser.add_argument('--push-interval', type=float, default=PUSH_INTERVAL_SECONDS,
+                        help="minimum seconds between pushes (default: push every commit)")
+    parser.add_argument('--flush', action='store_true', help="commit and push now, ignoring the intervals")
+    args = parser.parse_args()
+
+    publisher = GitPublisher(args.repo, args.remote, args.branch, args.paths,
+                             args.commit_interval, args.push_interval)
+    result = publisher.publish(flush=args.flush)
+    stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"[{stamp}] 📝 Staged {len(result['staged'])} changed file(s)")
+    if result['commit']:
+        print(f"[{stamp}] ✅ Committed {result['commit'][:10]}")
+    elif not publisher.staged_paths():
+        print(f"[{stamp}] 💤 Nothing to commit")
+    else:
+        print(f"[{stamp}] ⏳ Changes staged, commit deferred (--commit-interval)")
+    if result['pushed']:
+        print(f"[{stamp}] 🚀 Pushed to {args.remote}/{args.branch}")
+
+
+if __name__ == "__main__":
+    main()
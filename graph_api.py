@@ -0,0 +1,234 @@
+"""
+graph_api.py - Instagram Graph API client with connection pooling, retries and latency tracking
+"""
+
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://graph.facebook.com/v18.0"
+
+# (connect, read) timeouts in seconds per endpoint
+TIMEOUTS = {
+    'account': (3.05, 10),
+    'media': (3.05, 30),
+    'container_status': (3.05, 10),
+    'media_publish': (3.05, 30),
+}
+DEFAULT_TIMEOUT = (3.05, 20)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613}  # Graph API throttling error codes
+USAGE_HEADERS = ('X-Business-Use-Case-Usage', 'X-App-Usage')
+LATENCY_SAMPLES = 500  # Recent samples kept per endpoint for percentiles
+
+
+class GraphAPIClient:
+    """Thin Graph API client shared by every call the poster makes.
+
+    Calls go through one pooled requests.Session (keep-alive), use per-endpoint
+    timeouts and are retried on 429/5xx and connection errors with exponential
+    backoff and full jitter. Retry-After and the Graph usage headers take
+    precedence over the computed backoff. Methods return the final
+    requests.Response; connection errors are raised once retries run out.
+    Publishing is the exception: it is not idempotent, so it is only retried
+    after the container status shows the failed attempt did not publish.
+    """
+
+    def __init__(self, access_token, base_url=DEFAULT_BASE_URL, max_retries=4, backoff_base=1.0,
+                 backoff_max=60.0, pool_size=10, sleep=time.sleep, metrics=None):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.metrics = metrics  # Optional metrics.Metrics receiving latency and request counters
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+        self.call_counts = defaultdict(int)
+        self.usage = {}  # Last usage header seen, decoded
+
+    # -------------------------------------
+    # Endpoints
+    # -------------------------------------
+
+    def get_account(self, account_id, fields='username,followers_count,media_count'):
+        return self.request('GET', account_id, 'account', params={'fields': fields})
+
+    def create_media(self, account_id, **params):
+        return self.request('POST', f"{account_id}/media", 'media', data=params)
+
+    def get_container_status(self, creation_id):
+        return self.request('GET', creation_id, 'container_status', params={'fields': 'status_code'})
+
+    def publish_media(self, account_id, creation_id):
+        """Publish a container; a container found PUBLISHED after a failed attempt counts as published"""
+        for attempt in range(self.max_retries + 1):
+            error = None
+            try:
+                response = self.request('POST', f"{account_id}/media_publish", 'media_publish',
+                                        data={'creation_id': creation_id}, retry=False)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
+            if response is not None and response.status_code == 200:
+                return response
+            # The attempt may have published before failing (lost answer, "already published")
+            if self.container_published(creation_id):
+                return self.already_published(creation_id)
+            if response is not None and not self.should_retry(response):
+                return response
+            delay = self.backoff(attempt) if response is None else self.retry_delay(response, attempt)
+            if attempt == self.max_retries or delay is None:
+                if error:
+                    raise error
+                return response
+            self.record_retry('media_publish')
+            self.sleep(delay)
+
+    def container_published(self, creation_id):
+        """Whether Instagram reports the container as PUBLISHED; errors propagate, so an unknown state is never retried"""
+        response = self.get_container_status(creation_id)
+        return response.status_code == 200 and response.json().get('status_code') == 'PUBLISHED'
+
+    @staticmethod
+    def already_published(creation_id):
+        """Successful publish response for a container an earlier attempt published (media id unknown)"""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps({'id': None, 'creation_id': creation_id}).encode('utf-8')
+        return response
+
+    # -------------------------------------
+    # Transport
+    # -------------------------------------
+
+    def request(self, method, path, endpoint, params=None, data=None, retry=True):
+        """Send a request (with retries unless retry=False); returns the last response"""
+        params = dict(params or {})
+        data = dict(data) if data is not None else None
+        # The token goes where the Graph API expects it for the method
+        (data if method == 'POST' else params)['access_token'] = self.access_token
+        url = f"{self.base_url}/{path}"
+        timeout = TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+        retries = self.max_retries if retry else 0
+
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, data=data, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self.record_latency(endpoint, time.perf_counter() - start, 'error')
+                if attempt == retries:
+                    raise
+                self.record_retry(endpoint)
+                self.sleep(self.backoff(attempt))
+                continue
+            self.record_latency(endpoint, time.perf_counter() - start, response.status_code)
+            self.record_usage(response)
+
+            if not self.should_retry(response) or attempt == retries:
+                return response
+            delay = self.retry_delay(response, attempt)
+            if delay is None:
+                return response
+            self.record_retry(endpoint)
+            self.sleep(delay)
+        return response
+
+    def should_retry(self, response):
+        if response.status_code in RETRY_STATUSES:
+            return True
+        return self.error_code(response) in RATE_LIMIT_ERROR_CODES
+
+    @staticmethod
+    def error_code(response):
+        try:
+            return response.json().get('error', {}).get('code')
+        except (ValueError, AttributeError):
+            return None
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retry_delay(self, response, attempt):
+        """Seconds to wait before retrying, or None if the server asks for longer than backoff_max"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.regain_access_seconds(response)
+            if delay is None:
+                return self.backoff(attempt)
+        return delay if delay <= self.backoff_max else None
+
+    def regain_access_seconds(self, response):
+        """Largest estimated_time_to_regain_access (minutes in the header) across usage headers"""
+        minutes = []
+        for header in USAGE_HEADERS:
+            value = response.headers.get(header)
+            if not value:
+                continue
+            try:
+                usage = json.loads(value)
+                if header == 'X-Business-Use-Case-Usage':
+                    # Maps business IDs to lists of usage entries
+                    entries = [entry for group in usage.values() for entry in group]
+                else:
+                    entries = [usage]
+                minutes.extend(entry.get('estimated_time_to_regain_access', 0) for entry in entries)
+            except (ValueError, AttributeError, TypeError):
+                continue
+        if not minutes or max(minutes) <= 0:
+            return None
+        return max(minutes) * 60.0
+
+    def record_usage(self, response):
+        for header in USAGE_HEADERS:
+            value = response.headers.get(header)
+            if value:
+                try:
+                    self.usage[header] = json.loads(value)
+                except ValueError:
+                    pass
+
+    def record_latency(self, endpoint, seconds, status):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.call_counts[endpoint] += 1
+        if self.metrics:
+            self.metrics.observe('graph_api_latency_seconds', seconds, endpoint=endpoint)
+            self.metrics.incr('graph_api_requests', endpoint=endpoint, status=status)
+
+    def record_retry(self, endpoint):
+        if self.metrics:
+            self.metrics.incr('graph_api_retries', endpoint=endpoint)
+
+    def latency_summary(self):
+        """Per-endpoint call count and latency percentiles in milliseconds"""
+        summary = {}
+        with self.lock:
+            for endpoint, samples in self.latencies.items():
+                ordered = sorted(samples)
+                summary[endpoint] = {
+                    'calls': self.call_counts[endpoint],
+                    'avg_ms': round(sum(ordered) / len(ordered) * 1000, 1),
+                    'p50_ms': round(ordered[len(ordered) // 2] * 1000, 1),
+                    'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                    'max_ms': round(ordered[-1] * 1000, 1),
+                }
+        return summary
+
+    def close(self):
+        self.session.close()
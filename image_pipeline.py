@@ -0,0 +1,152 @@
+"""
+image_pipeline.py - Right-sized WebP/JPEG product image variants in a content-addressed cache
+"""
+
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+CACHE_DIR = "images/cache"  # Relative to the site root, published with the site
+WIDTHS = (220, 440)  # Display width of .product img and its 2x variant
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+DOWNLOAD_TIMEOUT = (3.05, 20)
+DOWNLOAD_WORKERS = 8
+
+
+def encode_variants(data, source_hash, output_dir, widths):
+    """Resize one source image to each width as WebP and JPEG (runs in a worker process).
+
+    Returns the list of (width, height) pairs written. Sources narrower than a
+    width are not upscaled; the source width is used instead.
+    """
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    sizes = []
+    for width in sorted({min(width, image.width) for width in widths}):
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        resized.save(os.path.join(output_dir, f"{source_hash}-{width}.webp"), 'WEBP', quality=WEBP_QUALITY)
+        if resized.mode == 'RGBA':
+            flattened = Image.new('RGB', resized.size, (255, 255, 255))
+            flattened.paste(resized, mask=resized.getchannel('A'))
+            resized = flattened
+        resized.save(os.path.join(output_dir, f"{source_hash}-{width}.jpg"), 'JPEG',
+                     quality=JPEG_QUALITY, optimize=True, progressive=True)
+        sizes.append((width, height))
+    return sizes
+
+
+class ImagePipeline:
+    """Turns product image sources (URLs or site-relative paths) into cached variants.
+
+    Variants are named after the SHA-256 of the source bytes, so an image is
+    encoded once no matter how many products or builds reference it. The
+    manifest remembers which hash each remote URL resolved to, so unchanged
+    remote images are not downloaded again either.
+    """
+
+    def __init__(self, site_root='.', cache_dir=CACHE_DIR, widths=WIDTHS, workers=None):
+        self.site_root = site_root
+        self.cache_dir = cache_dir
+        self.widths = widths
+        self.workers = workers
+        self.output_dir = os.path.join(site_root, cache_dir)
+        self.manifest_file = os.path.join(self.output_dir, 'manifest.json')
+        self.session = requests.Session()
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'sources': {}, 'variants': {}}
+
+    def save_manifest(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def read_source(self, source):
+        """Return the bytes of an image source"""
+        if source.startswith(('http://', 'https://')):
+            response = self.session.get(source, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+            return response.content
+        with open(os.path.join(self.site_root, source), 'rb') as f:
+            return f.read()
+
+    def resolve(self, source):
+        """Return (source_hash, bytes or None); bytes are only read when the hash is not known yet"""
+        known_hash = self.manifest['sources'].get(source)
+        # Remote product images do not change behind their URL; local files might
+        if source.startswith(('http://', 'https://')) and known_hash in self.manifest['variants']:
+            return known_hash, None
+        data = self.read_source(source)
+        return hashlib.sha256(data).hexdigest()[:20], data
+
+    def process(self, sources):
+        """Return {source: variant info} for every source that could be processed"""
+        sources = [source for source in dict.fromkeys(sources) if source]
+        if not sources:
+            return {}
+
+        resolved = {}
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as downloads:
+            for source, result in zip(sources, downloads.map(self.safe_resolve, sources)):
+                if result:
+                    resolved[source] = result
+
+        # Encode each unknown hash once, on a process pool
+        pending = {}
+        for source, (source_hash, data) in resolved.items():
+            self.manifest['sources'][source] = source_hash
+            if source_hash not in self.manifest['variants'] and source_hash not in pending:
+                pending[source_hash] = data
+        if pending:
+            os.makedirs(self.output_dir, exist_ok=True)
+            print(f"🖼️  Encoding {len(pending)} new image(s)")
+            with ProcessPoolExecutor(max_workers=self.workers) as encoders:
+                futures = {source_hash: encoders.submit(encode_variants, data, source_hash,
+                                                        self.output_dir, self.widths)
+                           for source_hash, data in pending.items()}
+                for source_hash, future in futures.items():
+                    try:
+                        self.manifest['variants'][source_hash] = future.result()
+                    except Exception as e:
+                        print(f"⚠️ Could not encode image {source_hash}: {e}")
+        self.save_manifest()
+
+        return {source: self.variant_info(source_hash)
+                for source, (source_hash, _) in resolved.items()
+                if source_hash in self.manifest['variants']}
+
+    def safe_resolve(self, source):
+        try:
+            return self.resolve(source)
+        except Exception as e:
+            print(f"⚠️ Could not read image {source[:60]}: {type(e).__name__}")
+            return None
+
+    def variant_info(self, source_hash):
+        """src/srcset attributes for the cached variants of a source hash"""
+        sizes = self.manifest['variants'][source_hash]
+        prefix = f"{self.cache_dir}/{source_hash}"
+        width, height = sizes[0]
+        return {
+            'src': f"{prefix}-{width}.jpg",
+            'width': width,
+            'height': height,
+            'jpeg_srcset': ', '.join(f"{prefix}-{w}.jpg {w}w" for w, _ in sizes),
+            'webp_srcset': ', '.join(f"{prefix}-{w}.webp {w}w" for w, _ in sizes),
+        }
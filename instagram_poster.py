@@ -2,11 +2,25 @@
 instagram_poster_updated.py - Posts every 1 minute, maximum 5 posts per run
 """
 
-import requests
+import argparse
 import json
+import multiprocessing
 import time
 from datetime import datetime, timedelta
 import os
+from accounts import ACCOUNTS_FILE, Account, AccountRouter, load_accounts
+from asin_index import AsinIndex, INSTAGRAM
+from carousel import CAROUSEL_SIZE, GROUP_BY, CarouselPipeline, group_products
+from graph_api import GraphAPIClient
+from job_queue import JobQueue
+from link_check import LinkChecker
+from metrics import Metrics
+from posting_daemon import PostingDaemon
+from posting_pipeline import PostingPipeline
+from posting_scheduler import SCORES, SLOT_TIMES, PostingScheduler, deal_score, feed_order_score, load_score
+from price_history import PriceHistory
+from product_feed import ProductFeed
+from product_fields import CATEGORIES, DEFAULT_CATEGORY
 
 # =====================================
 # INSTAGRAM CONFIGURATION
@@ -14,38 +28,62 @@ import os
 
 ACCESS_TOKEN = "EAAKkJ9FFnoQBPKdZCZBsq7x4TybK7uZAJcFNeh2ZBVrtPma24E7zttN315MdQva1XQCYBhqPzqmBQANZArWZA9tJHDRSQbgnSWZBdJ1rKPInFXZCscyZBcMUwSWsd4wzfvq8GnxB6rkpRSmR89ZC8sHzMZAa1XtlRAPBZBkOZAk854R3keoYGPUuvyXuQUubdU8JBjoMTvXGKNr8ZAJ17TuJ46jMSWDZBIXVQx9ob1M"
 INSTAGRAM_ACCOUNT_ID = "17841476036673024"
-BASE_URL = "https://graph.facebook.com/v18.0"
+BASE_URL = os.environ.get("GRAPH_API_BASE_URL", "https://graph.facebook.com/v18.0")  # Override to use mock_graph_api.py
 
 # Posting configuration
 POSTING_INTERVAL_MINUTES = 1  # Time between posts (1 minute)
 MAX_POSTS_PER_RUN = 5  # Maximum posts per execution
 JSON_FILE = "insta_ready.json"  # File created by scraper
+POST_FIELDS = ('asin', 'name', 'price', 'image_url', 'caption')  # Needed to publish a product
 
-POSTED_FILE = "posted_products.json"  # Track what's already posted
+POSTED_FILE = "posted_products.json"  # Legacy history, imported into the ASIN index once
+
+# Pipeline configuration
+POSTS_PER_HOUR = 10  # Publish budget enforced by the pipeline's token bucket
+PIPELINE_WORKERS = 4  # Media containers created in parallel
+STATUS_POLL_SECONDS = 2  # Time between container status checks
+STATUS_TIMEOUT_SECONDS = 120  # Give up on a container that never finishes processing
+CAROUSEL_GROUP_BY = "category"  # Carousel mode groups products by "category" or "discount"
+VALIDATE_PRODUCTS = MAX_POSTS_PER_RUN * CAROUSEL_SIZE  # Valid products wanted from the link pre-flight check
+TOP_DEALS_TO_POST = VALIDATE_PRODUCTS  # Best deals (see price_history.py) moved to the front with --deals-first
+
+# The account above, used when accounts.json does not exist; keeps the original "instagram" history
+DEFAULT_ACCOUNT = Account("pandaloon", INSTAGRAM_ACCOUNT_ID, ACCESS_TOKEN, channel=INSTAGRAM)
 
 class InstagramAutoPoster:
-    def __init__(self):
+    def __init__(self, prom_file=None, account=None, accepts=None):
+        self.account = account or DEFAULT_ACCOUNT
+        self.channel = self.account.channel  # ASIN index channel holding this account's history
+        self.accepts = accepts  # Optional predicate for the products routed to this account
+        self.deals_first = False  # Post the best deals of the price history first (instead of by score)
+        self.score = deal_score  # Posting priority, see posting_scheduler.py
         self.products = []
         self.posted = []
         self.failed = []
-        self.already_posted_asins = self.load_posted_history()
+        component = "instagram_poster" if account is None else f"instagram_poster_{self.account.name}"
+        self.metrics = Metrics(component, prom_file=prom_file)
+        self.asin_index = self.load_posted_history()
+        self.client = GraphAPIClient(self.account.access_token, base_url=BASE_URL, pool_size=PIPELINE_WORKERS * 2,
+                                     metrics=self.metrics)
         
     def load_posted_history(self):
-        """Load history of already posted products"""
-        if os.path.exists(POSTED_FILE):
+        """Open the shared ASIN index, importing the legacy JSON history on first use"""
+        asin_index = AsinIndex()
+        if self.channel == INSTAGRAM and asin_index.count(INSTAGRAM) == 0 and os.path.exists(POSTED_FILE):
             with open(POSTED_FILE, 'r', encoding='utf-8') as f:
                 posted_data = json.load(f)
-                return set(posted_data.get('posted_asins', []))
-        return set()
-    
-    def save_posted_history(self):
-        """Save posted products history"""
-        posted_data = {
-            'posted_asins': list(self.already_posted_asins),
-            'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        with open(POSTED_FILE, 'w', encoding='utf-8') as f:
-            json.dump(posted_data, f, indent=2)
+            asin_index.upsert_many(posted_data.get('posted_asins', []), INSTAGRAM)
+            print(f"📥 Imported {asin_index.count(INSTAGRAM)} posted ASINs from {POSTED_FILE}")
+        return asin_index
+    
+    def reset_posted_history(self):
+        """Forget every product posted to this account so all of them can be re-posted"""
+        legacy = self.channel == INSTAGRAM and os.path.exists(POSTED_FILE)
+        had_history = self.asin_index.count(self.channel) > 0 or legacy
+        self.asin_index.clear(self.channel)
+        if legacy:
+            os.remove(POSTED_FILE)
+        return had_history
         
     def load_products(self):
         """Load products from JSON file"""
@@ -54,32 +92,63 @@ class InstagramAutoPoster:
             print("Please run 'python final_scraper.py' first!")
             return False
         
-        with open(JSON_FILE, 'r', encoding='utf-8') as f:
-            all_products = json.load(f)
-        
-        # Filter out already posted products
-        self.products = []
-        for product in all_products:
-            asin = product.get('asin', '')
-            if asin and asin not in self.already_posted_asins:
-                self.products.append(product)
+        # Stream the feed, filtering out already posted products as it is read
+        is_posted = lambda asin: self.asin_index.contains(asin, self.channel)
+        feed = ProductFeed(JSON_FILE, required_fields=POST_FIELDS,
+                           skip_asin=self.metrics.timed('dedupe', is_posted))
+        with self.metrics.stage('load'):
+            self.products = [product for product in feed if not self.accepts or self.accepts(product)]
+        if self.deals_first:
+            self.products = self.rank_deals(self.products)
+        else:
+            # Only the products a run can use need to be in score order
+            self.products = PostingScheduler.best_first(self.products, VALIDATE_PRODUCTS, self.score)
+        self.metrics.incr('products_read', feed.read)
+        self.metrics.incr('products_skipped', feed.skipped)
         
-        print(f"📊 Total products in file: {len(all_products)}")
+        print(f"📊 Total products in file: {feed.read}")
         print(f"✅ New products to post: {len(self.products)}")
-        print(f"⏭️  Already posted: {len(self.already_posted_asins)}")
+        print(f"⏭️  Already posted: {self.asin_index.count(self.channel)}")
         
         return True
     
+    def rank_deals(self, products):
+        """Record the feed's prices and move the best deals to the front (--deals-first)"""
+        history = PriceHistory(metrics=self.metrics)
+        try:
+            with self.metrics.stage('prices'):
+                history.ingest(ProductFeed(JSON_FILE))
+                ranked = history.rank_first(products, TOP_DEALS_TO_POST)
+            tracked = history.count()
+        finally:
+            history.close()
+        print(f"📈 Best deals first ({tracked} products in the price history)")
+        return ranked
+    
+    def validate_products(self, needed=VALIDATE_PRODUCTS):
+        """Check links of the next products until `needed` pass; broken ones are quarantined and dropped"""
+        checker = LinkChecker(metrics=self.metrics)
+        valid, quarantined, position = [], [], 0
+        try:
+            with self.metrics.stage('validate'):
+                while len(valid) < needed and position < len(self.products):
+                    batch = self.products[position:position + needed - len(valid)]
+                    position += len(batch)
+                    passed, failed = checker.validate(batch)
+                    valid += passed
+                    quarantined += failed
+        finally:
+            checker.close()
+        # Products beyond the checked ones are kept for later runs
+        self.products = valid + self.products[position:]
+        print(f"🔗 Link check: {checker.summary()}")
+        print(f"🚧 Quarantined: {len(quarantined)}")
+        return quarantined
+    
     def test_connection(self):
         """Test Instagram connection"""
-        url = f"{BASE_URL}/{INSTAGRAM_ACCOUNT_ID}"
-        params = {
-            'fields': 'username,followers_count,media_count',
-            'access_token': ACCESS_TOKEN
-        }
-        
         try:
-            response = requests.get(url, params=params)
+            response = self.client.get_account(self.account.account_id)
             if response.status_code == 200:
                 data = response.json()
                 print(f"✅ Connected to @{data.get('username', 'Unknown')}")
@@ -93,45 +162,114 @@ class InstagramAutoPoster:
             print(f"❌ Connection error: {e}")
             return False
     
+    def create_media(self, **params):
+        """Create a media container, returns (success, creation_id or error)"""
+        create_response = self.client.create_media(self.account.account_id, **params)
+        
+        if create_response.status_code != 200:
+            return False, f"Media creation failed: {create_response.text}"
+        return True, create_response.json().get('id')
+    
+    def create_container(self, product):
+        """Create a media container for a product, returns (success, creation_id or error)"""
+        return self.create_media(image_url=product['image_url'], caption=product['caption'])
+    
+    def create_carousel_item(self, product):
+        """Create a carousel child container (no caption), returns (success, creation_id or error)"""
+        return self.create_media(image_url=product['image_url'], is_carousel_item='true')
+    
+    def create_carousel(self, children, caption):
+        """Create a carousel container from processed children, returns (success, creation_id or error)"""
+        return self.create_media(media_type='CAROUSEL', children=','.join(children), caption=caption)
+    
+    def container_status(self, creation_id):
+        """Current status_code of a container (IN_PROGRESS, FINISHED, PUBLISHED, ERROR, EXPIRED)"""
+        response = self.client.get_container_status(creation_id)
+        if response.status_code != 200:
+            raise RuntimeError(f"Status check failed: {response.text}")
+        return response.json().get('status_code')
+    
+    def wait_for_container(self, creation_id):
+        """Poll a container until Instagram has processed it, returns (ready, error)"""
+        deadline = time.monotonic() + STATUS_TIMEOUT_SECONDS
+        
+        while True:
+            try:
+                status = self.container_status(creation_id)
+            except RuntimeError as e:
+                return False, str(e)
+            if status == 'FINISHED':
+                return True, None
+            if status in ('ERROR', 'EXPIRED'):
+                return False, f"Container {creation_id} status: {status}"
+            if time.monotonic() >= deadline:
+                return False, f"Container {creation_id} not ready after {STATUS_TIMEOUT_SECONDS}s"
+            time.sleep(STATUS_POLL_SECONDS)
+    
+    def publish_container(self, creation_id):
+        """Publish a processed container, returns (success, post_id or error)"""
+        publish_response = self.client.publish_media(self.account.account_id, creation_id)
+        
+        if publish_response.status_code == 200:
+            return True, publish_response.json().get('id')
+        return False, f"Publishing failed: {publish_response.text}"
+    
+    def prepare_post(self, product):
+        """Create a container and wait until it is ready to publish, returns (success, creation_id or error)"""
+        return self.prepare(self.create_container, product)
+    
+    def prepare_carousel_item(self, product):
+        return self.prepare(self.create_carousel_item, product)
+    
+    def prepare_carousel(self, children, caption):
+        return self.prepare(self.create_carousel, children, caption)
+    
+    def prepare(self, create, *args):
+        """Create a container with create(*args) and wait until it is processed"""
+        try:
+            success, creation_id = create(*args)
+            if not success:
+                return False, creation_id
+            ready, error = self.wait_for_container(creation_id)
+            if not ready:
+                return False, error
+            return True, creation_id
+        except Exception as e:
+            return False, str(e)
+    
     def post_to_instagram(self, product):
         """Post a single product to Instagram"""
+        success, result = self.prepare_post(product)
+        if not success:
+            return False, result
         try:
-            # Step 1: Create media container
-            create_url = f"{BASE_URL}/{INSTAGRAM_ACCOUNT_ID}/media"
-            create_params = {
-                'image_url': product['image_url'],
-                'caption': product['caption'],
-                'access_token': ACCESS_TOKEN
-            }
-            
-            create_response = requests.post(create_url, data=create_params)
-            
-            if create_response.status_code != 200:
-                return False, f"Media creation failed: {create_response.text}"
-            
-            creation_id = create_response.json().get('id')
-            
-            # Wait for processing
-            time.sleep(5)
-            
-            # Step 2: Publish
-            publish_url = f"{BASE_URL}/{INSTAGRAM_ACCOUNT_ID}/media_publish"
-            publish_params = {
-                'creation_id': creation_id,
-                'access_token': ACCESS_TOKEN
-            }
-            
-            publish_response = requests.post(publish_url, data=publish_params)
-            
-            if publish_response.status_code == 200:
-                post_id = publish_response.json().get('id')
-                return True, post_id
-            else:
-                return False, f"Publishing failed: {publish_response.text}"
-                
+            return self.publish_container(result)
         except Exception as e:
             return False, str(e)
     
+    def record_success(self, product, post_id):
+        """Track a published product right away so a crash cannot cause a double post"""
+        self.metrics.incr('posts', status='published')
+        asin = product.get('asin', '')
+        if asin:
+            self.asin_index.upsert(asin, self.channel, ref=post_id)
+        
+        self.posted.append({
+            'product': product['name'],
+            'asin': asin,
+            'post_id': post_id,
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+    
+    def record_failure(self, product, error):
+        """Track a product that could not be posted"""
+        self.metrics.incr('posts', status='failed')
+        self.failed.append({
+            'product': product['name'],
+            'error': error,
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+    
     def run_auto_posting(self, test_mode=False):
         """Main auto-posting function - max 5 posts"""
         # Limit products to MAX_POSTS_PER_RUN
@@ -199,25 +337,10 @@ class InstagramAutoPoster:
             if success:
                 print(f"✅ SUCCESS! Post ID: {result}")
                 print(f"📱 View at: https://www.instagram.com/p/{result}/")
-                
-                # Track posted product
-                asin = product.get('asin', '')
-                if asin:
-                    self.already_posted_asins.add(asin)
-                
-                self.posted.append({
-                    'product': product['name'],
-                    'asin': asin,
-                    'post_id': result,
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+                self.record_success(product, result)
             else:
                 print(f"❌ FAILED: {result}")
-                self.failed.append({
-                    'product': product['name'],
-                    'error': result,
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
+                self.record_failure(product, result)
             
             # Wait for next post (except last one)
             if i < len(products_to_post):
@@ -231,13 +354,63 @@ class InstagramAutoPoster:
                     time.sleep(1)
                 print()  # New line after countdown
         
-        # Save posted history
-        self.save_posted_history()
-        
         # Final summary
         self.show_summary()
         self.save_results()
     
+    def run_pipeline_posting(self, max_posts=MAX_POSTS_PER_RUN, posts_per_hour=POSTS_PER_HOUR):
+        """Post through the concurrent pipeline: parallel containers, rate-limited publishing"""
+        products_to_post = self.products[:max_posts]
+        if not products_to_post:
+            print("\n📭 No new products to post!")
+            return
+        
+        print("\n" + "="*60)
+        print("🚀 INSTAGRAM AUTO-POSTER (PIPELINE)")
+        print("="*60)
+        print(f"📦 Products to post: {len(products_to_post)}")
+        print(f"🧵 Parallel containers: {PIPELINE_WORKERS}")
+        print(f"⏱️  Publish budget: {posts_per_hour} posts per hour")
+        print("="*60)
+        
+        confirm = input("Start pipeline posting? Type 'YES' in capitals: ")
+        if confirm != 'YES':
+            print("❌ Pipeline posting cancelled")
+            return
+        
+        PostingPipeline(self, posts_per_hour=posts_per_hour, max_workers=PIPELINE_WORKERS).run(products_to_post)
+        
+        self.show_summary()
+        self.save_results()
+    
+    def run_carousel_posting(self, max_posts=MAX_POSTS_PER_RUN, posts_per_hour=POSTS_PER_HOUR,
+                             group_by=CAROUSEL_GROUP_BY):
+        """Post up to max_posts carousels of up to CAROUSEL_SIZE products each"""
+        batches = group_products(self.products, group_by)[:max_posts]
+        if not batches:
+            print("\n📭 No new products to post!")
+            return
+        
+        print("\n" + "="*60)
+        print("🚀 INSTAGRAM AUTO-POSTER (CAROUSELS)")
+        print("="*60)
+        print(f"📦 Carousels to post: {len(batches)} ({sum(len(products) for _, products in batches)} products)")
+        for label, products in batches:
+            print(f"   • {label}: {len(products)} products")
+        print(f"🧵 Parallel containers: {PIPELINE_WORKERS}")
+        print(f"⏱️  Publish budget: {posts_per_hour} posts per hour")
+        print("="*60)
+        
+        confirm = input("Start carousel posting? Type 'YES' in capitals: ")
+        if confirm != 'YES':
+            print("❌ Carousel posting cancelled")
+            return
+        
+        CarouselPipeline(self, posts_per_hour=posts_per_hour, max_workers=PIPELINE_WORKERS).run(batches)
+        
+        self.show_summary()
+        self.save_results()
+    
     def show_summary(self):
         """Show posting summary"""
         print("\n" + "="*60)
@@ -245,7 +418,7 @@ class InstagramAutoPoster:
         print("="*60)
         print(f"✅ Successful: {len(self.posted)}")
         print(f"❌ Failed: {len(self.failed)}")
-        print(f"📋 Total posted (all time): {len(self.already_posted_asins)}")
+        print(f"📋 Total posted (all time): {self.asin_index.count(self.channel)}")
         
         if self.posted:
             print("\n✅ Successfully posted:")
@@ -256,6 +429,12 @@ class InstagramAutoPoster:
             print("\n❌ Failed posts:")
             for item in self.failed:
                 print(f"   • {item['product'][:50]} - {item['error'][:30]}")
+        
+        latency = self.client.latency_summary()
+        if latency:
+            print("\n⏱️  Graph API latency:")
+            for endpoint, stats in latency.items():
+                print(f"   • {endpoint}: {stats['calls']} calls, p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms")
     
     def save_results(self):
         """Save posting results"""
@@ -268,20 +447,170 @@ class InstagramAutoPoster:
                 'failed': len(self.failed),
                 'success_rate': f"{(len(self.posted)/(len(self.posted)+len(self.failed))*100):.1f}%" if (self.posted or self.failed) else "0%"
             },
+            'api_latency': self.client.latency_summary(),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
         filename = f"posting_results_{datetime.now().strftime('%Y%m%d_%H%M')}.json"
         with open(filename, 'w') as f:
             json.dump(results, f, indent=2)
+        self.metrics.flush()
         
         print(f"\n💾 Results saved to {filename}")
 
+def account_prom_file(prom_file, account):
+    """metrics.prom -> metrics.<account>.prom, so account workers do not overwrite each other"""
+    if not prom_file:
+        return None
+    root, ext = os.path.splitext(prom_file)
+    return f"{root}.{account.name}{ext}"
+
+def account_router(accounts):
+    """Routes products by the site section they are listed in"""
+    return AccountRouter(accounts, CATEGORIES, DEFAULT_CATEGORY)
+
+def run_daemon(args, account=None, accounts=()):
+    """Non-interactive worker mode backed by the durable job queue (one account, or the default one)"""
+    accepts = account_router(accounts).accepts(account) if account else None
+    prom_file = account_prom_file(args.prom_file, account) if account else args.prom_file
+    poster = InstagramAutoPoster(prom_file=prom_file, account=account, accepts=accepts)
+    poster.deals_first = args.deals_first
+    poster.score = load_score(args.score)
+    queue = JobQueue(table=poster.account.queue_table)
+    if args.retry_failed:
+        print(f"🔁 Re-queued {queue.retry_failed()} failed job(s)")
+    
+    posts_per_hour = poster.account.posts_per_hour or args.posts_per_hour
+    # With --deals-first the queue order (best deals, then feed order) is kept
+    scheduler = PostingScheduler(feed_order_score if args.deals_first else poster.score, slots=args.slots)
+    # Links are checked right before each container is created
+    checker = None if args.skip_link_check else LinkChecker(metrics=poster.metrics)
+    daemon = PostingDaemon(poster, queue, JSON_FILE, POST_FIELDS, posts_per_hour,
+                           max_workers=PIPELINE_WORKERS, poll_interval=args.poll_interval, scheduler=scheduler,
+                           checker=checker)
+    try:
+        daemon.run(once=args.once)
+    finally:
+        if checker:
+            checker.close()
+            print(f"🔗 Link check: {checker.summary()}")
+        queue.close()
+
+def run_account_pool(args, accounts):
+    """One daemon process per account, each with its own token, quota, queue and history"""
+    print(f"🚀 Starting {len(accounts)} account worker(s): "
+          + ', '.join(f"{account.name} ({', '.join(sorted(account.categories)) if account.categories else 'other'})"
+                      for account in accounts))
+    workers = [multiprocessing.Process(target=run_daemon, args=(args, account, accounts), name=account.name)
+               for account in accounts]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Ctrl+C reaches every worker; each finishes its current step before exiting
+        for worker in workers:
+            worker.join()
+    show_posted_where(accounts)
+    failed = [worker.name for worker in workers if worker.exitcode]
+    if failed:
+        print(f"❌ Worker(s) exited with an error: {', '.join(failed)}")
+        raise SystemExit(1)
+
+def show_posted_where(accounts, asin=None):
+    """Shared view of the ASIN index across accounts"""
+    asin_index = AsinIndex()
+    try:
+        names = {account.channel: account.name for account in accounts}
+        if asin:
+            rows = asin_index.posted_where(asin)
+            print(f"📍 {asin}: " + (', '.join(f"{names.get(channel, channel)} ({ref or 'no post id'})"
+                                             for channel, ref in rows) or "not posted"))
+            return
+        print("📋 Posted ASINs per account:")
+        for channel, count in sorted(asin_index.channel_counts().items()):
+            print(f"   • {names.get(channel, channel)}: {count}")
+    finally:
+        asin_index.close()
+
 # Main menu
 def main():
-    poster = InstagramAutoPoster()
+    parser = argparse.ArgumentParser(description="PandaLoon Instagram auto-poster")
+    parser.add_argument('--daemon', action='store_true',
+                        help="run as a non-interactive worker that resumes from the job queue")
+    parser.add_argument('--once', action='store_true', help="with --daemon: exit when the queue is drained")
+    parser.add_argument('--posts-per-hour', type=float, default=POSTS_PER_HOUR)
+    parser.add_argument('--poll-interval', type=float, default=60,
+                        help="seconds between feed scans when there is nothing to do")
+    parser.add_argument('--retry-failed', action='store_true', help="with --daemon: re-queue failed jobs first")
+    parser.add_argument('--prom-file', metavar='FILE',
+                        help="also write metrics in Prometheus text format to FILE")
+    parser.add_argument('--skip-link-check', '--no-check-links', action='store_true',
+                        help="do not check image and affiliate links before posting (daemon mode included)")
+    parser.add_argument('--group-by', choices=GROUP_BY, default=CAROUSEL_GROUP_BY,
+                        help=f"carousel mode: group products by category or discount (default: {CAROUSEL_GROUP_BY})")
+    parser.add_argument('--deals-first', action='store_true',
+                        help="record feed prices and post the best deals (all-time lows, 7-day drops, "
+                             "top discounts) first, then the feed order (instead of --score)")
+    parser.add_argument('--score', default='deal', metavar='NAME',
+                        help=f"posting priority: {', '.join(SCORES)} or module:function (default: deal, "
+                             f"which weighs discount, rating and freshness)")
+    parser.add_argument('--slots', nargs='?', const=','.join(SLOT_TIMES), metavar='HH:MM,...',
+                        help=f"with --daemon: post one product per time slot of the day, the best one available "
+                             f"when the slot opens (default slots: {','.join(SLOT_TIMES)})")
+    parser.add_argument('--accounts', default=ACCOUNTS_FILE, metavar='FILE',
+                        help=f"accounts to post to, routed by category (default: {ACCOUNTS_FILE} if it exists)")
+    parser.add_argument('--account', metavar='NAME',
+                        help="only use this account (the daemon otherwise runs one worker per account)")
+    parser.add_argument('--posted-where', metavar='ASIN',
+                        help="show which accounts an ASIN was posted to, or a count per account with 'all'")
+    args = parser.parse_args()
+    try:
+        load_score(args.score)
+        PostingScheduler(slots=args.slots)
+    except (ValueError, ImportError, AttributeError) as e:
+        parser.error(str(e))
+    
+    accounts = load_accounts(args.accounts)
+    account = None
+    if args.account:
+        account = next((account for account in accounts if account.name == args.account), None)
+        if account is None:
+            parser.error(f"unknown account {args.account!r} (not in {args.accounts})")
+    
+    if args.posted_where:
+        show_posted_where(accounts, None if args.posted_where == 'all' else args.posted_where)
+        return
+    
+    unclaimed = account_router(accounts).unclaimed()
+    if unclaimed:
+        print(f"⚠️ No account in {args.accounts} posts {', '.join(unclaimed)}: those products are never posted "
+              f"(add an account without categories to take them)")
+    
+    if args.daemon:
+        if account or len(accounts) == 1:
+            run_daemon(args, account or accounts[0], accounts)
+        elif accounts:
+            run_account_pool(args, accounts)
+        else:
+            run_daemon(args)
+        return
+    
+    if accounts and account is None:
+        # The built-in account is only used without accounts.json
+        if len(accounts) > 1:
+            parser.error(f"{len(accounts)} accounts in {args.accounts}: choose one with --account NAME, "
+                         f"or use --daemon for all of them")
+        account = accounts[0]
+    accepts = account_router(accounts).accepts(account) if account else None
+    poster = InstagramAutoPoster(prom_file=args.prom_file, account=account, accepts=accepts)
+    poster.deals_first = args.deals_first
+    poster.score = load_score(args.score)
     
     print("\n🎯 PANDALOON INSTAGRAM AUTO-POSTER")
+    if account:
+        print(f"👤 Account: {account.name}")
     print("📋 Quick Post Mode: 1-minute intervals, max 5 posts")
     print("="*60)
     
@@ -300,18 +629,30 @@ def main():
     print("="*60)
     print("1. TEST MODE - Post only first product")
     print("2. QUICK POST - Post up to 5 products (1 min intervals)")
-    print("3. VIEW PRODUCTS - See what will be posted")
-    print("4. RESET HISTORY - Clear posted products history")
-    print("5. EXIT")
+    print(f"3. PIPELINE POST - Post up to 5 products (parallel, {POSTS_PER_HOUR} posts/hour budget)")
+    print(f"4. CAROUSEL POST - Post up to 5 carousels of {CAROUSEL_SIZE} products (grouped by {args.group_by})")
+    print("5. VIEW PRODUCTS - See what will be posted")
+    print("6. RESET HISTORY - Clear posted products history")
+    print("7. EXIT")
     print("="*60)
     
-    choice = input("\nSelect option (1-5): ")
+    choice = input("\nSelect option (1-7): ")
+    
+    # Keep products with dead images or links away from the Graph API;
+    # only the posting options need it, so viewing or exiting stays offline
+    if choice in ("1", "2", "3", "4") and not args.skip_link_check and poster.products:
+        print("\n🔗 Checking product links...")
+        poster.validate_products()
     
     if choice == "1":
         poster.run_auto_posting(test_mode=True)
     elif choice == "2":
         poster.run_auto_posting(test_mode=False)
     elif choice == "3":
+        poster.run_pipeline_posting()
+    elif choice == "4":
+        poster.run_carousel_posting(group_by=args.group_by)
+    elif choice == "5":
         print("\n📦 NEW PRODUCTS TO POST:")
         print("-"*60)
         for i, product in enumerate(poster.products[:10], 1):
@@ -321,15 +662,14 @@ def main():
             print()
         if len(poster.products) > 10:
             print(f"... and {len(poster.products) - 10} more products")
-    elif choice == "4":
+    elif choice == "6":
         confirm = input("Reset posting history? This will allow re-posting all products. (yes/no): ")
         if confirm.lower() == 'yes':
-            if os.path.exists(POSTED_FILE):
-                os.remove(POSTED_FILE)
+            if poster.reset_posted_history():
                 print("✅ Posting history cleared!")
             else:
                 print("No history to clear.")
-    elif choice == "5":
+    elif choice == "7":
         print("👋 Goodbye!")
     else:
         print("❌ Invalid option!")
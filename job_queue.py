@@ -0,0 +1,128 @@
+"""
+job_queue.py - Durable per-product posting queue (SQLite, WAL mode)
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+from product_store import BUSY_TIMEOUT_SECONDS, STORE_FILE
+
+# Job states, in the order a successful job goes through them
+PENDING = "pending"
+CONTAINER_CREATED = "container_created"
+PUBLISHED = "published"
+FAILED = "failed"
+
+
+class JobQueue:
+    """One row per product; every state transition is committed before the next step starts"""
+
+    def __init__(self, db_file=STORE_FILE, table="post_jobs"):
+        self.db_file = db_file
+        self.table = table  # One table per Instagram account (see accounts.Account.queue_table)
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the jobs table if it does not exist yet"""
+        with self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    asin TEXT NOT NULL UNIQUE,
+                    product TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    creation_id TEXT,
+                    post_id TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    score REAL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )""")
+            columns = [row['name'] for row in self.conn.execute(f"PRAGMA table_info({self.table})")]
+            if 'score' not in columns:
+                # Queues created before jobs carried their posting score
+                self.conn.execute(f"ALTER TABLE {self.table} ADD COLUMN score REAL")
+            self.conn.execute(f"DROP INDEX IF EXISTS idx_{self.table}_state")  # Was (state, id)
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table}_state_score ON {self.table} (state, score DESC, id)")
+
+    @staticmethod
+    def now():
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def contains(self, asin):
+        """Whether the ASIN was ever queued, whatever its state"""
+        return self.conn.execute(f"SELECT 1 FROM {self.table} WHERE asin = ?", (asin,)).fetchone() is not None
+
+    def enqueue(self, products):
+        """Queue products that are not queued yet; returns how many were added"""
+        now = self.now()
+        with self.conn:
+            cursor = self.conn.executemany(f"""
+                INSERT OR IGNORE INTO {self.table} (asin, product, state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                [(product['asin'], json.dumps(product, ensure_ascii=False), PENDING, now, now)
+                 for product in products])
+        return cursor.rowcount
+
+    def jobs(self, state, limit=-1):
+        """Jobs in a state, highest score first, then oldest first, as dicts with the product decoded"""
+        rows = self.conn.execute(
+            f"SELECT * FROM {self.table} WHERE state = ? ORDER BY score DESC, id LIMIT ?", (state, limit)).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job['product'] = json.loads(job['product'])
+            jobs.append(job)
+        return jobs
+
+    def transition(self, asin, state, **fields):
+        """Move a job to a new state and commit immediately"""
+        assignments = ''.join(f", {column} = ?" for column in fields)
+        with self.conn:
+            self.conn.execute(
+                f"UPDATE {self.table} SET state = ?, updated_at = ?{assignments} WHERE asin = ?",
+                (state, self.now(), *fields.values(), asin))
+
+    def mark_container_created(self, asin, creation_id, score=None):
+        """score (see posting_scheduler.py) decides the publish order of created containers"""
+        self.transition(asin, CONTAINER_CREATED, creation_id=creation_id, error=None, score=score)
+
+    def mark_published(self, asin, post_id):
+        self.transition(asin, PUBLISHED, post_id=post_id, error=None)
+
+    def mark_pending(self, asin, error=None):
+        """Send a job back to the start, e.g. when its container expired"""
+        self.transition(asin, PENDING, creation_id=None, error=error, score=None)
+
+    def mark_failed(self, asin, error, max_attempts):
+        """Record a failed attempt; the job is retried until it has failed max_attempts times"""
+        attempts = self.conn.execute(
+            f"SELECT attempts FROM {self.table} WHERE asin = ?", (asin,)).fetchone()['attempts'] + 1
+        state = FAILED if attempts >= max_attempts else PENDING
+        self.transition(asin, state, creation_id=None, error=error, attempts=attempts, score=None)
+        return state
+
+    def retry_failed(self):
+        """Move every failed job back to pending"""
+        with self.conn:
+            cursor = self.conn.execute(
+                f"UPDATE {self.table} SET state = ?, attempts = 0, updated_at = ? WHERE state = ?",
+                (PENDING, self.now(), FAILED))
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of jobs per state"""
+        rows = self.conn.execute(f"SELECT state, COUNT(*) FROM {self.table} GROUP BY state").fetchall()
+        counts = {PENDING: 0, CONTAINER_CREATED: 0, PUBLISHED: 0, FAILED: 0}
+        counts.update({row[0]: row[1] for row in rows})
+        return counts
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,249 @@
+"""
+link_check.py - Concurrent pre-flight checks of product image and affiliate links, with a TTL cache
+
+Products whose image_url or affiliate_link is broken are quarantined (with the
+reason) instead of reaching the site or the Graph API:
+    python link_check.py                  # check the feed, print what was quarantined
+    python link_check.py --list           # show the quarantine
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from product_feed import ProductFeed
+from product_store import BUSY_TIMEOUT_SECONDS, STORE_FILE
+
+CHECK_FIELDS = ('image_url', 'affiliate_link')
+CHECK_WORKERS = 16  # URLs checked concurrently
+CHECK_TIMEOUT = (3.05, 10)
+CHECK_BATCH = 200  # Products validated per batch when filtering a stream
+OK_TTL_SECONDS = 24 * 3600  # A working URL is not fetched again for this long
+BROKEN_TTL_SECONDS = 6 * 3600  # A broken URL is re-checked after this long
+USER_AGENT = "Mozilla/5.0 (compatible; PandaLoonLinkCheck/1.0)"
+# Answers that say nothing about the link itself (throttling, bot blocking): never quarantined
+INCONCLUSIVE_STATUSES = {401, 403, 407, 408, 429}
+HEAD_UNSUPPORTED_STATUSES = {403, 405, 501}  # Retried with GET
+
+
+class LinkChecker:
+    """Checks product URLs with bounded concurrency and caches the verdicts in the store.
+
+    A URL is 'ok' (2xx/3xx, and an image type for image_url), 'broken'
+    (a definite 4xx, or a non-image answer for image_url) or 'unknown'
+    (timeouts, connection errors, 5xx, throttling). Verdicts younger than
+    their TTL are reused without a request; unknown ones are not cached, and
+    products are only quarantined for broken links, so a network outage
+    cannot empty the site. Verdicts and quarantine changes are written by
+    flush() (or close()), so checking never holds a write lock on the store
+    while a caller's own transaction is open.
+    """
+
+    def __init__(self, db_file=STORE_FILE, fields=CHECK_FIELDS, workers=CHECK_WORKERS,
+                 ok_ttl=OK_TTL_SECONDS, broken_ttl=BROKEN_TTL_SECONDS, clock=time.time, metrics=None):
+        self.fields = fields
+        self.workers = workers
+        self.ok_ttl = ok_ttl
+        self.broken_ttl = broken_ttl
+        self.clock = clock
+        self.metrics = metrics  # Optional metrics.Metrics receiving link_checks counters
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.lock = threading.Lock()
+        self.counts = {'cached': 0, 'ok': 0, 'broken': 0, 'unknown': 0}
+        self.pending_checks = {}  # url -> (verdict, reason, checked_at), not written yet
+        self.pending_quarantine = {}  # asin -> (field, url, reason, quarantined_at), or None to release
+
+    def create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS link_checks (
+                    url TEXT PRIMARY KEY,
+                    verdict TEXT NOT NULL,
+                    reason TEXT,
+                    checked_at REAL NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS quarantine (
+                    asin TEXT PRIMARY KEY,
+                    field TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    quarantined_at TEXT NOT NULL
+                ) WITHOUT ROWID""")
+
+    def count(self, verdict, value=1):
+        with self.lock:
+            self.counts[verdict] += value
+        if self.metrics:
+            self.metrics.incr('link_checks', value, result=verdict)
+
+    # -------------------------------------
+    # Checking
+    # -------------------------------------
+
+    def fetch(self, url, field):
+        """Request a URL; returns (verdict, reason)"""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=CHECK_TIMEOUT)
+            if response.status_code in HEAD_UNSUPPORTED_STATUSES:
+                response = self.session.get(url, allow_redirects=True, timeout=CHECK_TIMEOUT, stream=True)
+                response.close()  # Only the status and headers are needed
+        except requests.Timeout:
+            return 'unknown', "timed out"
+        except requests.RequestException as e:
+            return 'unknown', f"request failed: {type(e).__name__}"
+
+        status = response.status_code
+        if status in INCONCLUSIVE_STATUSES or status >= 500:
+            return 'unknown', f"HTTP {status}"
+        if status >= 400:
+            return 'broken', f"HTTP {status}"
+        content_type = response.headers.get('Content-Type', '')
+        if field == 'image_url' and content_type and not content_type.startswith('image/'):
+            return 'broken', f"not an image ({content_type.split(';')[0]})"
+        return 'ok', None
+
+    def cached(self, urls):
+        """{url: (verdict, reason)} for URLs whose cached verdict is still fresh"""
+        now = self.clock()
+        fresh = {}
+        # Verdicts of this run that are not written yet take precedence
+        rows = [(url, *self.pending_checks[url]) for url in urls if url in self.pending_checks]
+        stored = [url for url in urls if url not in self.pending_checks]
+        for start in range(0, len(stored), 500):
+            chunk = stored[start:start + 500]
+            rows += self.conn.execute(
+                f"SELECT url, verdict, reason, checked_at FROM link_checks WHERE url IN ({','.join('?' * len(chunk))})",
+                chunk).fetchall()
+        for url, verdict, reason, checked_at in rows:
+            ttl = self.ok_ttl if verdict == 'ok' else self.broken_ttl
+            if now - checked_at < ttl:
+                fresh[url] = (verdict, reason)
+        return fresh
+
+    def check(self, urls):
+        """{url: (verdict, reason)} for {url: field}, fetching only URLs without a fresh verdict"""
+        results = self.cached(urls)
+        self.count('cached', len(results))
+        pending = [url for url in urls if url not in results]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                verdicts = executor.map(lambda url: self.fetch(url, urls[url]), pending)
+                for url, verdict in zip(pending, verdicts):
+                    results[url] = verdict
+                    self.count(verdict[0])
+            now = self.clock()
+            self.pending_checks.update((url, (*results[url], now)) for url in pending if results[url][0] != 'unknown')
+        return results
+
+    # -------------------------------------
+    # Products
+    # -------------------------------------
+
+    def validate(self, products):
+        """Split products into (valid, quarantined); quarantined items are (product, field, reason)"""
+        urls = {}
+        for product in products:
+            for field in self.fields:
+                if product.get(field):
+                    urls.setdefault(product[field], field)
+        results = self.check(urls)
+
+        valid = []
+        quarantined = []
+        for product in products:
+            failure = next(((field, results[product[field]][1]) for field in self.fields
+                            if product.get(field) and results[product[field]][0] == 'broken'), None)
+            if failure:
+                quarantined.append((product, *failure))
+            else:
+                valid.append(product)
+        self.record_quarantine(valid, quarantined)
+        return valid, quarantined
+
+    def filter(self, products, batch_size=CHECK_BATCH):
+        """Yield the valid products of a stream, checking one batch at a time"""
+        batch = []
+        for product in products:
+            batch.append(product)
+            if len(batch) == batch_size:
+                yield from self.validate(batch)[0]
+                batch = []
+        if batch:
+            yield from self.validate(batch)[0]
+
+    def record_quarantine(self, valid, quarantined):
+        """Quarantine failing products and release products whose links work again"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for product in valid:
+            if product.get('asin'):
+                self.pending_quarantine[product['asin']] = None
+        for product, field, reason in quarantined:
+            print(f"🚧 Quarantined {product.get('asin', '?')}: {field} {reason}")
+            if product.get('asin'):
+                self.pending_quarantine[product['asin']] = (field, product[field], reason, now)
+
+    def flush(self):
+        """Write the verdicts and quarantine changes gathered so far"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO link_checks (url, verdict, reason, checked_at) VALUES (?, ?, ?, ?)",
+                [(url, *verdict) for url, verdict in self.pending_checks.items()])
+            self.conn.executemany("DELETE FROM quarantine WHERE asin = ?",
+                                  [(asin,) for asin, entry in self.pending_quarantine.items() if entry is None])
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO quarantine (asin, field, url, reason, quarantined_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                [(asin, *entry) for asin, entry in self.pending_quarantine.items() if entry is not None])
+        self.pending_checks = {}
+        self.pending_quarantine = {}
+
+    def quarantined(self):
+        """Current quarantine as (asin, field, url, reason, quarantined_at) rows"""
+        return self.conn.execute(
+            "SELECT asin, field, url, reason, quarantined_at FROM quarantine ORDER BY quarantined_at").fetchall()
+
+    def summary(self):
+        return ', '.join(f"{count} {verdict}" for verdict, count in self.counts.items())
+
+    def close(self):
+        self.flush()
+        self.session.close()
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check product image and affiliate links")
+    parser.add_argument('feeds', nargs='*', default=["insta_ready.json"], help="feeds to check")
+    parser.add_argument('--list', action='store_true', help="only print the current quarantine")
+    args = parser.parse_args()
+
+    checker = LinkChecker()
+    try:
+        if not args.list:
+            valid = sum(1 for _ in checker.filter(ProductFeed(args.feeds)))
+            checker.flush()
+            print(f"🔗 {valid} product(s) passed ({checker.summary()})")
+        rows = checker.quarantined()
+        print(f"🚧 {len(rows)} product(s) in quarantine")
+        for asin, field, url, reason, quarantined_at in rows:
+            print(f"   • {asin} {field}: {reason} - {url} ({quarantined_at})")
+    finally:
+        checker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+metrics.py - Stage timings, counters and histograms written as JSON lines / Prometheus text
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FILE = "metrics.jsonl"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PREFIX = "pandaloon_"
+
+
+def label_key(name, labels):
+    """Series key such as graph_api_latency_seconds{endpoint="media"}"""
+    if not labels:
+        return name
+    inner = ','.join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (Prometheus-style estimate)"""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'avg': round(self.sum / self.count, 6) if self.count else 0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 6),
+        }
+
+
+class Metrics:
+    """Per-run metrics for one component (generate_html, instagram_poster, ...).
+
+    flush() appends one JSON line with everything recorded since the run
+    started and, when prom_file is set, rewrites a Prometheus text-format file
+    that a node_exporter textfile collector can pick up.
+    """
+
+    def __init__(self, component, jsonl_file=METRICS_FILE, prom_file=None):
+        self.component = component
+        self.jsonl_file = jsonl_file
+        self.prom_file = prom_file
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()  # Per-thread stack of open stages
+        self.timings = {}
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage; repeated entries of the same stage add up.
+
+        Stages are exclusive: time spent in a stage opened inside another one
+        is only counted for the inner stage.
+        """
+        stack = self.local.__dict__.setdefault('stack', [])
+        frame = [0.0]  # Time spent in nested stages
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            self.add_time(name, elapsed - frame[0])
+
+    def timed(self, name, func):
+        """Wrap a callable so the time spent in it is added to a stage"""
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def timed_iter(self, name, iterable):
+        """Iterate, adding the time spent producing each item to a stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def incr(self, name, value=1, **labels):
+        key = label_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[label_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = label_key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'component': self.component,
+                'run_id': self.run_id,
+                'elapsed_seconds': round(self.elapsed(), 6),
+                'stage_seconds': {name: round(value, 6) for name, value in self.timings.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {key: histogram.summary() for key, histogram in self.histograms.items()},
+            }
+
+    def flush(self):
+        """Append the run's metrics as one JSON line (and refresh the Prometheus file)"""
+        snapshot = self.snapshot()
+        if self.jsonl_file:
+            with open(self.jsonl_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+        if self.prom_file:
+            self.write_prometheus()
+        return snapshot
+
+    def write_prometheus(self):
+        """Write all series in Prometheus text exposition format (atomically)"""
+        component = f'component="{self.component}"'
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        def series(name, labels=''):
+            joined = ','.join(part for part in (component, labels) if part)
+            return f"{PREFIX}{name}{{{joined}}}"
+
+        def split(key):
+            name, _, rest = key.partition('{')
+            return name, rest.rstrip('}')
+
+        with self.lock:
+            declare("stage_seconds", "gauge")
+            for stage, seconds in sorted(self.timings.items()):
+                lines.append(f'{series("stage_seconds", f"stage={json.dumps(stage)}")} {seconds:.6f}')
+            for key, value in sorted(self.counters.items()):
+                name, labels = split(key)
+                declare(name + '_total', "counter")
+                lines.append(f"{series(name + '_total', labels)} {value}")
+            for key, value in sorted(self.gauges.items()):
+                name, labels = split(key)
+                declare(name, "gauge")
+                lines.append(f"{series(name, labels)} {value}")
+            for key, histogram in sorted(self.histograms.items()):
+                name, labels = split(key)
+                declare(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = ','.join(part for part in (labels, f'le="{bound}"') if part)
+                    lines.append(f"{series(name + '_bucket', le)} {cumulative}")
+                le = ','.join(part for part in (labels, 'le="+Inf"') if part)
+                lines.append(f"{series(name + '_bucket', le)} {histogram.count}")
+                lines.append(f"{series(name + '_sum', labels)} {histogram.sum:.6f}")
+                lines.append(f"{series(name + '_count', labels)} {histogram.count}")
+
+        tmp_file = self.prom_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, self.prom_file)
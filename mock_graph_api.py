@@ -0,0 +1,230 @@
+"""
+mock_graph_api.py - Local stand-in for the Instagram Graph API endpoints the poster uses
+
+Run it and point the poster at it:
+    python mock_graph_api.py --port 8765
+    GRAPH_API_BASE_URL=http://127.0.0.1:8765/v18.0 python instagram_poster.py
+
+With --accounts accounts.json, each account only accepts its own access token
+and the published posts are counted per account.
+"""
+
+import argparse
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from accounts import load_accounts
+
+
+class MockGraphAPI:
+    """In-process mock server; containers report IN_PROGRESS for `processing_polls` status checks"""
+
+    def __init__(self, host="127.0.0.1", port=0, processing_polls=1, throttle_every=0, tokens=None,
+                 retry_after='0'):
+        self.processing_polls = processing_polls
+        self.throttle_every = throttle_every  # Answer every Nth request with a 429 (0 disables)
+        self.retry_after = retry_after  # Retry-After header sent with 429 answers
+        self.container_status = None  # Set to e.g. 'ERROR' or 'EXPIRED' to make every container report it
+        self.tokens = tokens  # Optional {access_token: account_id}; other tokens are rejected
+        self.ids = itertools.count(1000)
+        self.containers = {}  # creation_id -> {'params': ..., 'polls': int, 'published': bool}
+        self.published = []  # creation_ids in publish order
+        self.published_by = {}  # account_id -> creation_ids in publish order
+        self.requests = []  # (method, path) of every request received
+        self.faults = []  # Queued by fail(): [endpoint, status, after]
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v18.0"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def next_id(self):
+        with self.lock:
+            return str(next(self.ids))
+
+    def fail(self, endpoint, status=500, after=False):
+        """Answer the next request to an endpoint ('media', 'media_publish', 'status') with an error status.
+
+        With after=True the request is carried out first and only its answer
+        is lost, like a publish that succeeded behind a gateway timeout.
+        """
+        with self.lock:
+            self.faults.append([endpoint, status, after])
+
+    def take_fault(self, method, parts):
+        endpoint = parts[1] if method == 'POST' and len(parts) == 2 else 'status' if len(parts) == 1 else None
+        with self.lock:
+            for fault in self.faults:
+                if fault[0] == endpoint:
+                    self.faults.remove(fault)
+                    return fault
+        return None
+
+    def handle(self, method, path, params):
+        """Return (status, payload) for a request"""
+        with self.lock:
+            self.requests.append((method, path))
+            if self.throttle_every and len(self.requests) % self.throttle_every == 0:
+                return 429, {'error': {'message': 'Application request limit reached', 'code': 4}}
+        parts = [part for part in path.split('/') if part][1:]  # Drop the API version
+        fault = self.take_fault(method, parts)
+        if fault and not fault[2]:
+            return fault[1], {'error': {'message': 'Injected failure', 'code': 2}}
+        status, payload = self.route(method, parts, params)
+        if fault:
+            return fault[1], {'error': {'message': 'Injected failure after the request was handled', 'code': 2}}
+        return status, payload
+
+    def route(self, method, parts, params):
+        path = '/'.join(parts)
+        if method == 'POST' and len(parts) == 2:
+            error = self.token_error(parts[0], params.get('access_token'))
+            if error:
+                return 400, {'error': {'message': error, 'code': 190}}
+
+        if method == 'POST' and len(parts) == 2 and parts[1] == 'media':
+            if params.get('media_type') == 'CAROUSEL':
+                error = self.carousel_error(params.get('children', ''))
+                if error:
+                    return 400, {'error': {'message': error, 'code': 100}}
+            elif not params.get('image_url'):
+                return 400, {'error': {'message': 'image_url is required', 'code': 100}}
+            creation_id = self.next_id()
+            with self.lock:
+                self.containers[creation_id] = {'params': params, 'polls': 0, 'published': False,
+                                                'account_id': parts[0]}
+            return 200, {'id': creation_id}
+
+        if method == 'POST' and len(parts) == 2 and parts[1] == 'media_publish':
+            creation_id = params.get('creation_id')
+            with self.lock:
+                container = self.containers.get(creation_id)
+                if container is None or container['account_id'] != parts[0]:
+                    return 400, {'error': {'message': 'Media ID is not available', 'code': 9007}}
+                if container['polls'] < self.processing_polls:
+                    return 400, {'error': {'message': 'Media ID is not available', 'code': 9007}}
+                if container['published']:
+                    return 400, {'error': {'message': 'Media already published', 'code': 9007}}
+                if container['params'].get('is_carousel_item') == 'true':
+                    return 400, {'error': {'message': 'Carousel items are published through their carousel',
+                                           'code': 100}}
+                container['published'] = True
+                self.published.append(creation_id)
+                self.published_by.setdefault(parts[0], []).append(creation_id)
+            return 200, {'id': self.next_id()}
+
+        if method == 'GET' and len(parts) == 1:
+            with self.lock:
+                container = self.containers.get(parts[0])
+                if container is not None:
+                    container['polls'] += 1
+                    if container['published']:
+                        status = 'PUBLISHED'
+                    elif self.container_status:
+                        status = self.container_status
+                    elif container['polls'] > self.processing_polls:
+                        status = 'FINISHED'
+                    else:
+                        status = 'IN_PROGRESS'
+                    return 200, {'id': parts[0], 'status_code': status}
+            return 200, {'id': parts[0], 'username': 'pandaloon_mock',
+                         'followers_count': 0, 'media_count': len(self.published)}
+
+        return 404, {'error': {'message': f'Unknown endpoint {method} {path}', 'code': 803}}
+
+    def token_error(self, account_id, access_token):
+        """Why access_token may not act for account_id, or None"""
+        if self.tokens is None:
+            return None
+        if access_token not in self.tokens:
+            return 'Invalid OAuth access token'
+        if self.tokens[access_token] != account_id:
+            return f"Access token does not belong to account {account_id}"
+        return None
+
+    def carousel_error(self, children):
+        """Why a carousel cannot be created from these children, or None"""
+        child_ids = [child for child in children.split(',') if child]
+        if not 2 <= len(child_ids) <= 10:
+            return f"A carousel needs 2 to 10 children, got {len(child_ids)}"
+        with self.lock:
+            for child_id in child_ids:
+                child = self.containers.get(child_id)
+                if child is None or child['params'].get('is_carousel_item') != 'true':
+                    return f"{child_id} is not a carousel item"
+                if child['polls'] < self.processing_polls:
+                    return f"Carousel item {child_id} is not finished"
+        return None
+
+    def make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                self.respond(*api.handle('GET', url.path, self.params(url.query)))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8')
+                params = self.params(url.query)
+                params.update(self.params(body))
+                self.respond(*api.handle('POST', url.path, params))
+
+            @staticmethod
+            def params(query):
+                return {key: values[-1] for key, values in parse_qs(query).items()}
+
+            def respond(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', api.retry_after)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock Instagram Graph API server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processing-polls', type=int, default=1,
+                        help="status checks that report IN_PROGRESS before a container is FINISHED")
+    parser.add_argument('--throttle-every', type=int, default=0,
+                        help="answer every Nth request with HTTP 429 to exercise client retries")
+    parser.add_argument('--accounts', metavar='FILE',
+                        help="accounts.json whose tokens are the only ones accepted, each for its own account")
+    args = parser.parse_args()
+
+    tokens = None
+    if args.accounts:
+        tokens = {account.access_token: account.account_id for account in load_accounts(args.accounts)}
+    api = MockGraphAPI(port=args.port, processing_polls=args.processing_polls,
+                       throttle_every=args.throttle_every, tokens=tokens)
+    print(f"🧪 Mock Graph API listening on {api.base_url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
@@ -0,0 +1,103 @@
+"""
+mock_links.py - Local stand-in for product image and affiliate link hosts
+
+Paths decide the answer, so feeds can mix working and broken links:
+    /images/<name>.jpg    200 image/jpeg
+    /dp/<asin>            200 text/html
+    /missing/...          404
+    /gone/...             410
+    /page/...             200 text/html (a broken image_url)
+    /busy/...             503
+    /slow/...             answers after `delay` seconds
+    /no-head/...          405 on HEAD, 200 image/jpeg on GET
+"""
+
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class MockLinkServer:
+    """In-process link host; records every (method, path) it answers"""
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, path):
+        """Return (status, content type) for a request"""
+        with self.lock:
+            self.requests.append((method, path))
+        root = path.strip('/').split('/')[0]
+        if root == 'slow':
+            time.sleep(self.delay)
+        if root == 'missing':
+            return 404, 'text/html'
+        if root == 'gone':
+            return 410, 'text/html'
+        if root == 'busy':
+            return 503, 'text/html'
+        if root == 'no-head':
+            return (405, 'text/html') if method == 'HEAD' else (200, 'image/jpeg')
+        if root in ('images', 'slow'):
+            return 200, 'image/jpeg'
+        if root in ('dp', 'page'):
+            return 200, 'text/html; charset=utf-8'
+        return 404, 'text/html'
+
+    def make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.respond(*api.handle('HEAD', urlparse(self.path).path), body=False)
+
+            def do_GET(self):
+                self.respond(*api.handle('GET', urlparse(self.path).path), body=True)
+
+            def respond(self, status, content_type, body):
+                payload = b'\xff\xd8\xff' if content_type.startswith('image/') else b'<html></html>'
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock image/affiliate link host")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--delay', type=float, default=0.5, help="seconds /slow/ paths take to answer")
+    args = parser.parse_args()
+
+    server = MockLinkServer(port=args.port, delay=args.delay)
+    print(f"🧪 Mock link host listening on {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
@@ -0,0 +1,287 @@
+"""
+pipeline.py - One entry point for scrape -> site -> post -> publish, skipping stages whose inputs did not change
+
+Stages form a small DAG and run as subprocesses; stages that do not depend on
+each other (building the site and posting) run in parallel:
+    python pipeline.py                                   # site, post and publish as needed
+    python pipeline.py --scrape "python final_scraper.py" --mode sharded --site-args="--search --refresh"
+    python pipeline.py --force site --no-post            # rebuild the site even if nothing changed
+"""
+
+import argparse
+import hashlib
+import os
+import shlex
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from git_publisher import PUBLISH_PATHS
+from metrics import Metrics
+from product_store import BUSY_TIMEOUT_SECONDS, STORE_FILE
+
+FEED_FILE = "insta_ready.json"
+SITE_OUTPUTS = ("index.html", "deals", "search")
+# Code whose changes should re-run a stage
+SITE_CODE = ("generate_html.py", "template_renderer.py", "sharded_site.py", "search_index.py",
+             "static_build.py", "catalog.py", "product_store.py", "retention.py", "price_history.py",
+             "image_pipeline.py", "link_check.py", "asin_index.py", "product_feed.py", "site_watcher.py",
+             "product_fields.py")
+PUBLISH_CODE = ("git_publisher.py",)
+
+# Stage results
+RAN = "ran"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"  # An upstream stage failed
+
+
+class Stage:
+    """A command with the files it reads and writes.
+
+    Paths may be files or directories (hashed recursively); missing paths hash
+    as missing. `always` stages have inputs outside the tree (the scraper) or
+    state that changes with time (the poster's queue and posting slots) and
+    run every time.
+    """
+
+    def __init__(self, name, command, inputs=(), outputs=(), after=(), always=False):
+        self.name = name
+        self.command = command
+        self.inputs = inputs
+        self.outputs = outputs
+        self.after = after
+        self.always = always
+
+
+class ContentHasher:
+    """SHA-256 of files and directory trees; file digests are memoized by (size, mtime)"""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock  # Guards the connection, which is shared by the stage threads
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL
+                )""")
+
+    def file_digest(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            row = self.conn.execute("SELECT size, mtime_ns, digest FROM pipeline_files WHERE path = ?",
+                                    (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO pipeline_files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                              (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def digest(self, paths, *extra):
+        """One digest over the contents of paths (files or directories) and extra strings"""
+        digest = hashlib.sha256()
+        for value in extra:
+            digest.update(f"{value}\0".encode('utf-8'))
+        for path in paths:
+            if os.path.isdir(path):
+                for directory, dirs, files in os.walk(path):
+                    dirs.sort()
+                    for name in sorted(files):
+                        file_path = os.path.join(directory, name)
+                        digest.update(f"{file_path}\0{self.file_digest(file_path)}\0".encode('utf-8'))
+            elif os.path.exists(path):
+                digest.update(f"{path}\0{self.file_digest(path)}\0".encode('utf-8'))
+            else:
+                digest.update(f"{path}\0missing\0".encode('utf-8'))
+        return digest.hexdigest()
+
+
+class PipelineRunner:
+    """Runs stages in dependency order, as many at once as the DAG allows.
+
+    A stage is skipped when the digest of its command and inputs matches its
+    last successful run and its outputs still hash to what that run left
+    behind. The input digest is taken before the stage starts, so inputs that
+    change while it runs make it run again next time.
+    """
+
+    def __init__(self, stages, db_file=STORE_FILE, metrics=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.metrics = metrics or Metrics("pipeline")
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.lock = threading.Lock()
+        self.hasher = ContentHasher(self.conn, self.lock)
+        self.print_lock = threading.Lock()
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_runs (
+                    stage TEXT PRIMARY KEY,
+                    input_hash TEXT NOT NULL,
+                    output_hash TEXT NOT NULL,
+                    seconds REAL NOT NULL,
+                    finished_at TEXT NOT NULL
+                )""")
+        self.check_dag()
+
+    def check_dag(self):
+        """Reject unknown dependencies and cycles"""
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Pipeline cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dependency in self.stages[name].after:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+                visit(dependency, path + [name])
+            state[name] = 'done'
+
+        for name in self.stages:
+            visit(name, [])
+
+    def last_run(self, name):
+        with self.lock:
+            return self.conn.execute("SELECT input_hash, output_hash FROM pipeline_runs WHERE stage = ?",
+                                     (name,)).fetchone()
+
+    def record_run(self, name, input_hash, output_hash, seconds):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO pipeline_runs (stage, input_hash, output_hash, seconds, finished_at)
+                VALUES (?, ?, ?, ?, ?)""",
+                (name, input_hash, output_hash, seconds, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def log(self, name, message):
+        with self.print_lock:
+            print(f"[{name}] {message}", flush=True)
+
+    def run_stage(self, stage, force=False):
+        """Run one stage unless it is up to date; returns RAN, SKIPPED or FAILED"""
+        input_hash = self.hasher.digest(stage.inputs, *stage.command)
+        last = self.last_run(stage.name)
+        if (not force and not stage.always and last and last[0] == input_hash
+                and last[1] == self.hasher.digest(stage.outputs)):
+            self.log(stage.name, "💤 Inputs unchanged, skipped")
+            return SKIPPED
+
+        self.log(stage.name, f"▶️  {' '.join(stage.command)}")
+        start = time.perf_counter()
+        process = subprocess.Popen(stage.command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace')
+        for line in process.stdout:
+            self.log(stage.name, line.rstrip())
+        returncode = process.wait()
+        seconds = time.perf_counter() - start
+        self.metrics.add_time(stage.name, seconds)
+        if returncode != 0:
+            self.log(stage.name, f"❌ Failed with exit code {returncode} after {seconds:.1f}s")
+            return FAILED
+        self.record_run(stage.name, input_hash, self.hasher.digest(stage.outputs), seconds)
+        self.log(stage.name, f"✅ Done in {seconds:.1f}s")
+        return RAN
+
+    def run(self, force=()):
+        """Run the DAG; returns {stage name: result}"""
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+        with ThreadPoolExecutor(max_workers=len(self.stages) or 1) as executor:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if any(dependency not in results for dependency in stage.after):
+                        continue
+                    del pending[name]
+                    if any(results[dependency] in (FAILED, BLOCKED) for dependency in stage.after):
+                        self.log(name, "⛔ Skipped, an upstream stage failed")
+                        results[name] = BLOCKED
+                        continue
+                    running[executor.submit(self.run_stage, stage, name in force)] = name
+                if not running:
+                    continue  # Only blocked stages were released; look at their dependents
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        # e.g. the store stayed locked: fail this stage, keep running independent ones
+                        self.log(name, f"❌ {type(e).__name__}: {e}")
+                        results[name] = FAILED
+        for name, result in results.items():
+            self.metrics.incr('stages', stage=name, result=result)
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+def default_stages(args):
+    """scrape (optional) -> site -> publish, with post running next to site"""
+    python = sys.executable
+    scrape = ('scrape',) if args.scrape else ()
+    stages = []
+    if args.scrape:
+        stages.append(Stage('scrape', shlex.split(args.scrape), outputs=(FEED_FILE,), always=True))
+
+    site_command = [python, 'generate_html.py', '--mode', args.mode] + shlex.split(args.site_args)
+    site_outputs = SITE_OUTPUTS + (('dist',) if '--build' in site_command else ())
+    stages.append(Stage('site', site_command, inputs=(FEED_FILE,) + SITE_CODE,
+                        outputs=site_outputs, after=scrape))
+    if not args.no_post:
+        post_command = [python, 'instagram_poster.py', '--daemon', '--once'] + shlex.split(args.post_args)
+        # Always runs: pending jobs or a newly opened posting slot do not show in the feed
+        stages.append(Stage('post', post_command, after=scrape, always=True))
+    if not args.no_publish:
+        stages.append(Stage('publish', [python, 'git_publisher.py'], inputs=PUBLISH_PATHS + PUBLISH_CODE,
+                            after=('site',)))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PandaLoon pipeline, skipping stages that are up to date")
+    parser.add_argument('--scrape', metavar='COMMAND', help="scraper command that writes the feed (always runs)")
+    parser.add_argument('--mode', choices=['soup', 'template', 'sharded'], default='template',
+                        help="generate_html.py render mode (default: template)")
+    parser.add_argument('--site-args', default='', metavar='ARGS', help="extra generate_html.py arguments")
+    parser.add_argument('--post-args', default='', metavar='ARGS', help="extra instagram_poster.py --daemon arguments")
+    parser.add_argument('--no-post', action='store_true', help="leave Instagram out of this run")
+    parser.add_argument('--no-publish', action='store_true', help="do not commit and push the site")
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help="run a stage even if its inputs are unchanged, repeatable")
+    args = parser.parse_args()
+
+    runner = PipelineRunner(default_stages(args))
+    unknown = set(args.force) - set(runner.stages)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    try:
+        results = runner.run(force=set(args.force))
+        runner.metrics.flush()
+    finally:
+        runner.close()
+
+    print("\n📊 Pipeline: " + ', '.join(f"{name} {results[name]}" for name in runner.stages))
+    print(f"⏱️  {runner.metrics.elapsed():.2f}s total")
+    if any(result in (FAILED, BLOCKED) for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+posting_daemon.py - Non-interactive poster worker backed by the durable job queue
+"""
+
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from job_queue import PENDING, CONTAINER_CREATED, FAILED
+from posting_pipeline import TokenBucket
+from product_feed import ProductFeed
+
+
+class PostingDaemon:
+    """Moves products through pending -> container_created -> published (or failed).
+
+    Each transition is committed to the queue before the next Graph API call,
+    so a restarted daemon picks up exactly where the previous one stopped. A
+    container left in container_created is checked first: if Instagram already
+    reports it as PUBLISHED it is marked done instead of being posted twice.
+    Posting history is kept in the poster's account channel, and only the
+    products routed to that account (poster.accepts) are queued.
+
+    With a PostingScheduler, pending jobs are taken and their containers
+    published best score first instead of oldest first, and with posting
+    slots a container is only created once a slot is open, for the best deal
+    available at that moment.
+
+    With a link_check.LinkChecker, the links of each product are checked
+    right before its container is created; products with broken links are
+    quarantined and their jobs failed without using the Graph API.
+    """
+
+    def __init__(self, poster, queue, feed_file, required_fields, posts_per_hour, max_workers=4,
+                 poll_interval=60, max_attempts=3, scheduler=None, checker=None):
+        self.poster = poster
+        self.queue = queue
+        self.feed_file = feed_file
+        self.required_fields = required_fields
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.bucket = TokenBucket(posts_per_hour)
+        self.scheduler = scheduler
+        self.checker = checker
+        self.stop_event = threading.Event()
+        self.feed_mtime = None
+
+    def log(self, message):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+    def stop(self, *args):
+        """Finish the current transition, then exit"""
+        if not self.stop_event.is_set():
+            self.log("🛑 Stop requested, finishing current step...")
+        self.stop_event.set()
+
+    def enqueue_new_products(self):
+        """Queue products from the feed when the file changed since the last scan"""
+        if not os.path.exists(self.feed_file):
+            return 0
+        mtime = os.path.getmtime(self.feed_file)
+        if mtime == self.feed_mtime:
+            return 0
+        self.feed_mtime = mtime
+        feed = ProductFeed(self.feed_file, required_fields=self.required_fields,
+                           skip_asin=lambda asin: (self.queue.contains(asin)
+                                                   or self.poster.asin_index.contains(asin, self.poster.channel)))
+        accepts = self.poster.accepts
+        products = [product for product in feed if not accepts or accepts(product)]
+        if self.poster.deals_first:
+            products = self.poster.rank_deals(products)
+        added = self.queue.enqueue(products)
+        if self.scheduler:
+            self.scheduler.add(products)
+            self.log_plan()
+        if added:
+            self.log(f"📥 Queued {added} new product(s) from {self.feed_file}")
+        return added
+
+    def create_containers(self):
+        """Create containers for pending jobs, keeping at most max_workers ready to publish"""
+        slots = self.max_workers - len(self.queue.jobs(CONTAINER_CREATED))
+        if self.scheduler:
+            jobs = self.scheduled_jobs(slots)
+        else:
+            jobs = self.queue.jobs(PENDING, limit=slots) if slots > 0 else []
+        if not jobs:
+            return 0
+        checked = self.check_links(jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self.safe_create, [job['product'] for job in checked])
+            for job, (success, result) in zip(checked, results):
+                if success:
+                    # Containers are published best score first, not in the order they were created
+                    score = self.scheduler.score(job['product']) if self.scheduler else None
+                    self.queue.mark_container_created(job['asin'], result, score)
+                    self.log(f"📦 Container {result} created for {job['asin']}")
+                else:
+                    self.fail(job, result)
+        return len(jobs)
+
+    def check_links(self, jobs):
+        """Jobs whose links pass the pre-flight check; the others fail for good (see --retry-failed)"""
+        if not self.checker:
+            return jobs
+        valid, quarantined = self.checker.validate([job['product'] for job in jobs])
+        self.checker.flush()
+        for product, field, reason in quarantined:
+            self.poster.metrics.incr('posts', status='quarantined')
+            self.queue.mark_failed(product['asin'], f"Link check: {field} {reason}", max_attempts=1)
+        valid_asins = {product['asin'] for product in valid}
+        return [job for job in jobs if job['asin'] in valid_asins]
+
+    def scheduled_jobs(self, limit):
+        """Best pending jobs from the scheduler; one per open slot when posting slots are set"""
+        if self.scheduler.slots:
+            # No container waiting to be published (limit == max_workers) and a slot is open
+            limit = 1 if limit == self.max_workers and self.scheduler.slot_due() else 0
+        return [{'asin': product['asin'], 'product': product} for product in self.scheduler.pop(limit)]
+
+    def requeue(self, job):
+        """Make a job that went back to pending available to the scheduler again"""
+        if self.scheduler:
+            self.scheduler.add([job['product']])
+
+    def log_plan(self):
+        if self.scheduler and self.scheduler.slots:
+            for slot, product in self.scheduler.plan(3):
+                self.log(f"🗓️  {slot.strftime('%a %H:%M')}: {product['name'][:50]}")
+
+    def safe_create(self, product):
+        try:
+            return self.poster.create_container(product)
+        except Exception as e:
+            return False, str(e)
+
+    def fail(self, job, error):
+        self.poster.metrics.incr('posts', status='failed')
+        state = self.queue.mark_failed(job['asin'], error, self.max_attempts)
+        if state != FAILED:
+            self.requeue(job)
+        action = "giving up" if state == FAILED else "will retry"
+        self.log(f"❌ {job['asin']} failed ({action}): {error[:100]}")
+
+    def publish_ready(self):
+        """Publish created containers, one token from the posts-per-hour budget each"""
+        published = 0
+        for job in self.queue.jobs(CONTAINER_CREATED):
+            if self.stop_event.is_set():
+                break
+            asin, creation_id = job['asin'], job['creation_id']
+            try:
+                status = self.poster.container_status(creation_id)
+                if status == 'PUBLISHED':
+                    # Published before a crash but not recorded: never post it again
+                    self.queue.mark_published(asin, job['post_id'])
+                    self.poster.asin_index.upsert(asin, self.poster.channel)
+                    self.log(f"♻️  {asin} was already published, recorded it")
+                    continue
+                if status in ('EXPIRED', 'ERROR'):
+                    # Counts as an attempt, so a product whose containers keep failing ends up failed
+                    self.fail(job, f"Container {creation_id} status: {status}")
+                    continue
+
+                ready, error = self.poster.wait_for_container(creation_id)
+                if not ready:
+                    self.fail(job, error)
+                    continue
+
+                wait = self.bucket.wait_time()
+                if wait > 0:
+                    if wait >= 1:
+                        self.log(f"⏳ Rate limit: next publish in {wait:.0f}s")
+                    if self.stop_event.wait(wait):
+                        break
+                self.bucket.acquire()
+
+                success, result = self.poster.publish_container(creation_id)
+            except Exception as e:
+                success, result = False, str(e)
+
+            if success:
+                self.queue.mark_published(asin, result)
+                self.poster.asin_index.upsert(asin, self.poster.channel, ref=result)
+                published += 1
+                if self.scheduler:
+                    self.scheduler.fill_slot()
+                self.poster.metrics.incr('posts', status='published')
+                self.log(f"✅ Published {job['product']['name'][:50]} - Post ID: {result}")
+            else:
+                self.fail(job, result)
+        return published
+
+    def run_once(self):
+        """One pass: scan the feed, create containers, publish what is ready"""
+        metrics = self.poster.metrics
+        with metrics.stage('load'):
+            self.enqueue_new_products()
+        with metrics.stage('create_containers'):
+            created = self.create_containers()
+        with metrics.stage('publish'):
+            published = self.publish_ready()
+        if created or published:
+            for state, count in self.queue.counts().items():
+                metrics.gauge('queue_jobs', count, state=state)
+            metrics.flush()
+        return created or published
+
+    def run(self, once=False):
+        """Work until stopped (or until the queue is drained when once=True)"""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.log(f"🚀 Posting daemon started: {self.queue.counts()}")
+        if self.scheduler:
+            self.scheduler.add(job['product'] for job in self.queue.jobs(PENDING))
+            self.log_plan()
+        while not self.stop_event.is_set():
+            busy = self.run_once()
+            if once and self.drained():
+                break
+            if not busy:
+                self.stop_event.wait(self.idle_seconds())
+        self.log(f"👋 Posting daemon stopped: {self.queue.counts()}")
+
+    def drained(self):
+        """Nothing left to do now: no jobs, or (with posting slots) only jobs waiting for a later slot"""
+        if self.queue.jobs(CONTAINER_CREATED, limit=1):
+            return False
+        if self.scheduler and self.scheduler.slots:
+            return not self.scheduler.slot_due() or not self.scheduler.count()
+        return not self.queue.jobs(PENDING, limit=1)
+
+    def idle_seconds(self):
+        """Time to wait after a pass with nothing to do: until the next scan, or the next slot if sooner"""
+        if self.scheduler and self.scheduler.slots and self.scheduler.count():
+            return min(self.poll_interval, max(1.0, self.scheduler.seconds_until_due()))
+        return self.poll_interval
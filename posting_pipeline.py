@@ -0,0 +1,85 @@
+"""
+posting_pipeline.py - Concurrent container creation with rate-limited publishing
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+
+class TokenBucket:
+    """Releases at most `rate_per_hour` tokens per hour, allowing bursts of `capacity`"""
+
+    def __init__(self, rate_per_hour, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_hour / 3600.0  # Tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until the next token is available"""
+        with self.lock:
+            self.refill()
+            return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class PostingPipeline:
+    """Creates media containers in parallel and publishes them through a token bucket.
+
+    Container creation and status polling run on a thread pool; publishing
+    happens on the calling thread in the order containers become ready, each
+    publish taking one token from the posts-per-hour budget.
+    """
+
+    def __init__(self, poster, posts_per_hour, max_workers=4, bucket=None):
+        self.poster = poster
+        self.max_workers = max_workers
+        self.bucket = bucket or TokenBucket(posts_per_hour)
+
+    def run(self, products):
+        """Post the products; results are recorded on the poster"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.poster.prepare_post, product): product for product in products}
+            for future in as_completed(futures):
+                product = futures[future]
+                success, result = future.result()
+                if not success:
+                    print(f"❌ FAILED: {product['name'][:50]} - {result}")
+                    self.poster.record_failure(product, result)
+                    continue
+
+                wait = self.bucket.wait_time()
+                if wait >= 1:
+                    print(f"⏳ Rate limit: next publish in {wait:.0f}s")
+                self.bucket.acquire()
+
+                try:
+                    success, result = self.poster.publish_container(result)
+                except Exception as e:
+                    success, result = False, str(e)
+                if success:
+                    print(f"✅ {datetime.now().strftime('%I:%M:%S %p')} Published {product['name'][:50]} - Post ID: {result}")
+                    self.poster.record_success(product, result)
+                else:
+                    print(f"❌ FAILED: {product['name'][:50]} - {result}")
+                    self.poster.record_failure(product, result)
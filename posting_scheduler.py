@@ -0,0 +1,180 @@
+"""
+posting_scheduler.py - Picks the best pending deal for each posting slot of the day
+
+Products are scored once, when they enter the scheduler, and kept in a heap,
+so new feed items are pushed in O(log n) and each slot pops the best deal
+without re-sorting the backlog. Scores must not depend on when they are
+computed; the default one counts freshness as the scrape time itself, which
+ranks two products the same way whenever it is evaluated.
+
+The score is pluggable: pick one of SCORES by name, or give "module:function"
+for a function taking a product and returning a number (higher posts first).
+"""
+
+import heapq
+import importlib
+import itertools
+import re
+from datetime import datetime, time, timedelta
+
+from product_fields import discount_percent, parse_time
+
+SLOT_TIMES = ("09:00", "12:30", "18:00", "21:00")  # Posting slots across the day (daemon --slots)
+DISCOUNT_WEIGHT = 1.0  # Score points per % of discount
+RATING_WEIGHT = 10.0  # Score points per rating star
+FRESHNESS_PER_HOUR = 1.0  # Score points per hour between scrape times (newer is better)
+
+
+def rating(product):
+    """'4.3' or '4.3 out of 5 stars' -> 4.3; 0 when missing"""
+    match = re.search(r'\d+(?:\.\d+)?', str(product.get('rating') or ''))
+    return float(match.group()) if match else 0.0
+
+
+def scraped_hours(product):
+    """Scrape time in hours since the epoch; products without one count as the oldest (0)"""
+    scraped_at = parse_time(product.get('scraped_at'))
+    return scraped_at.timestamp() / 3600 if scraped_at else 0.0
+
+
+def deal_score(product):
+    """Discount, rating and freshness: 10% more discount or one more star outweighs 10 hours of age"""
+    return (DISCOUNT_WEIGHT * discount_percent(product) + RATING_WEIGHT * rating(product)
+            + FRESHNESS_PER_HOUR * scraped_hours(product))
+
+
+def discount_score(product):
+    return discount_percent(product)
+
+
+def freshness_score(product):
+    return scraped_hours(product)
+
+
+def feed_order_score(product):
+    """Every product scores the same, so products are posted in feed order"""
+    return 0
+
+
+SCORES = {
+    'deal': deal_score,
+    'discount': discount_score,
+    'fresh': freshness_score,
+    'feed': feed_order_score,
+}
+
+
+def load_score(name):
+    """A score function from SCORES, or imported from 'module:function'"""
+    if name in SCORES:
+        return SCORES[name]
+    module, _, function = name.partition(':')
+    if not function:
+        raise ValueError(f"Unknown score {name!r}: use one of {', '.join(SCORES)} or module:function")
+    return getattr(importlib.import_module(module), function)
+
+
+def parse_slots(value):
+    """'09:00,18:30' -> ((9, 0), (18, 30)), sorted"""
+    slots = []
+    for slot in value.split(',') if isinstance(value, str) else value:
+        hour, _, minute = slot.strip().partition(':')
+        slots.append((int(hour), int(minute or 0)))
+    if not slots or any(not (0 <= hour < 24 and 0 <= minute < 60) for hour, minute in slots):
+        raise ValueError(f"Invalid posting slots: {value!r}")
+    return tuple(sorted(set(slots)))
+
+
+class PostingScheduler:
+    """Max-heap of pending products by score, plus the day's posting slots.
+
+    Ties keep the order products were added in. An ASIN is in the heap at
+    most once; popping it makes room for it to be added again (a retry).
+    With slots, slot_due() says whether the current slot is open: it stays
+    open until fill_slot() is called after a successful post, so a failed
+    attempt lets the next best product take the same slot.
+    """
+
+    def __init__(self, score=deal_score, slots=None, clock=datetime.now):
+        self.score = score
+        self.slots = parse_slots(slots) if slots else None
+        self.clock = clock
+        self.heap = []  # (-score, order, asin, product)
+        self.queued = set()
+        self.sequence = itertools.count()
+        self.next_due = self.next_slot(self.clock()) if self.slots else None
+
+    def count(self):
+        """Number of products waiting in the heap"""
+        return len(self.queued)
+
+    def add(self, products):
+        """Push products that are not in the heap yet; returns how many were added"""
+        added = 0
+        for product in products:
+            asin = product.get('asin')
+            if asin in self.queued:
+                continue
+            heapq.heappush(self.heap, (-self.score(product), next(self.sequence), asin, product))
+            self.queued.add(asin)
+            added += 1
+        return added
+
+    def pop(self, count=1):
+        """Remove and return up to count products, best first"""
+        products = []
+        while self.heap and len(products) < count:
+            _, _, asin, product = heapq.heappop(self.heap)
+            self.queued.discard(asin)
+            products.append(product)
+        return products
+
+    def peek(self, count):
+        """The best count products without removing them"""
+        return [product for _, _, _, product in heapq.nsmallest(count, self.heap)]
+
+    @staticmethod
+    def best_first(products, count, score=deal_score):
+        """products with the best count of them moved to the front, best first (O(n log count))"""
+        # Same order as the heap: highest score, then earliest in the list
+        best = heapq.nsmallest(count, enumerate(products), key=lambda item: (-score(item[1]), item[0]))
+        chosen = {position for position, _ in best}
+        return [product for _, product in best] + [product for position, product in enumerate(products)
+                                                   if position not in chosen]
+
+    # -------------------------------------
+    # Slots
+    # -------------------------------------
+
+    def next_slot(self, after):
+        """First slot time strictly after `after`"""
+        for hour, minute in self.slots:
+            slot = datetime.combine(after.date(), time(hour, minute))
+            if slot > after:
+                return slot
+        hour, minute = self.slots[0]
+        return datetime.combine(after.date() + timedelta(days=1), time(hour, minute))
+
+    def slot_due(self):
+        """Whether a slot is open (always, without slots)"""
+        return self.next_due is None or self.clock() >= self.next_due
+
+    def seconds_until_due(self):
+        if self.next_due is None:
+            return 0
+        return max(0.0, (self.next_due - self.clock()).total_seconds())
+
+    def fill_slot(self):
+        """Close the open slot; slots missed while nothing was posted are skipped"""
+        if self.next_due is not None:
+            self.next_due = self.next_slot(max(self.next_due, self.clock()))
+
+    def plan(self, count):
+        """[(slot time, product)] of the next count slots if nothing else arrived"""
+        if not self.slots:
+            return [(None, product) for product in self.peek(count)]
+        plan, slot = [], self.next_due
+        for product in self.peek(count):
+            plan.append((slot, product))
+            slot = self.next_slot(slot)
+        return plan
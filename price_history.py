@@ -0,0 +1,288 @@
+"""
+price_history.py - Append-only price history per ASIN, with deal rankings kept up to date on ingest
+
+Prices are parsed once, when a feed is ingested, and appended to numeric
+columns per ASIN (timestamps, prices, original prices) stored as packed
+arrays in the product store database. An observation is only appended when
+a price changed. Each ingest re-scores just the ASINs it touched, plus those
+whose 7-day window moved past a price change, so reading the top k deals of
+a ranking is an indexed LIMIT k query:
+    python price_history.py                               # ingest the feed, print the top deals
+    python price_history.py --ranking drop_7d --category Electronics --top 20
+    python price_history.py --history B0XXXXXXXX
+"""
+
+import argparse
+import sqlite3
+import time
+from array import array
+from datetime import datetime
+
+from product_feed import ProductFeed
+from product_fields import parse_amount
+from product_store import BUSY_TIMEOUT_SECONDS, STORE_FILE
+
+TIME_TYPECODE = 'q'  # Epoch seconds
+PRICE_TYPECODE = 'd'  # Rupees
+DROP_WINDOW_SECONDS = 7 * 24 * 3600
+INGEST_BATCH = 500  # ASINs looked up per query while ingesting
+TOP_DEALS = 12  # Deals picked for the site's top deals section
+
+# Ranking -> price_stats column, highest score first:
+#   all_time_low  % below the highest price ever seen, for products at their lowest price (2+ prices seen)
+#   drop_7d       % below the highest price of the last 7 days
+#   discount      % off the original price
+RANKINGS = {'all_time_low': 'low_score', 'drop_7d': 'drop_7d', 'discount': 'discount'}
+TOP_DEALS_ORDER = ('drop_7d', 'all_time_low', 'discount')
+
+
+def percent_below(price, reference):
+    """How far price is below reference, in percent; None when it is not below"""
+    if not reference or price >= reference:
+        return None
+    return round((reference - price) / reference * 100, 1)
+
+
+def score(times, prices, originals, now, window=DROP_WINDOW_SECONDS):
+    """Ranking scores of one ASIN from its history columns.
+
+    Returns (low_score, drop_7d, discount, rescore_at): rescore_at is when the
+    oldest price change inside the window leaves it, the next time drop_7d can
+    change without a new observation (None when nothing is left to expire).
+    """
+    price, original = prices[-1], originals[-1]
+    low_score = None
+    if len(prices) > 1 and price <= min(prices):
+        low_score = percent_below(price, max(prices))
+
+    start = now - window
+    # The price in effect when the window opened counts as well
+    first = max((i for i, observed in enumerate(times) if observed <= start), default=0)
+    drop_7d = percent_below(price, max(prices[first:]))
+    pending = [observed for observed in times[first + 1:] if observed > start]
+    rescore_at = pending[0] + window if pending else None
+
+    discount = percent_below(price, original) or 0
+    return low_score, drop_7d, discount, rescore_at
+
+
+class PriceHistory:
+    """Columnar price history and precomputed rankings in the shared store database.
+
+    price_history holds the packed columns; price_stats holds one row of
+    scores per ASIN, indexed per ranking (overall and per category).
+    Appending concatenates in SQL, so existing history is never read back to
+    add a price; only re-scoring decodes it.
+    """
+
+    def __init__(self, db_file=STORE_FILE, clock=time.time, metrics=None):
+        self.clock = clock
+        self.metrics = metrics  # Optional metrics.Metrics receiving price_history counters
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS price_history (
+                    asin TEXT PRIMARY KEY,
+                    times BLOB NOT NULL,
+                    prices BLOB NOT NULL,
+                    originals BLOB NOT NULL
+                ) WITHOUT ROWID""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS price_stats (
+                    asin TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    original REAL NOT NULL,
+                    observations INTEGER NOT NULL,
+                    low_score REAL,
+                    drop_7d REAL,
+                    discount REAL NOT NULL,
+                    rescore_at INTEGER
+                ) WITHOUT ROWID""")
+            for column in RANKINGS.values():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_price_stats_{column} ON price_stats ({column})")
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_price_stats_category_{column} ON price_stats (category, {column})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_price_stats_rescore ON price_stats (rescore_at)")
+
+    # -------------------------------------
+    # Ingest
+    # -------------------------------------
+
+    def ingest(self, products):
+        """Append changed prices of a product stream and re-score what moved; returns (appended, rescored)"""
+        now = int(self.clock())
+        appended = rescored = 0
+        batch = {}
+        with self.conn:
+            for product in products:
+                price = parse_amount(product.get('price'))
+                if not product.get('asin') or not price:
+                    continue
+                original = parse_amount(product.get('original_price')) or price
+                batch[product['asin']] = (product.get('category') or '', float(price), float(original))
+                if len(batch) == INGEST_BATCH:
+                    appended += self.append_batch(batch, now)
+                    batch = {}
+            appended += self.append_batch(batch, now)
+            # Drops whose 7-day window moved past a price change
+            due = [asin for (asin,) in self.conn.execute(
+                "SELECT asin FROM price_stats WHERE rescore_at <= ?", (now,))]
+            rescored = appended + len(due)
+            for start in range(0, len(due), INGEST_BATCH):
+                self.rescore(due[start:start + INGEST_BATCH], now)
+        if self.metrics:
+            self.metrics.incr('price_observations', appended)
+            self.metrics.incr('price_rescored', rescored)
+        return appended, rescored
+
+    def append_batch(self, batch, now):
+        """Append observations for {asin: (category, price, original)} whose prices changed"""
+        if not batch:
+            return 0
+        asins = list(batch)
+        last = {asin: (category, price, original) for asin, category, price, original in self.conn.execute(
+            f"SELECT asin, category, price, original FROM price_stats WHERE asin IN ({','.join('?' * len(asins))})",
+            asins)}
+        changed = [asin for asin in asins if asin not in last or last[asin][1:] != batch[asin][1:]]
+        moved = [asin for asin in asins if asin in last and asin not in changed and last[asin][0] != batch[asin][0]]
+        rows = [(asin,
+                 array(TIME_TYPECODE, [now]).tobytes(),
+                 array(PRICE_TYPECODE, [batch[asin][1]]).tobytes(),
+                 array(PRICE_TYPECODE, [batch[asin][2]]).tobytes()) for asin in changed]
+        self.conn.executemany("""
+            INSERT INTO price_history (asin, times, prices, originals) VALUES (?, ?, ?, ?)
+            ON CONFLICT (asin) DO UPDATE SET times = CAST(times || excluded.times AS BLOB),
+                                             prices = CAST(prices || excluded.prices AS BLOB),
+                                             originals = CAST(originals || excluded.originals AS BLOB)""", rows)
+        self.rescore(changed, now, {asin: batch[asin][0] for asin in changed})
+        # A product that changed category only moves between per-category rankings
+        self.conn.executemany("UPDATE price_stats SET category = ? WHERE asin = ?",
+                              [(batch[asin][0], asin) for asin in moved])
+        return len(changed)
+
+    def columns(self, asins):
+        """{asin: (times, prices, originals)} decoded from the packed history"""
+        history = {}
+        for asin, times, prices, originals in self.conn.execute(
+                f"SELECT asin, times, prices, originals FROM price_history WHERE asin IN ({','.join('?' * len(asins))})",
+                asins):
+            history[asin] = tuple(array(typecode, blob) for typecode, blob in
+                                  ((TIME_TYPECODE, times), (PRICE_TYPECODE, prices), (PRICE_TYPECODE, originals)))
+        return history
+
+    def rescore(self, asins, now, categories=None):
+        """Recompute the ranking scores of asins from their history; categories ({asin: category}) adds new rows"""
+        if not asins:
+            return
+        history = self.columns(asins)
+        rows = []
+        for asin in asins:
+            times, prices, originals = history[asin]
+            rows.append((prices[-1], originals[-1], len(prices), *score(times, prices, originals, now), asin))
+        if categories is None:
+            self.conn.executemany("""
+                UPDATE price_stats SET price = ?, original = ?, observations = ?,
+                    low_score = ?, drop_7d = ?, discount = ?, rescore_at = ? WHERE asin = ?""", rows)
+            return
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO price_stats (price, original, observations, low_score, drop_7d, discount,
+                                                rescore_at, asin, category)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", [row + (categories[row[-1]],) for row in rows])
+
+    # -------------------------------------
+    # Rankings
+    # -------------------------------------
+
+    def top(self, ranking, k=TOP_DEALS, category=None):
+        """[(asin, score)] of the k best deals of a ranking, optionally within one category"""
+        column = RANKINGS[ranking]
+        where = f"{column} > 0" + (" AND category = ?" if category else "")
+        return self.conn.execute(
+            f"SELECT asin, {column} FROM price_stats WHERE {where} ORDER BY {column} DESC LIMIT ?",
+            ((category,) if category else ()) + (k,)).fetchall()
+
+    def top_deals(self, k=TOP_DEALS, category=None, rankings=TOP_DEALS_ORDER):
+        """ASINs of the k best deals, taking 7-day drops first, then all-time lows, then discounts"""
+        asins = []
+        for ranking in rankings:
+            for asin, _ in self.top(ranking, k, category):
+                if asin not in asins:
+                    asins.append(asin)
+            if len(asins) >= k:
+                break
+        return asins[:k]
+
+    def rank_first(self, products, k=TOP_DEALS):
+        """products with the k best deals among them moved to the front, best first.
+
+        Ranks the given products themselves, in top_deals order: 7-day drops,
+        then all-time lows, then discounts.
+        """
+        asins = list({product['asin'] for product in products if product.get('asin')})
+        best = []
+        for start in range(0, len(asins), INGEST_BATCH):
+            batch = asins[start:start + INGEST_BATCH]
+            best += self.conn.execute(f"""
+                SELECT asin, drop_7d, low_score, discount FROM price_stats
+                WHERE asin IN ({','.join('?' * len(batch))}) AND (drop_7d > 0 OR low_score > 0 OR discount > 0)
+                ORDER BY drop_7d DESC, low_score DESC, discount DESC LIMIT ?""", batch + [k]).fetchall()
+        # Merge the batches in the same order (missing scores last)
+        best.sort(key=lambda row: [(value is not None, value or 0) for value in row[1:]], reverse=True)
+        order = {row[0]: position for position, row in enumerate(best[:k])}
+        top = sorted((product for product in products if product.get('asin') in order),
+                     key=lambda product: order[product['asin']])
+        return top + [product for product in products if product.get('asin') not in order]
+
+    def history(self, asin):
+        """[(observed at, price, original price)] of one ASIN, oldest first"""
+        columns = self.columns([asin]).get(asin)
+        if not columns:
+            return []
+        return [(datetime.fromtimestamp(observed).strftime('%Y-%m-%d %H:%M'), price, original)
+                for observed, price, original in zip(*columns)]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM price_stats").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record feed prices and show the best deals")
+    parser.add_argument('feeds', nargs='*', default=["insta_ready.json"], help="feeds to ingest")
+    parser.add_argument('--no-ingest', action='store_true', help="only read the rankings")
+    parser.add_argument('--ranking', choices=RANKINGS, help="show one ranking (default: the combined top deals)")
+    parser.add_argument('--category', help="only rank products of this category")
+    parser.add_argument('--top', type=int, default=TOP_DEALS, metavar='K', help=f"deals to show (default: {TOP_DEALS})")
+    parser.add_argument('--history', metavar='ASIN', help="print the price history of one ASIN")
+    args = parser.parse_args()
+
+    history = PriceHistory()
+    try:
+        if args.history:
+            for observed, price, original in history.history(args.history):
+                print(f"{observed}  ₹{price:,.0f} (was ₹{original:,.0f})")
+            return
+        if not args.no_ingest:
+            appended, rescored = history.ingest(ProductFeed(args.feeds))
+            print(f"📈 {appended} price change(s) recorded, {rescored} product(s) re-ranked, "
+                  f"{history.count()} tracked")
+        if args.ranking:
+            deals = history.top(args.ranking, args.top, args.category)
+            print(f"🏆 Top {args.ranking} deals:")
+            for asin, value in deals:
+                print(f"   • {asin}: {value:g}%")
+        else:
+            print("🏆 Top deals: " + (', '.join(history.top_deals(args.top, args.category)) or "none yet"))
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
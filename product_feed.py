@@ -0,0 +1,100 @@
+"""
+product_feed.py - Streaming reader for scraper product feeds (JSON array or JSON lines)
+"""
+
+import json
+from itertools import chain
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ProductFeed:
+    """Lazily yields validated, de-duplicated products from one or more feed files.
+
+    Each file may be a JSON array (the format of insta_ready.json) or newline
+    delimited JSON with one product per line. Only the current chunk and the
+    set of ASINs seen so far are held in memory.
+    """
+
+    def __init__(self, paths, required_fields=('asin',), skip_asin=None):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.required_fields = required_fields
+        self.skip_asin = skip_asin  # Optional predicate for ASINs that are already known
+        self.read = 0
+        self.invalid = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        seen = set()
+        for path in self.paths:
+            for product in self.iter_file(path):
+                self.read += 1
+                error = self.validate(product)
+                if error:
+                    self.invalid += 1
+                    print(f"⚠️ Skipping invalid product in {path}: {error}")
+                    continue
+                asin = product['asin']
+                if asin in seen or (self.skip_asin and self.skip_asin(asin)):
+                    self.skipped += 1
+                    continue
+                seen.add(asin)
+                yield product
+
+    def validate(self, product):
+        """Return a reason the record is unusable, or None if it is fine"""
+        if not isinstance(product, dict):
+            return f"expected an object, got {type(product).__name__}"
+        for field in self.required_fields:
+            value = product.get(field)
+            if not isinstance(value, str) or not value.strip():
+                return f"missing '{field}'"
+        return None
+
+    def iter_file(self, path):
+        """Yield the raw records of a single feed file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            first = f.read(1)
+            while first and first.isspace():
+                first = f.read(1)
+            if first == '[':
+                yield from self.iter_array(f)
+            elif first:
+                yield from self.iter_lines(first + f.readline(), f)
+
+    def iter_lines(self, first_line, f):
+        """Parse newline delimited JSON"""
+        for line in chain([first_line], f):
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def iter_array(self, f):
+        """Parse the elements of a JSON array whose opening bracket was already consumed"""
+        decoder = json.JSONDecoder()
+        buffer = ''
+        pos = 0
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer):
+                if buffer[pos] == ']':
+                    return
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A value ending exactly at the buffer end may continue in the next chunk
+                    if end < len(buffer) or eof:
+                        yield record
+                        pos = end
+                        continue
+            elif eof:
+                raise ValueError("Unterminated JSON array in product feed")
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
@@ -0,0 +1,33 @@
+"""
+product_fields.py - Site categories and parsing of feed product fields, shared by the site and the poster
+"""
+
+import re
+from datetime import datetime
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # scraped_at, and the other timestamps kept next to products
+CATEGORIES = ("Electronics", "Home & Decor", "Fitness")  # Site sections, in page order
+DEFAULT_CATEGORY = "Home & Decor"  # Section of products with a missing or unknown category
+
+
+def parse_amount(value):
+    """'₹1,299' -> 1299, '73%' -> 73; None when there is no number"""
+    digits = re.sub(r'[^\d.]', '', str(value or ''))
+    try:
+        return int(float(digits))
+    except ValueError:
+        return None
+
+
+def discount_percent(product):
+    """'73%' or '73% off' -> 73; 0 when missing"""
+    match = re.search(r'\d+', str(product.get('discount') or ''))
+    return int(match.group()) if match else 0
+
+
+def parse_time(value):
+    """Parse a scraped_at style timestamp, or return None"""
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,162 @@
+"""
+product_store.py - SQLite store of site products and their pre-rendered HTML fragments
+"""
+
+import hashlib
+import json
+import sqlite3
+
+STORE_FILE = "pandaloon.db"  # Local state, not published with the site
+# The site, poster and pipeline write the store concurrently: wait this long for another writer's commit
+BUSY_TIMEOUT_SECONDS = 30
+
+# Fields that end up in a product's HTML fragment
+FRAGMENT_FIELDS = ('name', 'price', 'original_price', 'image_url', 'affiliate_link')
+# Fields whose change makes a stored product stale (what a refresh compares)
+CHANGE_FIELDS = FRAGMENT_FIELDS + ('discount', 'category')
+
+
+def content_hash(product, fields=CHANGE_FIELDS):
+    """Stable hash of the product fields that affect its rendered output"""
+    payload = json.dumps([product.get(field, '') for field in fields], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ProductStore:
+    def __init__(self, db_file=STORE_FILE):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.last_seq = None
+        self.changed = False  # Products written since the last commit
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the products table (and its change counter) if they do not exist yet"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS products (
+                    asin TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    fragment TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )""")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_products_category_seq ON products (category, seq)")
+            # One row, bumped by every commit that wrote products (see version())
+            self.conn.execute("CREATE TABLE IF NOT EXISTS products_version (version INTEGER NOT NULL)")
+            self.conn.execute(
+                "INSERT INTO products_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM products_version)")
+
+    def count(self):
+        """Number of stored products"""
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def has(self, asin):
+        """Whether the ASIN is already stored"""
+        return self.conn.execute("SELECT 1 FROM products WHERE asin = ?", (asin,)).fetchone() is not None
+
+    def next_seq(self):
+        """Insertion sequence number for the next new product (higher = newer)"""
+        if self.last_seq is None:
+            self.last_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM products").fetchone()[0]
+        self.last_seq += 1
+        return self.last_seq
+
+    def upsert(self, asin, category, product_hash, fragment, product, seq=None):
+        """Insert a product or replace its fragment, keeping the original position"""
+        if seq is None:
+            seq = self.next_seq()
+        elif self.last_seq is not None:
+            self.last_seq = max(self.last_seq, seq)
+        self.conn.execute("""
+            INSERT INTO products (asin, category, seq, content_hash, fragment, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(asin) DO UPDATE SET
+                category = excluded.category,
+                content_hash = excluded.content_hash,
+                fragment = excluded.fragment,
+                data = excluded.data""",
+            (asin, category, seq, product_hash, fragment, json.dumps(product, ensure_ascii=False)))
+        self.changed = True
+
+    def records(self, fragments=True):
+        """(asin, category, seq, content_hash, fragment) of every product in insertion order;
+        without fragments, fragment is None and the rendered HTML is never read"""
+        fragment = 'fragment' if fragments else 'NULL'
+        return self.conn.execute(f"SELECT asin, category, seq, content_hash, {fragment} FROM products ORDER BY seq")
+
+    def deal_times(self):
+        """{asin: scraped_at} of every stored product that has one"""
+        rows = self.conn.execute("""
+            SELECT asin, json_extract(data, '$.scraped_at') FROM products
+            WHERE json_extract(data, '$.scraped_at') IS NOT NULL""")
+        return dict(rows)
+
+    def products(self, asins):
+        """{asin: product dict} of stored products"""
+        products = {}
+        for asin in asins:
+            row = self.conn.execute("SELECT data FROM products WHERE asin = ?", (asin,)).fetchone()
+            if row:
+                products[asin] = json.loads(row[0])
+        return products
+
+    def fragments_for(self, asins):
+        """Rendered fragments of the given products in the given order, skipping ones not stored"""
+        fragments = []
+        for asin in asins:
+            row = self.conn.execute("SELECT fragment FROM products WHERE asin = ?", (asin,)).fetchone()
+            if row:
+                fragments.append(row[0])
+        return fragments
+
+    def delete(self, asins):
+        """Remove products (not committed)"""
+        rows = [(asin,) for asin in asins]
+        if rows:
+            self.conn.executemany("DELETE FROM products WHERE asin = ?", rows)
+            self.changed = True
+
+    def position(self, category, seq):
+        """Number of products of a category inserted before the given sequence number"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM products WHERE category = ? AND seq < ?", (category, seq)).fetchone()[0]
+
+    def fragments(self, category, limit=-1):
+        """Rendered fragments of a category, newest first"""
+        rows = self.conn.execute(
+            "SELECT fragment FROM products WHERE category = ? ORDER BY seq DESC LIMIT ?", (category, limit))
+        return [row[0] for row in rows]
+
+    def page_fragments(self, category, offset, limit):
+        """A slice of a category in insertion order (oldest first)"""
+        rows = self.conn.execute(
+            "SELECT fragment FROM products WHERE category = ? ORDER BY seq LIMIT ? OFFSET ?",
+            (category, limit, offset))
+        return [row[0] for row in rows]
+
+    def category_stats(self, category):
+        """(product count, highest sequence number) of a category"""
+        return self.conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM products WHERE category = ?", (category,)).fetchone()
+
+    def count_since(self, category, seq):
+        """Number of products in a category inserted after the given sequence number"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM products WHERE category = ? AND seq > ?", (category, seq)).fetchone()[0]
+
+    def version(self):
+        """Change counter of the products table: moves only when products were written"""
+        return self.conn.execute("SELECT version FROM products_version").fetchone()[0]
+
+    def commit(self):
+        if self.changed:
+            self.conn.execute("UPDATE products_version SET version = version + 1")
+            self.changed = False
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -1,10 +1,8 @@
-import subprocess
+"""
+push_to_git.py - Kept for existing habits and scripts; publishing lives in git_publisher.py
+"""
 
-commands = [
-    "git add .",
-    "git commit -m \"update\"",
-    "git push origin main"
-]
+from git_publisher import main
 
-for cmd in commands:
-    subprocess.run(cmd, shell=True)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+retention.py - Per-category deal expiry and size caps, with optional monthly archives
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from product_fields import TIME_FORMAT, parse_time
+
+ARCHIVE_DIR = "archive"  # Local, not published with the site
+RETIRED_DAYS = 180  # How long an evicted ASIN is kept from coming back
+
+# Deals older than ttl_days are evicted, and each category keeps at most max_items (newest first)
+DEFAULT_POLICY = {'ttl_days': 30, 'max_items': 500}
+CATEGORY_POLICIES = {
+    "Electronics": {'ttl_days': 14, 'max_items': 300},
+    "Home & Decor": {'ttl_days': 30, 'max_items': 500},
+    "Fitness": {'ttl_days': 30, 'max_items': 300},
+}
+
+
+class RetentionPolicy:
+    """Decides which deals leave the site.
+
+    A deal's age is measured from its scraped_at time, falling back to when
+    the site first listed it. Deals without either are only subject to the
+    max_items cap.
+    """
+
+    def __init__(self, policies=CATEGORY_POLICIES, default=DEFAULT_POLICY, now=None):
+        self.policies = policies
+        self.default = default
+        self.now = now or datetime.now()
+
+    def policy(self, category):
+        return self.policies.get(category, self.default)
+
+    def cutoff(self, category):
+        return self.now - timedelta(days=self.policy(category)['ttl_days'])
+
+    def is_expired(self, category, deal_time):
+        """Whether a deal timestamp (string or datetime) is past its category's TTL"""
+        if isinstance(deal_time, str):
+            deal_time = parse_time(deal_time)
+        return deal_time is not None and deal_time < self.cutoff(category)
+
+    def select(self, category, deals):
+        """deals: (asin, deal_time) pairs of a category, newest first.
+
+        Returns (asin, reason) pairs to evict, reason being 'expired' or 'max_items'.
+        """
+        max_items = self.policy(category)['max_items']
+        evicted = []
+        for position, (asin, deal_time) in enumerate(deals):
+            if position >= max_items:
+                evicted.append((asin, 'max_items'))
+            elif self.is_expired(category, deal_time):
+                evicted.append((asin, 'expired'))
+        return evicted
+
+    def retired_cutoff(self):
+        """Evicted ASINs recorded before this time may be listed again"""
+        return (self.now - timedelta(days=RETIRED_DAYS)).strftime(TIME_FORMAT)
+
+
+class DealArchive:
+    """Appends evicted deals to gzip-compressed JSON lines files, one per month"""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.pending = {}  # month -> archived lines
+
+    def add(self, product, category, reason, evicted_at=None):
+        evicted_at = evicted_at or datetime.now()
+        entry = {
+            'evicted_at': evicted_at.strftime(TIME_FORMAT),
+            'reason': reason,
+            'category': category,
+            'product': product,
+        }
+        self.pending.setdefault(evicted_at.strftime('%Y-%m'), []).append(json.dumps(entry, ensure_ascii=False))
+
+    def flush(self):
+        """Write buffered entries; returns the archive files written to"""
+        written = []
+        if self.pending:
+            os.makedirs(self.archive_dir, exist_ok=True)
+        for month, lines in sorted(self.pending.items()):
+            path = os.path.join(self.archive_dir, f"deals-{month}.jsonl.gz")
+            # Appending adds a gzip member; gzip readers see one continuous stream
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            written.append(path)
+        self.pending = {}
+        return written
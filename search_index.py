@@ -0,0 +1,283 @@
+"""
+search_index.py - Sharded JSON search index of the stored products, plus the script that queries it
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+
+from product_fields import parse_amount
+
+SEARCH_DIR = "search"  # Relative to the site root, published with the site
+DOC_SHARD_SIZE = 500  # Products per docs-<n>.json, by insertion sequence number
+FACET_SHARD = "_"  # Term shard holding the category/price/discount facets
+PRICE_BUCKETS = (250, 500, 1000, 2000, 5000, 10000, 20000)  # "under ₹X" upper bounds
+DISCOUNT_BUCKETS = (10, 20, 30, 40, 50, 60, 70, 80, 90)  # "X% off or more" lower bounds
+STOPWORDS = {'and', 'for', 'the', 'with', 'of', 'in', 'to', 'by', 'on'}
+NAME_LENGTH = 80
+
+SEARCH_SCRIPT = r"""/* PandaLoon deal search: loads index shards only when a query needs them */
+(function () {
+  var script = document.currentScript, base = script.src.replace(/[^\/?]*(\?.*)?$/, '');
+  var version = script.getAttribute('data-version'), cache = {}, timer = null;
+  var input = document.getElementById('search-input'), out = document.getElementById('search-results');
+  var sections = document.querySelectorAll('section');
+  function load(name) {
+    if (!cache[name]) cache[name] = fetch(base + name + '.json?v=' + version)
+      .then(function (r) { return r.ok ? r.json() : {}; });
+    return cache[name];
+  }
+  function parse(meta, text) {
+    // Terms are ANDed; each is a list of facet tokens (ORed) or a word prefix
+    var q = ' ' + text.toLowerCase().replace(/,/g, '') + ' ', f = {terms: [], maxPrice: null, minOff: null}, m;
+    var any = meta.categories.map(function (c, i) { return 'c:' + i; });
+    if ((m = q.match(/(under|below|less than|upto|up to|<)\s*(₹|rs\.?|inr)?\s*(\d+)/))) {
+      f.maxPrice = +m[3]; q = q.replace(m[0], ' ');
+      var p = meta.price_buckets.filter(function (b) { return b >= f.maxPrice; })[0];
+      f.terms.push(p ? ['p:' + p] : any);
+    }
+    if ((m = q.match(/(over|above|at least|min)?\s*(\d+)\s*(%|percent)\s*(off)?/))) {
+      f.minOff = +m[2]; q = q.replace(m[0], ' ');
+      var d = meta.discount_buckets.filter(function (b) { return b <= f.minOff; }).pop();
+      f.terms.push(d ? ['d:' + d] : any);
+    }
+    meta.categories.forEach(function (c, i) {
+      var name = c.toLowerCase();
+      if (q.indexOf(name) >= 0) { f.terms.push(['c:' + i]); q = q.replace(name, ' '); }
+    });
+    (q.match(/[a-z0-9]+/g) || []).forEach(function (w) {
+      if (w.length > 1 && meta.stopwords.indexOf(w) < 0 && w !== 'off' && w !== 'deals') f.terms.push({prefix: w});
+    });
+    return f;
+  }
+  function postings(term) {
+    return load(term.prefix ? 'terms-' + term.prefix[0] : 'terms-_').then(function (index) {
+      var seqs = [];
+      if (term.prefix) {
+        for (var key in index) if (key.lastIndexOf(term.prefix, 0) === 0) seqs = seqs.concat(index[key]);
+      } else {
+        term.forEach(function (token) { seqs = seqs.concat(index[token] || []); });
+      }
+      return seqs;
+    });
+  }
+  function search(text) {
+    return load('meta').then(function (meta) {
+      var f = parse(meta, text);
+      if (!f.terms.length) return null;
+      return Promise.all(f.terms.map(postings)).then(function (lists) {
+        var hits = lists.reduce(function (acc, list) {
+          var set = {}; list.forEach(function (s) { set[s] = 1; });
+          return acc === null ? Object.keys(set).map(Number) : acc.filter(function (s) { return set[s]; });
+        }, null).sort(function (a, b) { return b - a; });
+        // Newest hits first; doc shards are loaded in that order until enough pass the exact filters
+        var found = [];
+        function collect(i) {
+          if (i >= hits.length || found.length >= meta.max_results) return found.slice(0, meta.max_results);
+          var n = Math.floor(hits[i] / meta.doc_shard_size);
+          return load('docs-' + n).then(function (shard) {
+            for (; i < hits.length && Math.floor(hits[i] / meta.doc_shard_size) === n; i++) {
+              var d = shard[hits[i]];
+              if (d && (f.maxPrice === null || d[2] <= f.maxPrice) && (f.minOff === null || d[3] >= f.minOff)) {
+                d.category = meta.categories[d[1]];
+                found.push(d);
+              }
+            }
+            return collect(i);
+          });
+        }
+        return collect(0);
+      });
+    });
+  }
+  function esc(s) { var e = document.createElement('span'); e.textContent = s; return e.innerHTML; }
+  function show(docs) {
+    for (var i = 0; i < sections.length; i++) sections[i].style.display = docs ? 'none' : '';
+    if (!docs) { out.innerHTML = ''; return; }
+    out.innerHTML = '<p>' + docs.length + ' deal(s) found</p>' + docs.map(function (d) {
+      return '<div class="product"><img src="' + esc(d[5]) + '" alt="" loading="lazy"><div class="title">' +
+        esc(d[0]) + '</div><div class="price">₹' + d[2].toLocaleString('en-IN') + ' <small>(' + d[3] +
+        '% off, ' + esc(d.category) + ')</small></div><a href="' + esc(d[4]) + '" target="_blank">View Deal</a></div>';
+    }).join('');
+  }
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () { search(input.value).then(show); }, 150);
+  });
+})();
+"""
+
+
+def name_tokens(name):
+    return {word for word in re.findall(r'[a-z0-9]+', name.lower()) if len(word) > 1 and word not in STOPWORDS}
+
+
+def shard_of(token):
+    return FACET_SHARD if ':' in token else token[0]
+
+
+class SearchIndexBuilder:
+    """Keeps search/ in step with the product store.
+
+    Postings are kept in the store (search_tokens), and search_docs remembers
+    the content hash each product was indexed with, so a run only re-indexes
+    products that were added, changed or removed, and only rewrites the term
+    and doc shards those products touch. Term shards are keyed by the first
+    character of a token; the script fetches the shards a query needs.
+    """
+
+    def __init__(self, store, categories, site_root='.', index_dir=SEARCH_DIR, max_results=60):
+        self.store = store
+        self.conn = store.conn
+        self.categories = list(categories)
+        self.output_dir = os.path.join(site_root, index_dir)
+        self.max_results = max_results
+        self.create_tables()
+
+    def create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_docs (
+                    seq INTEGER PRIMARY KEY,
+                    content_hash TEXT NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_tokens (
+                    shard TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    PRIMARY KEY (shard, token, seq)
+                ) WITHOUT ROWID""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_search_tokens_seq ON search_tokens (seq)")
+
+    def path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def write_if_changed(self, name, text):
+        """Write a file unless it already holds the same text; returns True if written"""
+        path = self.path(name)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                if f.read() == text:
+                    return False
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, path)
+        return True
+
+    def doc(self, product, category):
+        """Compact search record: [name, category, price, discount %, link, image]"""
+        price = parse_amount(product.get('price')) or 0
+        discount = parse_amount(product.get('discount'))
+        if discount is None:
+            original = parse_amount(product.get('original_price'))
+            discount = round(100 * (1 - price / original)) if original and price else 0
+        category_id = self.categories.index(category) if category in self.categories else 0
+        return [product.get('name', '')[:NAME_LENGTH], category_id, price, discount,
+                product.get('affiliate_link', ''), product.get('image_url', '')]
+
+    def tokens(self, doc):
+        """Name words plus cumulative facets: c:<category>, p:<bound> for every bound >= price, d:<bound> <= discount"""
+        name, category_id, price, discount = doc[:4]
+        tokens = name_tokens(name)
+        tokens.add(f"c:{category_id}")
+        tokens.update(f"p:{bound}" for bound in PRICE_BUCKETS if price and price <= bound)
+        tokens.update(f"d:{bound}" for bound in DISCOUNT_BUCKETS if discount >= bound)
+        return tokens
+
+    def stale_seqs(self):
+        """(new seqs, changed seqs, removed seqs) since the last update"""
+        new, changed = [], []
+        for seq, indexed in self.conn.execute("""
+                SELECT p.seq, s.seq IS NOT NULL FROM products p LEFT JOIN search_docs s ON s.seq = p.seq
+                WHERE s.content_hash IS NULL OR s.content_hash != p.content_hash"""):
+            (changed if indexed else new).append(seq)
+        removed = [row[0] for row in self.conn.execute(
+            "SELECT seq FROM search_docs WHERE seq NOT IN (SELECT seq FROM products)")]
+        return new, changed, removed
+
+    def reindex(self, new, changed, removed):
+        """Update postings for the given seqs; returns (dirty term shards, dirty doc shards)"""
+        term_shards = set()
+        doc_shards = {seq // DOC_SHARD_SIZE for seq in new}
+        # Postings of changed and removed products are dropped first; new ones have none
+        for seq in changed + removed:
+            term_shards.update(row[0] for row in self.conn.execute(
+                "SELECT DISTINCT shard FROM search_tokens WHERE seq = ?", (seq,)))
+            self.conn.execute("DELETE FROM search_tokens WHERE seq = ?", (seq,))
+            doc_shards.add(seq // DOC_SHARD_SIZE)
+        self.conn.executemany("DELETE FROM search_docs WHERE seq = ?", [(seq,) for seq in removed])
+        for seq in new + changed:
+            category, product_hash, data = self.conn.execute(
+                "SELECT category, content_hash, data FROM products WHERE seq = ?", (seq,)).fetchone()
+            tokens = self.tokens(self.doc(json.loads(data), category))
+            self.conn.executemany("INSERT OR IGNORE INTO search_tokens (shard, token, seq) VALUES (?, ?, ?)",
+                                  [(shard_of(token), token, seq) for token in tokens])
+            term_shards.update(shard_of(token) for token in tokens)
+            self.conn.execute("INSERT OR REPLACE INTO search_docs (seq, content_hash) VALUES (?, ?)",
+                              (seq, product_hash))
+        return term_shards, doc_shards
+
+    def write_term_shard(self, shard):
+        postings = {}
+        for token, seq in self.conn.execute(
+                "SELECT token, seq FROM search_tokens WHERE shard = ? ORDER BY token, seq", (shard,)):
+            postings.setdefault(token, []).append(seq)
+        name = f"terms-{shard}.json"
+        if not postings:
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+            return False
+        return self.write_if_changed(name, json.dumps(postings, separators=(',', ':')))
+
+    def write_doc_shard(self, shard):
+        docs = {}
+        for seq, category, data in self.conn.execute(
+                "SELECT seq, category, data FROM products WHERE seq >= ? AND seq < ?",
+                (shard * DOC_SHARD_SIZE, (shard + 1) * DOC_SHARD_SIZE)):
+            docs[seq] = self.doc(json.loads(data), category)
+        name = f"docs-{shard}.json"
+        if not docs:
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+            return False
+        return self.write_if_changed(name, json.dumps(docs, ensure_ascii=False, separators=(',', ':')))
+
+    def version(self):
+        """Version of the published index (used to bust caches), or None before the first build"""
+        if not os.path.exists(self.path('meta.json')):
+            return None
+        with open(self.path('meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f).get('version')
+
+    def update(self):
+        """Bring the index up to date; returns (version, file names written)"""
+        if self.version() is None:
+            # Nothing published yet: index everything from scratch
+            self.conn.execute("DELETE FROM search_docs")
+            self.conn.execute("DELETE FROM search_tokens")
+        term_shards, doc_shards = self.reindex(*self.stale_seqs())
+        written = [f"terms-{shard}.json" for shard in sorted(term_shards) if self.write_term_shard(shard)]
+        written += [f"docs-{shard}.json" for shard in sorted(doc_shards) if self.write_doc_shard(shard)]
+        if self.write_if_changed('search.js', SEARCH_SCRIPT):
+            written.append('search.js')
+        self.conn.commit()
+
+        version = self.version()
+        if written or version is None:
+            version = datetime.now().strftime('%Y%m%d%H%M%S')
+            meta = {
+                'version': version,
+                'categories': self.categories,
+                'doc_shard_size': DOC_SHARD_SIZE,
+                'price_buckets': PRICE_BUCKETS,
+                'discount_buckets': DISCOUNT_BUCKETS,
+                'stopwords': sorted(STOPWORDS),
+                'max_results': self.max_results,
+            }
+            self.write_if_changed('meta.json', json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+            written.append('meta.json')
+        return version, [self.path(name) for name in written]
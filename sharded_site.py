@@ -0,0 +1,152 @@
+"""
+sharded_site.py - Paginated per-category output with a lightweight index page
+"""
+
+import hashlib
+import os
+import re
+
+SHARD_DIR = "deals"
+PAGE_SIZE = 50  # Products per category page
+INDEX_ITEMS = 12  # Newest products per category shown on index.html
+
+
+def category_slug(category):
+    """URL-safe directory name for a category, e.g. 'Home & Decor' -> 'home-and-decor'"""
+    return re.sub(r'[^a-z0-9]+', '-', category.lower().replace('&', 'and')).strip('-')
+
+
+class ShardedSiteBuilder:
+    """Writes each category as fixed-size pages numbered from the oldest product.
+
+    New products only ever land on the last page of their category, so a run
+    that adds products re-renders the last page (plus the one before it, whose
+    "newer" link may change) instead of the whole archive. Page content hashes
+    are kept in the store so unchanged pages are never rewritten.
+    """
+
+    def __init__(self, store, renderer, index_file="index.html", output_dir=SHARD_DIR,
+                 page_size=PAGE_SIZE, index_items=INDEX_ITEMS):
+        self.store = store
+        self.conn = store.conn
+        self.renderer = renderer
+        self.index_file = index_file
+        self.site_root = os.path.dirname(index_file)
+        self.output_dir = output_dir  # Relative to the directory of index_file
+        self.page_size = page_size
+        self.index_items = index_items
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the shard bookkeeping tables if they do not exist yet"""
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS shard_files (
+                    path TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    content_hash TEXT NOT NULL
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS shard_categories (
+                    category TEXT PRIMARY KEY,
+                    item_count INTEGER NOT NULL,
+                    max_seq INTEGER NOT NULL
+                )""")
+
+    def page_href(self, category, page):
+        """Site-relative URL of a category page"""
+        return f"{self.output_dir}/{category_slug(category)}/page-{page}.html"
+
+    def page_count(self, item_count):
+        return (item_count + self.page_size - 1) // self.page_size
+
+    def write_if_changed(self, href, category, html):
+        """Write a page unless its recorded content hash is unchanged; returns True if written"""
+        html_hash = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        path = os.path.join(self.site_root, href)
+        row = self.conn.execute("SELECT content_hash FROM shard_files WHERE path = ?", (href,)).fetchone()
+        if row and row[0] == html_hash and os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO shard_files (path, category, content_hash) VALUES (?, ?, ?)",
+            (href, category, html_hash))
+        return True
+
+    def render_page(self, category, page, pages):
+        """Render one category page, newest products first"""
+        fragments = self.store.page_fragments(category, (page - 1) * self.page_size, self.page_size)
+        fragments.reverse()
+        pager_links = []
+        if page < pages:
+            pager_links.append((self.page_href(category, page + 1), "← Newer deals"))
+        pager_links.append(("index.html", "Home"))
+        if page > 1:
+            pager_links.append((self.page_href(category, page - 1), "Older deals →"))
+        base_href = '../' * self.page_href(category, page).count('/')
+        return self.renderer.render_shard_page(category, fragments, base_href, pager_links)
+
+    def first_dirty_page(self, category, item_count, max_seq):
+        """First page that has to be re-rendered for a category"""
+        row = self.conn.execute(
+            "SELECT item_count, max_seq FROM shard_categories WHERE category = ?", (category,)).fetchone()
+        if row is None:
+            return 1
+        old_count, old_max_seq = row
+        # Only appends since the last build: earlier pages are unaffected
+        if item_count == old_count + self.store.count_since(category, old_max_seq):
+            return max(1, self.page_count(old_count))
+        return 1
+
+    def page_of(self, category, seq):
+        """Page a product with the given sequence number is (or was) listed on"""
+        return self.store.position(category, seq) // self.page_size + 1
+
+    def remove_stale_pages(self, category, pages):
+        """Delete pages beyond the current last page (after products were removed)"""
+        rows = self.conn.execute(
+            "SELECT path FROM shard_files WHERE category = ?", (category,)).fetchall()
+        current = {self.page_href(category, page) for page in range(1, pages + 1)}
+        for (href,) in rows:
+            if href not in current:
+                path = os.path.join(self.site_root, href)
+                if os.path.exists(path):
+                    os.remove(path)
+                self.conn.execute("DELETE FROM shard_files WHERE path = ?", (href,))
+
+    def build(self, updated, changed_seqs=None, search_version=None, top_deals=None):
+        """Render changed category pages and the index page; returns the file paths written.
+
+        changed_seqs maps categories to the lowest sequence number of a product
+        that was updated or removed there; pages from that product on are re-rendered.
+        """
+        changed_seqs = changed_seqs or {}
+        written = []
+        more_hrefs = {}
+        for category in self.renderer.categories:
+            item_count, max_seq = self.store.category_stats(category)
+            pages = self.page_count(item_count)
+            first_page = self.first_dirty_page(category, item_count, max_seq)
+            if category in changed_seqs:
+                first_page = min(first_page, self.page_of(category, changed_seqs[category]))
+            for page in range(first_page, pages + 1):
+                href = self.page_href(category, page)
+                if self.write_if_changed(href, category, self.render_page(category, page, pages)):
+                    written.append(os.path.join(self.site_root, href))
+            if first_page == 1:
+                self.remove_stale_pages(category, pages)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO shard_categories (category, item_count, max_seq) VALUES (?, ?, ?)",
+                (category, item_count, max_seq))
+            if item_count > self.index_items:
+                more_hrefs[category] = self.page_href(category, pages)
+
+        newest = {category: self.store.fragments(category, self.index_items)
+                  for category in self.renderer.categories}
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            f.write(self.renderer.render_page(newest, updated, more_hrefs, search_version, top_deals))
+        written.append(self.index_file)
+        self.conn.commit()
+        return written
@@ -0,0 +1,139 @@
+"""
+site_watcher.py - Rebuilds the site when the feed, the product store or images/ change
+
+Used by `python generate_html.py --watch`. Sources are polled (no extra
+dependencies); a burst of writes is debounced into one incremental update.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from product_store import BUSY_TIMEOUT_SECONDS
+
+POLL_SECONDS = 1.0  # Time between change checks
+DEBOUNCE_SECONDS = 2.0  # Quiet time after the last change before rebuilding
+MAX_DELAY_SECONDS = 30.0  # Rebuild anyway when changes keep coming for this long
+IMAGE_DIR = "images"
+GENERATED_DIRS = ("images/cache",)  # image_pipeline.CACHE_DIR, written by the update itself
+
+
+def file_signature(path):
+    """(size, mtime) of a file, or None when it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def tree_signature(root, exclude=()):
+    """Digest of the names, sizes and mtimes of every file under root"""
+    digest = hashlib.sha256()
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(name for name in dirs if os.path.join(directory, name) not in exclude)
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            digest.update(f"{path}\0{file_signature(path)}\0".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class SiteWatcher:
+    """Polls the sources of a WebsiteUpdater and runs it after changes settle.
+
+    A change starts a debounce window: the rebuild happens once nothing has
+    changed for `debounce` seconds, or `max_delay` seconds after the first
+    change, whichever comes first. Feed and image signatures are taken before
+    each rebuild, so a scraper write that lands during a rebuild triggers the
+    next one. The store is written by the rebuild itself, so its signature is
+    taken afterwards, and only the products table counts: other tables in the
+    same database (posting queue, ASIN index) do not trigger rebuilds. The
+    store signature is ProductStore's change counter, a single-row read
+    however many products are stored.
+    """
+
+    def __init__(self, updater, interval=POLL_SECONDS, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS,
+                 on_update=None, clock=time.monotonic, sleep=time.sleep):
+        self.updater = updater
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.on_update = on_update  # Called after each successful update (static build, publishing)
+        self.clock = clock
+        self.sleep = sleep
+        site_root = os.path.dirname(updater.html_file) or '.'
+        self.image_dir = os.path.join(site_root, IMAGE_DIR)
+        self.image_exclude = {os.path.join(site_root, path) for path in GENERATED_DIRS}
+        self.conn = None  # Connection used only to notice product changes
+
+    def feed_files(self):
+        return [self.updater.json_file] + self.updater.extra_json_files
+
+    def source_signature(self):
+        """Signature of the sources the update reads but does not write"""
+        return ([file_signature(path) for path in self.feed_files()],
+                tree_signature(self.image_dir, self.image_exclude))
+
+    def store_signature(self):
+        """Change counter of the stored products (see ProductStore.version)"""
+        if self.conn is None:
+            if not os.path.exists(self.updater.store_file):
+                return None
+            self.conn = sqlite3.connect(self.updater.store_file, timeout=BUSY_TIMEOUT_SECONDS)
+        try:
+            return self.conn.execute("SELECT version FROM products_version").fetchone()[0]
+        except sqlite3.OperationalError:
+            return None  # No products table yet
+
+    def rebuild(self):
+        """Run one update; returns the source signature it was based on"""
+        sources = self.source_signature()
+        stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        print(f"\n[{stamp}] 🔄 Change detected, updating the site")
+        try:
+            success = self.updater.update_html()
+        except Exception as e:
+            # A half-written feed fails to parse; the scraper's next write triggers another attempt
+            print(f"❌ Update failed: {type(e).__name__}: {e}")
+            success = False
+        if success and self.on_update:
+            try:
+                self.on_update()
+            except Exception as e:
+                # A failed build or push (network down, GitError) is retried after the next change
+                print(f"❌ Post-update step failed: {type(e).__name__}: {e}")
+        return sources
+
+    def run(self, max_updates=None):
+        """Update once, then watch until interrupted (or until max_updates further updates)"""
+        sources = self.rebuild()
+        store = self.store_signature()
+        print(f"👀 Watching {', '.join(self.feed_files())}, {self.updater.store_file} and {self.image_dir}/ "
+              f"(debounce {self.debounce:g}s)")
+        first_change = last_change = None
+        seen = (sources, store)
+        updates = 0
+        try:
+            while max_updates is None or updates < max_updates:
+                self.sleep(self.interval)
+                current = (self.source_signature(), self.store_signature())
+                now = self.clock()
+                if current != seen:
+                    seen = current
+                    last_change = now
+                    if first_change is None:
+                        first_change = now
+                if first_change is None:
+                    continue
+                if now - last_change >= self.debounce or now - first_change >= self.max_delay:
+                    sources = self.rebuild()
+                    seen = (sources, self.store_signature())
+                    first_change = last_change = None
+                    updates += 1
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+        finally:
+            if self.conn:
+                self.conn.close()
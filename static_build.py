@@ -0,0 +1,225 @@
+"""
+static_build.py - Publish-ready copy of the site: minified HTML, fingerprinted CSS and assets, precompressed files
+
+Run after generate_html.py (or pass --build to it):
+    python static_build.py --out dist
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli  # Optional: .br variants are only written when it is installed
+except ImportError:
+    brotli = None
+
+from sharded_site import SHARD_DIR
+
+BUILD_DIR = "dist"
+ASSET_FILES = ("Pandaloon_logo.png",)
+ASSET_DIRS = ("images",)
+COPY_DIRS = ("search",)  # Fetched by fixed names at runtime, copied without fingerprints
+ASSET_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.svg', '.ico')
+COMPRESSED_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg')
+CSS_DIR = "css"
+MANIFEST_FILE = "build-manifest.json"
+HASH_LENGTH = 10
+
+STYLE_BLOCK = re.compile(r'<style>(.*?)</style>\s*', re.S)
+URL_ATTRIBUTE = re.compile(r'''\b(src|href|srcset)=(["'])(.*?)\2''')
+# Blocks whose whitespace is significant or that are not HTML
+RAW_BLOCK = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2>)', re.S | re.I)
+BLOCK_TAG = re.compile(r'\s*(</?(?:html|head|body|meta|title|link|base|header|footer|nav|main|section|'
+                       r'article|div|h[1-6]|p|ul|ol|li|picture|source|script|style)\b[^>]*>)\s*', re.I)
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(path, data):
+    """images/logo.png -> images/logo.<hash>.png"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{fingerprint(data)}{ext}"
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_html(html):
+    """Drop comments and collapse whitespace; whitespace around block-level tags is removed entirely"""
+    parts = RAW_BLOCK.split(html)
+    out = []
+    # split() yields text, whole raw block, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        text = re.sub(r'<!--(?!\[if).*?-->', '', parts[i], flags=re.S)
+        text = re.sub(r'\s+', ' ', text)
+        out.append(BLOCK_TAG.sub(r'\1', text))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return ''.join(out).strip()
+
+
+class StaticBuild:
+    """Builds output_dir from the generated site in site_root.
+
+    Assets are copied under content-hashed names so they can be served with
+    long cache lifetimes, the inline stylesheet becomes a fingerprinted
+    css/site.<hash>.css, and HTML/CSS are written with .gz (and .br)
+    siblings. A manifest of output hashes lets unchanged files be skipped and
+    files that are no longer produced be removed.
+    """
+
+    def __init__(self, site_root='.', output_dir=BUILD_DIR, index_file="index.html", shard_dir=SHARD_DIR):
+        self.site_root = site_root
+        self.output_dir = output_dir
+        self.index_file = index_file
+        self.shard_dir = shard_dir
+        self.manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+        self.manifest = self.load_manifest()
+        self.outputs = {}  # Output path (relative to output_dir) -> content hash, for this build
+        self.written = []
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def source_pages(self):
+        """Site-relative paths of the generated HTML pages"""
+        pages = []
+        if os.path.exists(os.path.join(self.site_root, self.index_file)):
+            pages.append(self.index_file)
+        shard_root = os.path.join(self.site_root, self.shard_dir)
+        for directory, _, files in os.walk(shard_root):
+            for name in sorted(files):
+                if name.endswith('.html'):
+                    path = os.path.join(directory, name)
+                    pages.append(os.path.relpath(path, self.site_root).replace(os.sep, '/'))
+        return pages
+
+    def source_assets(self):
+        """Site-relative paths of the static assets referenced by pages"""
+        assets = [name for name in ASSET_FILES if os.path.exists(os.path.join(self.site_root, name))]
+        for asset_dir in ASSET_DIRS:
+            for directory, _, files in os.walk(os.path.join(self.site_root, asset_dir)):
+                for name in sorted(files):
+                    if name.lower().endswith(ASSET_EXTENSIONS):
+                        path = os.path.relpath(os.path.join(directory, name), self.site_root)
+                        assets.append(path.replace(os.sep, '/'))
+        return assets
+
+    def emit(self, path, data):
+        """Write an output (and its compressed variants) unless its content hash is unchanged"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        if self.outputs.get(path) == content_hash:
+            return  # Already emitted by this build (shared stylesheet)
+        self.outputs[path] = content_hash
+        target = os.path.join(self.output_dir, path)
+        if self.manifest.get(path) == content_hash and os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        self.write_file(target, data)
+        if path.endswith(COMPRESSED_EXTENSIONS):
+            # mtime=0 keeps the .gz bytes stable across builds
+            self.write_file(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli:
+                self.write_file(target + '.br', brotli.compress(data))
+        self.written.append(target)
+
+    @staticmethod
+    def write_file(path, data):
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+
+    def rewrite_urls(self, html, asset_names):
+        """Point src/href/srcset attributes at the fingerprinted asset names"""
+        def rewrite(match):
+            attribute, quote, value = match.groups()
+            if attribute == 'srcset':
+                candidates = []
+                for candidate in value.split(','):
+                    url, _, descriptor = candidate.strip().partition(' ')
+                    candidates.append(' '.join(filter(None, (asset_names.get(url, url), descriptor))))
+                value = ', '.join(candidates)
+            else:
+                value = asset_names.get(value, value)
+            return f'{attribute}={quote}{value}{quote}'
+        return URL_ATTRIBUTE.sub(rewrite, html)
+
+    def build_page(self, page, asset_names):
+        with open(os.path.join(self.site_root, page), 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        styles = ''.join(STYLE_BLOCK.findall(html))
+        if styles:
+            css = minify_css(styles).encode('utf-8')
+            stylesheet = f"{CSS_DIR}/site.{fingerprint(css)}.css"
+            self.emit(stylesheet, css)
+            # Shard pages carry a <base href> to the site root, so site-relative links work everywhere
+            html = STYLE_BLOCK.sub(f'<link rel="stylesheet" href="{stylesheet}">', html, count=1)
+            html = STYLE_BLOCK.sub('', html)
+
+        html = minify_html(self.rewrite_urls(html, asset_names))
+        self.emit(page, html.encode('utf-8'))
+
+    def remove_stale(self):
+        """Delete outputs of earlier builds that this build no longer produced"""
+        for path in set(self.manifest) - set(self.outputs):
+            target = os.path.join(self.output_dir, path)
+            for stale in (target, target + '.gz', target + '.br'):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+    def run(self):
+        """Build the site; returns the output files written (compressed variants not listed)"""
+        asset_names = {}
+        for asset in self.source_assets():
+            with open(os.path.join(self.site_root, asset), 'rb') as f:
+                data = f.read()
+            asset_names[asset] = hashed_name(asset, data)
+            self.emit(asset_names[asset], data)
+
+        for page in self.source_pages():
+            self.build_page(page, asset_names)
+
+        for copy_dir in COPY_DIRS:
+            for directory, _, files in os.walk(os.path.join(self.site_root, copy_dir)):
+                for name in sorted(files):
+                    path = os.path.join(directory, name)
+                    with open(path, 'rb') as f:
+                        self.emit(os.path.relpath(path, self.site_root).replace(os.sep, '/'), f.read())
+
+        self.remove_stale()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.write_file(self.manifest_file, json.dumps(self.outputs, indent=2, sort_keys=True).encode('utf-8'))
+        self.manifest = dict(self.outputs)
+        return self.written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a minified, fingerprinted, precompressed copy of the site")
+    parser.add_argument('--site', default='.', help="directory holding index.html (default: current)")
+    parser.add_argument('--out', default=BUILD_DIR, help=f"output directory (default: {BUILD_DIR})")
+    args = parser.parse_args()
+
+    build = StaticBuild(args.site, args.out)
+    written = build.run()
+    print(f"📦 Built {len(build.outputs)} file(s) into {args.out}, {len(written)} changed")
+    if not brotli:
+        print("ℹ️  brotli is not installed, skipped .br files")
+
+
+if __name__ == "__main__":
+    main()
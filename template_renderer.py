@@ -0,0 +1,132 @@
+"""
+template_renderer.py - Precompiled string templates for the PandaLoon deals page
+"""
+
+from html import escape
+from string import Template
+
+PAGE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang='en'>
+<head>
+<meta charset='UTF-8'>
+<title>PandaLoon Deals</title>
+<meta name='viewport' content='width=device-width, initial-scale=1'>
+$base<style>
+body { background-color: #f9f3e7; color: #3d2b1f; font-family: 'Segoe UI', sans-serif; margin: 0; }
+header { background-color: #b08968; padding: 20px; text-align: center; }
+header img { height: 60px; }
+h1 { color: white; font-size: 28px; margin: 10px 0; }
+section { padding: 20px; }
+h2 { color: #6b4c3b; border-bottom: 2px solid #c7a17a; padding-bottom: 10px; margin-top: 30px; }
+.product { background: #fff9f1; border: 1px solid #e1cdb5; padding: 15px; border-radius: 10px; margin-bottom: 20px; box-shadow: 0 2px 6px rgba(0,0,0,0.05); }
+.product img { width: 220px; height: auto; border-radius: 8px;}
+.product .title { font-weight: bold; margin: 10px 0 5px; }
+.product .price { color: #a86e39; font-weight: bold; }
+.product a { background: #a86e39; color: white; padding: 8px 12px; display: inline-block; margin-top: 10px; text-decoration: none; border-radius: 4px; }
+.updated { text-align: center; color: #888; font-size: 14px; margin: 20px; }
+.more, .pager a { color: #a86e39; font-weight: bold; }
+.pager { text-align: center; margin: 20px; }
+.search { padding: 20px 20px 0; }
+.search input { width: 100%; max-width: 480px; padding: 10px; border: 1px solid #c7a17a; border-radius: 6px; font-size: 16px; }
+</style>
+</head>
+<body>
+<header>
+  <img src='Pandaloon_logo.png' alt='PandaLoon Logo'>
+  <h1>PandaLoon Curated Deals</h1>
+</header>
+$search$sections$footer</body>
+</html>""")
+
+UPDATED_TEMPLATE = Template("""<div class="updated">Last updated: <span id="update-time">$updated</span></div>
+""")
+
+SECTION_TEMPLATE = Template("""<section>
+<h2>$category</h2>
+$products$more</section>
+""")
+
+MORE_TEMPLATE = Template("""<a class="more" href="$href">See all $category deals &rarr;</a>
+""")
+
+SEARCH_TEMPLATE = Template("""<div class="search">
+<input id="search-input" type="search" placeholder="Try &quot;Electronics under ₹1,000&quot; or &quot;over 50% off&quot;" aria-label="Search deals">
+<div id="search-results"></div>
+<script src="$src" data-version="$version" defer></script>
+</div>
+""")
+
+TOP_DEALS_TITLE = "🔥 Top Deals"
+
+PAGER_TEMPLATE = Template("""<div class="pager">$links</div>
+""")
+
+PRODUCT_TEMPLATE = Template("""<div class="product">
+  $image
+  <div class="title">$short_name</div>
+  <div class="price">$price <small>(was $original_price)</small></div>
+  <a href="$affiliate_link" target="_blank">View Deal</a>
+</div>
+""")
+
+IMAGE_TEMPLATE = Template("""<img src="$src" alt="$alt">""")
+
+PICTURE_TEMPLATE = Template("""<picture>
+    <source type="image/webp" srcset="$webp_srcset" sizes="220px">
+    <img src="$src" srcset="$jpeg_srcset" sizes="220px" width="$width" height="$height" alt="$alt" loading="lazy">
+  </picture>""")
+
+
+class TemplateRenderer:
+    def __init__(self, categories):
+        self.categories = categories
+
+    def render_image(self, product, variants=None):
+        """Plain <img> for the source URL, or a <picture> when resized variants exist"""
+        alt = escape(product.get('name', '')[:60])
+        if not variants:
+            return IMAGE_TEMPLATE.substitute(src=escape(product.get('image_url', '')), alt=alt)
+        return PICTURE_TEMPLATE.substitute(
+            {key: escape(str(value)) for key, value in variants.items()}, alt=alt)
+
+    def render_product(self, product, variants=None):
+        """Render a single product card"""
+        return PRODUCT_TEMPLATE.substitute(
+            image=self.render_image(product, variants),
+            short_name=escape(product.get('name', 'Product')[:60]),
+            price=escape(product.get('price', '')),
+            original_price=escape(product.get('original_price', '')),
+            affiliate_link=escape(product.get('affiliate_link', '')),
+        )
+
+    def render_section(self, category, fragments, more_href=None):
+        """Render a category section from already rendered product fragments"""
+        more = MORE_TEMPLATE.substitute(href=escape(more_href), category=escape(category)) if more_href else ''
+        return SECTION_TEMPLATE.substitute(category=escape(category), products=''.join(fragments), more=more)
+
+    def render_page(self, fragments_by_category, updated, more_hrefs=None, search_version=None, top_deals=None):
+        """Render the full page, one section per category in configured order.
+
+        With a search_version the page gets the search box and loads search/search.js;
+        top_deals fragments are shown in a section of their own above the categories.
+        """
+        more_hrefs = more_hrefs or {}
+        sections = self.render_section(TOP_DEALS_TITLE, top_deals) if top_deals else ''
+        sections += ''.join(
+            self.render_section(category, fragments_by_category.get(category, []), more_hrefs.get(category))
+            for category in self.categories
+        )
+        search = SEARCH_TEMPLATE.substitute(src="search/search.js", version=escape(search_version)) \
+            if search_version else ''
+        return PAGE_TEMPLATE.substitute(base='', search=search, sections=sections,
+                                        footer=UPDATED_TEMPLATE.substitute(updated=escape(updated)))
+
+    def render_shard_page(self, category, fragments, base_href, pager_links):
+        """Render one page of a category archive; pager_links is a list of (href, label)"""
+        links = ' | '.join(f'<a href="{escape(href)}">{escape(label)}</a>' for href, label in pager_links)
+        return PAGE_TEMPLATE.substitute(
+            base=f"<base href='{escape(base_href)}'>\n",
+            search='',
+            sections=self.render_section(category, fragments),
+            footer=PAGER_TEMPLATE.substitute(links=links) if links else '',
+        )
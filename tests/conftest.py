@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_graph_api import MockGraphAPI  # noqa: E402
+
+
+@pytest.fixture
+def graph_api():
+    """Local mock Graph API whose containers are ready on the first status check"""
+    api = MockGraphAPI(port=0, processing_polls=0).start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, so pandaloon.db, metrics.jsonl and feeds stay out of the tree"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def make_products(count, categories=("Electronics", "Home & Decor", "Fitness")):
+    return [{
+        'asin': f"B{i:09d}",
+        'name': f"Product {i}",
+        'price': f"₹{500 + i * 10:,}",
+        'original_price': "₹2,000",
+        'discount': f"{(i * 37) % 90}%",
+        'rating': "4.0",
+        'category': categories[i % len(categories)],
+        'image_url': f"https://example.com/images/{i}.jpg",
+        'affiliate_link': f"https://www.amazon.in/dp/B{i:09d}?tag=pandaloon-21",
+        'caption': f"🔥 DEAL 🔥\nProduct {i}\n💰 ₹{500 + i * 10} #deal{i}",
+    } for i in range(count)]
+
+
+@pytest.fixture
+def poster(graph_api, workdir, monkeypatch):
+    """InstagramAutoPoster talking to the mock Graph API"""
+    import instagram_poster
+    monkeypatch.setattr(instagram_poster, 'BASE_URL', graph_api.base_url)
+    poster = instagram_poster.InstagramAutoPoster()
+    yield poster
+    poster.client.close()
+    poster.asin_index.close()
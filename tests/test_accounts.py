@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import instagram_poster
+from accounts import Account, AccountRouter, load_accounts
+from conftest import make_products
+from job_queue import FAILED, JobQueue
+from posting_daemon import PostingDaemon
+from product_fields import CATEGORIES, DEFAULT_CATEGORY
+
+GADGETS = Account("gadgets", "111", "token-gadgets", categories=["Electronics"])
+HOME = Account("home", "222", "token-home", categories=["Home & Decor"])
+
+
+def test_router_normalizes_categories_like_the_site():
+    router = AccountRouter([GADGETS, HOME], CATEGORIES, DEFAULT_CATEGORY)
+
+    assert router.accounts_for({'category': "Electronics"}) == [GADGETS]
+    assert router.accounts_for({'category': "Gadgets & Toys"}) == [HOME]  # Listed under Home & Decor
+    assert router.accounts_for({}) == [HOME]
+    assert router.accounts_for({'category': "Fitness"}) == []
+    assert router.unclaimed() == ["Fitness"]
+    assert AccountRouter([GADGETS, Account("all", "333", "token")], CATEGORIES).unclaimed() == []
+
+
+def test_accounts_sharing_a_queue_table_are_rejected(workdir):
+    entries = [{'name': name, 'account_id': "1", 'access_token': "token"} for name in ("deals-in", "deals_in")]
+    (workdir / "accounts.json").write_text(json.dumps(entries), encoding='utf-8')
+
+    with pytest.raises(ValueError, match="post_jobs_deals_in"):
+        load_accounts("accounts.json")
+
+
+@pytest.fixture
+def accounts_api(graph_api, workdir, monkeypatch):
+    """Mock Graph API that only accepts each account's own token"""
+    monkeypatch.setattr(instagram_poster, 'BASE_URL', graph_api.base_url)
+    graph_api.tokens = {GADGETS.access_token: GADGETS.account_id, HOME.access_token: HOME.account_id}
+    with open("insta_ready.json", 'w', encoding='utf-8') as f:
+        json.dump(make_products(9), f)
+    return graph_api
+
+
+def run_account(account, router):
+    poster = instagram_poster.InstagramAutoPoster(account=account, accepts=router.accepts(account))
+    queue = JobQueue(table=account.queue_table)
+    try:
+        PostingDaemon(poster, queue, "insta_ready.json", instagram_poster.POST_FIELDS, 3600 * 1000,
+                      poll_interval=0).run(once=True)
+        return queue.counts()
+    finally:
+        queue.close()
+        poster.client.close()
+        poster.asin_index.close()
+
+
+def published_categories(api, account_id):
+    urls = [api.containers[creation_id]['params']['image_url'] for creation_id in api.published_by.get(account_id, [])]
+    categories = {product['image_url']: product['category'] for product in make_products(9)}
+    return sorted(categories[url] for url in urls)
+
+
+def test_each_account_posts_its_own_categories(accounts_api):
+    router = AccountRouter([GADGETS, HOME], CATEGORIES, DEFAULT_CATEGORY)
+    for account in (GADGETS, HOME):
+        run_account(account, router)
+
+    assert published_categories(accounts_api, GADGETS.account_id) == ["Electronics"] * 3
+    assert published_categories(accounts_api, HOME.account_id) == ["Home & Decor"] * 3
+    assert len(accounts_api.published) == 6  # Fitness has no account
+
+
+def test_an_account_cannot_post_with_another_accounts_token(accounts_api):
+    impostor = Account("gadgets", GADGETS.account_id, HOME.access_token, categories=["Electronics"])
+    counts = run_account(impostor, AccountRouter([impostor], CATEGORIES, DEFAULT_CATEGORY))
+
+    assert accounts_api.published == []
+    assert counts[FAILED] == 3
+    assert accounts_api.containers == {}
+
+
+def test_interactive_mode_needs_an_account_when_several_are_configured(workdir, monkeypatch, capsys):
+    entries = [{'name': account.name, 'account_id': account.account_id, 'access_token': account.access_token}
+               for account in (GADGETS, HOME)]
+    (workdir / "accounts.json").write_text(json.dumps(entries), encoding='utf-8')
+    monkeypatch.setattr('sys.argv', ["instagram_poster.py"])
+
+    with pytest.raises(SystemExit):
+        instagram_poster.main()
+    assert "choose one with --account NAME" in capsys.readouterr().err
+
+
+def test_the_poster_does_not_load_the_site_generator():
+    check = "import sys, instagram_poster; sys.exit('generate_html' in sys.modules or 'bs4' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, '-c', check], cwd=root).returncode == 0
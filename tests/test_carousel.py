@@ -0,0 +1,59 @@
+from carousel import CAPTION_LIMIT, CarouselPipeline, compose_caption, group_products
+from conftest import make_products
+
+UNLIMITED = 3600 * 1000
+
+
+def published_params(graph_api):
+    return [graph_api.containers[creation_id]['params'] for creation_id in graph_api.published]
+
+
+def test_carousels_publish_each_category_batch(graph_api, poster):
+    products = make_products(25)
+    batches = group_products(products, 'category')
+    CarouselPipeline(poster, posts_per_hour=UNLIMITED).run(batches)
+
+    published = published_params(graph_api)
+    assert [params['media_type'] for params in published] == ['CAROUSEL'] * 3
+    assert [len(params['children'].split(',')) for params in published] == [9, 8, 8]
+    for (label, batch), params in zip(batches, published):
+        children = [graph_api.containers[child]['params'] for child in params['children'].split(',')]
+        assert [child['image_url'] for child in children] == [product['image_url'] for product in batch]
+        assert params['caption'].startswith(f"🔥 {len(batch)} {label.upper()} DEALS 🔥")
+    assert len(poster.posted) == 25
+    assert poster.failed == []
+
+
+def test_failed_children_shrink_the_carousel(graph_api, poster):
+    products = make_products(3, categories=("Fitness",))
+    products[0]['image_url'] = ''  # The mock refuses containers without an image
+    CarouselPipeline(poster, posts_per_hour=UNLIMITED).run(group_products(products))
+
+    (params,) = published_params(graph_api)
+    assert len(params['children'].split(',')) == 2
+    assert [item['product'] for item in poster.failed] == ["Product 0"]
+    assert len(poster.posted) == 2
+
+
+def test_batches_too_small_for_a_carousel_post_single_images(graph_api, poster):
+    products = make_products(3, categories=("Fitness", "Electronics", "Electronics"))
+    products[1]['image_url'] = ''
+    CarouselPipeline(poster, posts_per_hour=UNLIMITED).run(group_products(products))
+
+    # Fitness has one product; Electronics is left with one child after a failure
+    published = published_params(graph_api)
+    assert [params.get('media_type') for params in published] == [None, None]
+    assert [params['image_url'] for params in published] == [products[0]['image_url'], products[2]['image_url']]
+    assert [item['product'] for item in poster.failed] == ["Product 1"]
+
+
+def test_caption_fits_the_limit():
+    products = make_products(10)
+    for product in products:
+        product['caption'] += "\n🔗 " + product['affiliate_link'] * 5
+    caption = compose_caption("Electronics", products, limit=1000)
+
+    assert len(caption) <= 1000
+    assert "🔗" not in caption
+    assert caption.startswith("🔥 10 ELECTRONICS DEALS 🔥")
+    assert len(compose_caption("Electronics", products)) <= CAPTION_LIMIT
@@ -0,0 +1,89 @@
+import json
+
+from asin_index import SITE, AsinIndex
+from conftest import make_products
+from generate_html import WebsiteUpdater, extract_asin
+
+
+def write_feed(products):
+    with open("insta_ready.json", 'w', encoding='utf-8') as f:
+        json.dump(products, f)
+
+
+def page_asins():
+    with open("index.html", encoding='utf-8') as f:
+        html = f.read()
+    return {extract_asin(part.split('"')[0]) for part in html.split('href="')[1:] if '/dp/' in part}
+
+
+def site_asins():
+    index = AsinIndex()
+    try:
+        return set(index.first_seen(SITE))
+    finally:
+        index.close()
+
+
+def test_soup_mode_readds_products_missing_from_a_reset_page(workdir):
+    products = make_products(4)
+    write_feed(products)
+    assert WebsiteUpdater().update_html()
+    assert page_asins() == {product['asin'] for product in products}
+
+    (workdir / "index.html").unlink()  # Regenerated from scratch
+    assert WebsiteUpdater().update_html()
+    assert page_asins() == {product['asin'] for product in products}
+    assert site_asins() == page_asins()
+
+
+def test_soup_mode_reconciles_the_index_with_the_page(workdir):
+    write_feed(make_products(3))
+    assert WebsiteUpdater().update_html()
+    index = AsinIndex()
+    index.upsert_many(["B999999999"], SITE)  # Recorded, but not on the page
+    index.close()
+
+    write_feed(make_products(3) + [{**make_products(1)[0], 'asin': "B999999999", 'name': "Stale",
+                                    'affiliate_link': "https://www.amazon.in/dp/B999999999"}])
+    assert WebsiteUpdater().update_html()
+    assert "B999999999" in page_asins()
+    assert site_asins() == page_asins()
+
+
+def refresh(products):
+    write_feed(products)
+    updater = WebsiteUpdater(render_mode="template")
+    updater.refresh = True
+    assert updater.update_html()
+    return updater.changes
+
+
+def test_refresh_skips_unchanged_products_and_rerenders_changed_ones(workdir):
+    products = make_products(3)
+    assert refresh(products)['added'] == [product['asin'] for product in products]
+
+    products[1] = {**products[1], 'name': "Renamed deal", 'price': "₹99"}
+    changes = refresh(products)
+    assert changes['added'] == changes['removed'] == []
+    assert changes['updated'] == [products[1]['asin']]  # The other two match their content hash
+    html = (workdir / "index.html").read_text(encoding='utf-8')
+    assert "Renamed deal" in html and "₹99" in html
+
+
+def test_refresh_removes_products_missing_from_the_feed(workdir):
+    products = make_products(3)
+    refresh(products)
+
+    changes = refresh(products[:2])
+    assert changes['removed'] == [products[2]['asin']]
+    assert page_asins() == {product['asin'] for product in products[:2]}
+    assert site_asins() == page_asins()
+
+
+def test_refresh_keeps_everything_when_the_feed_has_no_valid_products(workdir):
+    products = make_products(3)
+    refresh(products)
+
+    changes = refresh([{'name': "No ASIN"}, {**products[0], 'asin': ""}])
+    assert changes['removed'] == []
+    assert page_asins() == {product['asin'] for product in products}
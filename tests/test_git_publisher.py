@@ -0,0 +1,72 @@
+import subprocess
+
+import pytest
+
+from git_publisher import GitPublisher
+
+
+def git(cwd, *args):
+    return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A site working tree whose origin is a local bare repository"""
+    remote = tmp_path / "remote.git"
+    repo = tmp_path / "site"
+    git(tmp_path, 'init', '--quiet', '--bare', str(remote))
+    git(tmp_path, 'init', '--quiet', str(repo))
+    git(repo, 'config', 'user.name', "Pandaloon")
+    git(repo, 'config', 'user.email', "pandaloon@example.com")
+    git(repo, 'remote', 'add', 'origin', str(remote))
+    return repo, remote
+
+
+def write(repo, path, text):
+    target = repo / path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(text, encoding='utf-8')
+
+
+def remote_log(remote):
+    return git(remote, 'log', '--format=%s', 'main').splitlines()
+
+
+def test_publish_commits_and_pushes_only_changes(site):
+    repo, remote = site
+    publisher = GitPublisher(str(repo))
+    write(repo, "index.html", "<h1>deals</h1>")
+    write(repo, "deals/fitness/page-1.html", "<p>1</p>")
+    write(repo, "notes.txt", "not part of the site")
+
+    result = publisher.publish()
+    assert sorted(result['staged']) == ["deals/fitness/page-1.html", "index.html"]
+    assert result['commit'] and result['pushed']
+    assert remote_log(remote) == ["Update deals: 2 file(s) from 1 run(s)"]
+
+    # Rewritten with the same content: nothing to commit or push
+    write(repo, "index.html", "<h1>deals</h1>")
+    assert publisher.publish() == {'staged': [], 'commit': None, 'pushed': False}
+    assert len(remote_log(remote)) == 1
+    assert "notes.txt" not in git(remote, 'ls-tree', '-r', '--name-only', 'main')
+
+
+def test_coalesced_commit_counts_only_runs_that_staged_files(site):
+    repo, remote = site
+    now = [1000.0]
+    publisher = GitPublisher(str(repo), commit_interval=600, clock=lambda: now[0])
+    write(repo, "index.html", "v1")
+    assert publisher.publish(flush=True)['commit']
+
+    write(repo, "index.html", "v2")
+    assert publisher.publish()['commit'] is None  # Inside the coalescing window
+    now[0] += 100
+    assert publisher.publish()['staged'] == []  # A run that changed nothing
+    now[0] += 100
+    write(repo, "deals/home-and-decor/page-1.html", "new")
+    assert publisher.publish()['commit'] is None
+    now[0] += 600
+    result = publisher.publish()
+
+    assert result['commit'] and result['pushed']
+    assert remote_log(remote)[0] == "Update deals: 2 file(s) from 2 run(s)"
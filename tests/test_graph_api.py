@@ -0,0 +1,95 @@
+import pytest
+
+from graph_api import GraphAPIClient
+from mock_graph_api import MockGraphAPI
+
+ACCOUNT_ID = "17840000000000001"
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def client(graph_api, sleeps):
+    client = GraphAPIClient("token", base_url=graph_api.base_url, max_retries=3, backoff_base=0.01,
+                            sleep=sleeps.append)
+    yield client
+    client.close()
+
+
+def create(client):
+    response = client.create_media(ACCOUNT_ID, image_url="https://example.com/a.jpg", caption="deal")
+    assert response.status_code == 200
+    return response.json()['id']
+
+
+def test_retries_server_errors(graph_api, client, sleeps):
+    graph_api.fail('media', 503)
+    graph_api.fail('media', 500)
+    assert create(client)
+    assert len(sleeps) == 2
+    assert len(graph_api.containers) == 1
+
+
+def test_gives_up_after_max_retries(graph_api, client):
+    for _ in range(4):
+        graph_api.fail('status', 502)
+    assert client.get_container_status("1000").status_code == 502
+
+
+def test_retries_429_after_retry_after():
+    api = MockGraphAPI(port=0, processing_polls=0, throttle_every=2, retry_after='2').start()
+    sleeps = []
+    client = GraphAPIClient("token", base_url=api.base_url, sleep=sleeps.append)
+    try:
+        create(client)  # Request 1
+        assert client.get_container_status("1000").status_code == 200  # Request 2 throttled, 3 answered
+        assert sleeps == [2.0]
+    finally:
+        client.close()
+        api.stop()
+
+
+def test_retry_after_beyond_backoff_max_is_not_waited_for():
+    api = MockGraphAPI(port=0, throttle_every=1, retry_after='3600').start()
+    sleeps = []
+    client = GraphAPIClient("token", base_url=api.base_url, sleep=sleeps.append)
+    try:
+        assert client.get_account(ACCOUNT_ID).status_code == 429
+        assert sleeps == []
+    finally:
+        client.close()
+        api.stop()
+
+
+def test_publish_is_not_repeated_when_the_answer_is_lost(graph_api, client):
+    creation_id = create(client)
+    graph_api.fail('media_publish', 500, after=True)
+    response = client.publish_media(ACCOUNT_ID, creation_id)
+    assert response.status_code == 200
+    assert graph_api.published == [creation_id]
+    publishes = [path for method, path in graph_api.requests if path.endswith('/media_publish')]
+    assert len(publishes) == 1
+
+
+def test_publish_is_retried_when_it_did_not_happen(graph_api, client, sleeps):
+    creation_id = create(client)
+    graph_api.fail('media_publish', 503)
+    response = client.publish_media(ACCOUNT_ID, creation_id)
+    assert response.status_code == 200
+    assert response.json()['id']
+    assert graph_api.published == [creation_id]
+    assert len(sleeps) == 1
+
+
+def test_already_published_container_counts_as_published(graph_api, client):
+    creation_id = create(client)
+    client.get_container_status(creation_id)
+    assert client.publish_media(ACCOUNT_ID, creation_id).status_code == 200
+    # A second publish of the same container is answered with "already published" by the API
+    response = client.publish_media(ACCOUNT_ID, creation_id)
+    assert response.status_code == 200
+    assert response.json() == {'id': None, 'creation_id': creation_id}
+    assert graph_api.published == [creation_id]
@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from image_pipeline import CACHE_DIR, WIDTHS, ImagePipeline
+
+REPO_IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images")
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Copy of the repo's images/ (without any cache), so the tests never write into the tree"""
+    shutil.copytree(REPO_IMAGES, tmp_path / "images", ignore=shutil.ignore_patterns("cache"))
+    return tmp_path
+
+
+def sources(site):
+    return sorted(f"images/{name}" for name in os.listdir(site / "images") if name.endswith(('.jpg', '.webp')))
+
+
+def cache_files(site):
+    cache = site / CACHE_DIR
+    return {name: os.stat(cache / name).st_mtime_ns for name in os.listdir(cache)}
+
+
+def test_variants_are_written_for_every_width(site):
+    results = ImagePipeline(str(site), workers=2).process(sources(site))
+
+    assert set(results) == set(sources(site))
+    for source, info in results.items():
+        with Image.open(site / source) as original:
+            source_width = original.width
+        widths = sorted({min(width, source_width) for width in WIDTHS})
+        assert info['width'] == widths[0]
+        for width in widths:
+            for ext in ('jpg', 'webp'):
+                path = site / f"{info['src'].rsplit('-', 1)[0]}-{width}.{ext}"
+                with Image.open(path) as variant:
+                    assert variant.width == width
+        assert info['webp_srcset'].count('.webp') == len(widths)
+    assert os.path.exists(site / CACHE_DIR / "manifest.json")
+
+
+def test_second_run_reuses_the_cache(site, capsys):
+    ImagePipeline(str(site), workers=2).process(sources(site))
+    before = cache_files(site)
+    capsys.readouterr()
+
+    pipeline = ImagePipeline(str(site), workers=2)
+    results = pipeline.process(sources(site))
+
+    assert "Encoding" not in capsys.readouterr().out
+    after = cache_files(site)
+    assert {name: mtime for name, mtime in after.items() if name != 'manifest.json'} == \
+        {name: mtime for name, mtime in before.items() if name != 'manifest.json'}
+    assert set(results) == set(sources(site))
+
+
+def test_identical_images_are_encoded_once(site):
+    shutil.copy(site / "images" / "ios_1.jpg", site / "images" / "ios_copy.jpg")
+    results = ImagePipeline(str(site), workers=2).process(["images/ios_1.jpg", "images/ios_copy.jpg"])
+
+    assert results["images/ios_1.jpg"] == results["images/ios_copy.jpg"]
+    assert len([name for name in os.listdir(site / CACHE_DIR) if name.endswith('.jpg')]) == \
+        len(results["images/ios_1.jpg"]['jpeg_srcset'].split(', '))
+
+
+def test_unreadable_sources_are_skipped(site):
+    (site / "images" / "broken.jpg").write_bytes(b"not an image")
+    results = ImagePipeline(str(site), workers=2).process(["images/ios_1.jpg", "images/broken.jpg",
+                                                           "images/missing.jpg"])
+    assert set(results) == {"images/ios_1.jpg"}
@@ -0,0 +1,65 @@
+import argparse
+import sqlite3
+import sys
+
+import pytest
+
+from metrics import Metrics
+from pipeline import BLOCKED, FAILED, RAN, SKIPPED, PipelineRunner, Stage, default_stages
+
+
+def append_command(path):
+    return [sys.executable, '-c', f"open({path!r}, 'a').write('x')"]
+
+
+@pytest.fixture
+def runner_for(workdir):
+    runners = []
+
+    def make(stages):
+        runner = PipelineRunner(stages, metrics=Metrics("pipeline-test"))
+        runners.append(runner)
+        return runner
+
+    yield make
+    for runner in runners:
+        runner.close()
+
+
+def test_unchanged_stages_are_skipped_but_always_stages_run(workdir, runner_for):
+    (workdir / "feed.json").write_text("[]", encoding='utf-8')
+    stages = [Stage('site', append_command("site.out"), inputs=("feed.json",), outputs=("site.out",)),
+              Stage('post', append_command("post.log"), always=True)]
+
+    assert runner_for(stages).run() == {'site': RAN, 'post': RAN}
+    assert runner_for(stages).run() == {'site': SKIPPED, 'post': RAN}
+    assert (workdir / "post.log").read_text() == "xx"
+
+    (workdir / "feed.json").write_text("[{}]", encoding='utf-8')
+    assert runner_for(stages).run()['site'] == RAN
+
+
+def test_post_stage_always_runs():
+    args = argparse.Namespace(scrape=None, mode='template', site_args='', post_args='', no_post=False,
+                              no_publish=False)
+    stages = {stage.name: stage for stage in default_stages(args)}
+
+    assert stages['post'].always
+    assert not stages['site'].always
+    assert "image_pipeline.py" in stages['site'].inputs
+
+
+def test_a_stage_that_raises_fails_without_aborting_the_run(workdir, runner_for):
+    stages = [Stage('site', append_command("site.out")),
+              Stage('post', append_command("post.log"), always=True),
+              Stage('publish', append_command("publish.log"), after=('site',))]
+    runner = runner_for(stages)
+    run_stage = runner.run_stage
+
+    def locked_site(stage, force=False):
+        if stage.name == 'site':
+            raise sqlite3.OperationalError("database is locked")
+        return run_stage(stage, force)
+
+    runner.run_stage = locked_site
+    assert runner.run() == {'site': FAILED, 'post': RAN, 'publish': BLOCKED}
@@ -0,0 +1,132 @@
+import json
+import sqlite3
+
+import pytest
+
+from conftest import make_products
+from instagram_poster import POST_FIELDS
+from job_queue import CONTAINER_CREATED, FAILED, PUBLISHED, JobQueue
+from link_check import LinkChecker
+from mock_links import MockLinkServer
+from posting_daemon import PostingDaemon
+from posting_scheduler import PostingScheduler, discount_score
+
+FEED = "insta_ready.json"
+UNLIMITED = 3600 * 1000
+
+
+@pytest.fixture
+def links():
+    server = MockLinkServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def queue(workdir):
+    queue = JobQueue()
+    yield queue
+    queue.close()
+
+
+def write_feed(products):
+    with open(FEED, 'w', encoding='utf-8') as f:
+        json.dump(products, f)
+
+
+def make_daemon(poster, queue, **kwargs):
+    return PostingDaemon(poster, queue, FEED, POST_FIELDS, UNLIMITED, max_workers=2, poll_interval=0, **kwargs)
+
+
+def test_daemon_publishes_the_feed_once(graph_api, poster, queue):
+    write_feed(make_products(5))
+    make_daemon(poster, queue).run(once=True)
+
+    assert len(graph_api.published) == 5
+    assert queue.counts()[PUBLISHED] == 5
+
+    # A second run finds everything posted already
+    make_daemon(poster, queue).run(once=True)
+    assert len(graph_api.published) == 5
+
+
+def test_failing_containers_give_up_after_max_attempts(graph_api, poster, queue):
+    graph_api.container_status = 'ERROR'
+    write_feed(make_products(1))
+    make_daemon(poster, queue, max_attempts=3).run(once=True)
+
+    assert graph_api.published == []
+    assert queue.counts()[FAILED] == 1
+    assert queue.jobs(FAILED)[0]['attempts'] == 3
+    assert len(graph_api.containers) == 3
+
+
+def test_broken_links_are_quarantined_before_creating_containers(graph_api, poster, queue, links):
+    products = make_products(4)
+    for product in products:
+        product['image_url'] = f"{links.base_url}/images/{product['asin']}.jpg"
+        product['affiliate_link'] = f"{links.base_url}/dp/{product['asin']}"
+    products[1]['image_url'] = f"{links.base_url}/missing/{products[1]['asin']}.jpg"
+    products[2]['affiliate_link'] = f"{links.base_url}/gone/{products[2]['asin']}"
+    write_feed(products)
+    checker = LinkChecker()
+    try:
+        make_daemon(poster, queue, checker=checker).run(once=True)
+        quarantined = [row[0] for row in checker.quarantined()]
+    finally:
+        checker.close()
+
+    images = [graph_api.containers[creation_id]['params']['image_url'] for creation_id in graph_api.published]
+    assert sorted(images) == sorted([products[0]['image_url'], products[3]['image_url']])
+    assert len(graph_api.containers) == 2  # Broken products never reach the Graph API
+    failed = {job['asin']: job for job in queue.jobs(FAILED)}
+    assert sorted(failed) == [products[1]['asin'], products[2]['asin']]
+    assert failed[products[1]['asin']]['error'].startswith("Link check: image_url")
+    assert sorted(quarantined) == sorted(failed)
+
+
+def test_containers_are_published_best_score_first(graph_api, poster, queue):
+    products = make_products(8)
+    for product, discount in zip(products, (10, 80, 30, 70, 50, 20, 60, 40)):
+        product['discount'] = f"{discount}%"
+    write_feed(products)
+    make_daemon(poster, queue, scheduler=PostingScheduler(discount_score)).run(once=True)
+
+    images = [graph_api.containers[creation_id]['params']['image_url'] for creation_id in graph_api.published]
+    by_discount = sorted(products, key=discount_score, reverse=True)
+    assert images == [product['image_url'] for product in by_discount]
+
+
+def test_queues_without_a_score_column_are_upgraded(workdir):
+    conn = sqlite3.connect("pandaloon.db")
+    conn.execute("""
+        CREATE TABLE post_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, asin TEXT NOT NULL UNIQUE, product TEXT NOT NULL,
+            state TEXT NOT NULL, creation_id TEXT, post_id TEXT, error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0, created_at TEXT NOT NULL, updated_at TEXT NOT NULL)""")
+    conn.commit()
+    conn.close()
+
+    queue = JobQueue()
+    try:
+        queue.enqueue(make_products(2))
+        queue.mark_container_created("B000000001", "c1", score=5.0)
+        queue.mark_container_created("B000000000", "c0")
+        assert [job['creation_id'] for job in queue.jobs(CONTAINER_CREATED)] == ["c1", "c0"]
+    finally:
+        queue.close()
+
+
+@pytest.mark.parametrize('choice, checked', [("5", False), ("7", False), ("1", True)])
+def test_interactive_mode_checks_links_only_before_posting(graph_api, workdir, monkeypatch, choice, checked):
+    import instagram_poster
+    monkeypatch.setattr(instagram_poster, 'BASE_URL', graph_api.base_url)
+    monkeypatch.setattr('sys.argv', ["instagram_poster.py"])
+    monkeypatch.setattr('builtins.input', lambda prompt="": choice)
+    calls = []
+    monkeypatch.setattr(instagram_poster.InstagramAutoPoster, 'validate_products', lambda self: calls.append(self))
+    monkeypatch.setattr(instagram_poster.InstagramAutoPoster, 'run_auto_posting', lambda self, test_mode: None)
+    write_feed(make_products(3))
+
+    instagram_poster.main()
+    assert bool(calls) == checked
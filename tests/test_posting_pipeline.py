@@ -0,0 +1,39 @@
+from conftest import make_products
+from posting_pipeline import PostingPipeline, TokenBucket
+
+UNLIMITED = 3600 * 1000
+
+
+def test_pipeline_publishes_every_product_once(graph_api, poster):
+    products = make_products(12)
+    PostingPipeline(poster, posts_per_hour=UNLIMITED, max_workers=4).run(products)
+
+    assert len(graph_api.published) == 12
+    assert len(set(graph_api.published)) == 12
+    assert sorted(item['asin'] for item in poster.posted) == sorted(product['asin'] for product in products)
+    assert all(poster.asin_index.contains(product['asin'], poster.channel) for product in products)
+    assert poster.failed == []
+
+
+def test_pipeline_records_failed_containers(graph_api, poster):
+    products = make_products(3)
+    products[1]['image_url'] = ''  # The mock refuses containers without an image
+    PostingPipeline(poster, posts_per_hour=UNLIMITED, max_workers=2).run(products)
+
+    assert len(graph_api.published) == 2
+    assert [item['product'] for item in poster.failed] == ["Product 1"]
+    assert not poster.asin_index.contains(products[1]['asin'], poster.channel)
+
+
+def test_token_bucket_spaces_publishes():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate_per_hour=60, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        bucket.acquire()
+    assert sleeps == [60.0, 60.0]
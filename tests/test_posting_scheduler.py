@@ -0,0 +1,25 @@
+from conftest import make_products
+from posting_scheduler import PostingScheduler, deal_score, discount_score, scraped_hours
+
+
+def test_best_first_moves_the_best_products_to_the_front():
+    products = make_products(30)
+    ranked = PostingScheduler.best_first(products, 5, discount_score)
+
+    by_score = sorted(products, key=discount_score, reverse=True)  # Stable: ties keep the list order
+    assert ranked[:5] == by_score[:5]
+    assert ranked[5:] == [product for product in products if product not in by_score[:5]]
+
+
+def test_best_first_matches_the_scheduler_order():
+    products = make_products(20)
+    scheduler = PostingScheduler(deal_score)
+    scheduler.add(products)
+    assert PostingScheduler.best_first(products, 8)[:8] == scheduler.pop(8)
+
+
+def test_products_without_a_scrape_time_score_the_same_whenever_scored():
+    product = make_products(1)[0]
+    assert scraped_hours(product) == 0
+    assert scraped_hours({**product, 'scraped_at': "2026-01-01 10:00:00"}) > scraped_hours(product)
+    assert deal_score(product) == deal_score(dict(product))
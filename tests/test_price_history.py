@@ -0,0 +1,29 @@
+from price_history import DROP_WINDOW_SECONDS, PriceHistory
+
+DAY = 24 * 3600
+
+
+def product(asin, price, original=1000):
+    return {'asin': asin, 'category': "Electronics", 'price': f"₹{price}", 'original_price': f"₹{original}"}
+
+
+def test_rank_first_ranks_the_candidates_themselves(workdir):
+    now = [1_000_000.0]
+    history = PriceHistory(clock=lambda: now[0])
+    try:
+        # Ten big drops that are already posted, and the candidates still to post
+        posted = [product(f"P{i}", 900) for i in range(10)]
+        candidates = [product("C-discount", 800), product("C-plain", 1000), product("C-drop", 900),
+                      product("C-low", 700)]
+        history.ingest(posted + candidates)
+        now[0] += DAY
+        history.ingest([product("C-low", 650)])
+        now[0] += DROP_WINDOW_SECONDS + DAY  # C-low's drop has left the 7-day window, it stays an all-time low
+        history.ingest([product(f"P{i}", 100) for i in range(10)] + [product("C-drop", 850)])
+
+        assert not set(history.top_deals(10)) & {p['asin'] for p in candidates}
+        ranked = history.rank_first(candidates, k=3)
+        assert [p['asin'] for p in ranked] == ["C-drop", "C-low", "C-discount", "C-plain"]
+        assert [p['asin'] for p in history.rank_first(candidates, k=1)][:2] == ["C-drop", "C-discount"]
+    finally:
+        history.close()
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import product_feed
+from conftest import make_products
+from product_feed import ProductFeed
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1024])
+def test_arrays_parse_across_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(product_feed, 'CHUNK_SIZE', chunk_size)
+    products = make_products(5) + [{'asin': "B000000099", 'name': "Quote \" and ] bracket", 'price': 12}]
+    path = write(tmp_path / "feed.json", "\n  " + json.dumps(products, ensure_ascii=False, indent=2) + "\n")
+
+    assert list(ProductFeed(path)) == products
+
+
+def test_numbers_split_at_a_chunk_boundary_are_not_cut(tmp_path, monkeypatch):
+    monkeypatch.setattr(product_feed, 'CHUNK_SIZE', 4)
+    path = write(tmp_path / "feed.json", '[{"asin": "B1"}, 12345678, {"asin": "B2"}]')
+
+    feed = ProductFeed(path)
+    assert [product['asin'] for product in feed] == ["B1", "B2"]
+    assert feed.invalid == 1  # The whole number, not a fragment of it
+
+
+def test_unterminated_arrays_are_an_error(tmp_path):
+    path = write(tmp_path / "feed.json", '[{"asin": "B1"}, ')
+
+    with pytest.raises(ValueError):
+        list(ProductFeed(path))
+
+
+def test_json_lines_are_detected_by_the_first_character(tmp_path):
+    products = make_products(3)
+    path = write(tmp_path / "feed.jsonl", "\n\n" + "\n".join(json.dumps(product) for product in products) + "\n\n")
+
+    assert list(ProductFeed(path)) == products
+
+
+def test_duplicates_invalid_and_known_asins_are_counted_across_files(tmp_path):
+    products = make_products(4)
+    first = write(tmp_path / "a.json", json.dumps(products[:3] + [{'name': "No ASIN"}, "not a product"]))
+    second = write(tmp_path / "b.jsonl", "\n".join(json.dumps(product) for product in products[1:]))
+
+    feed = ProductFeed([first, second], skip_asin=lambda asin: asin == products[0]['asin'])
+    assert [product['asin'] for product in feed] == [product['asin'] for product in products[1:]]
+    assert (feed.read, feed.invalid, feed.skipped) == (8, 2, 3)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from product_fields import discount_percent, parse_amount, parse_time
+
+
+def test_parse_amount():
+    assert parse_amount("₹1,299") == 1299
+    assert parse_amount("73% off") == 73
+    assert parse_amount("₹499.50") == 499
+    assert parse_amount("") is None
+    assert parse_amount(None) is None
+
+
+def test_discount_percent():
+    assert discount_percent({'discount': "73% off"}) == 73
+    assert discount_percent({'discount': None}) == 0
+    assert discount_percent({}) == 0
+
+
+def test_parse_time():
+    assert parse_time("2026-03-01 09:30:00") == datetime(2026, 3, 1, 9, 30)
+    assert parse_time("yesterday") is None
+    assert parse_time(None) is None
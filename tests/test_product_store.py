@@ -0,0 +1,53 @@
+from conftest import make_products
+from product_store import ProductStore, content_hash
+
+
+def test_content_hash_only_follows_rendered_and_compared_fields():
+    product = make_products(1)[0]
+
+    assert content_hash(product) == content_hash(dict(reversed(list(product.items()))))
+    assert content_hash(product) == content_hash({**product, 'rating': "4.5", 'scraped_at': "2026-01-01 10:00:00"})
+    for field in ('name', 'price', 'discount', 'category', 'image_url'):
+        assert content_hash(product) != content_hash({**product, field: "changed"}), field
+
+
+def test_store_version_moves_only_when_products_change(workdir):
+    store = ProductStore()
+    watcher = ProductStore()  # What another process sees
+    try:
+        version = store.version()
+        store.commit()
+        store.delete([])
+        store.commit()
+        assert watcher.version() == version
+
+        store.upsert("B000000001", "Fitness", "hash", "<div></div>", {'asin': "B000000001"})
+        assert watcher.version() == version  # Not committed yet
+        store.commit()
+        store.commit()
+        assert watcher.version() == version + 1
+
+        store.delete(["B000000001"])
+        store.commit()
+        assert watcher.version() == version + 2
+    finally:
+        store.close()
+        watcher.close()
+    reopened = ProductStore()
+    assert reopened.version() == version + 2  # Persisted with the products
+    reopened.close()
+
+
+def test_upserts_keep_the_original_position(workdir):
+    store = ProductStore()
+    try:
+        for asin in ("B1", "B2", "B3"):
+            store.upsert(asin, "Fitness", "hash", f"<div>{asin}</div>", {'asin': asin})
+        store.upsert("B1", "Electronics", "new", "<div>B1 v2</div>", {'asin': "B1"})
+        store.commit()
+
+        assert [row[0] for row in store.records()] == ["B1", "B2", "B3"]
+        assert list(store.records(fragments=False))[0] == ("B1", "Electronics", 1, "new", None)
+        assert store.fragments("Fitness") == ["<div>B3</div>", "<div>B2</div>"]
+    finally:
+        store.close()
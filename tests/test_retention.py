@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from conftest import make_products
+from generate_html import WebsiteUpdater
+from product_fields import TIME_FORMAT
+from retention import DealArchive, RetentionPolicy
+
+NOW = datetime(2026, 3, 31, 12, 0, 0)
+SHORT = {'ttl_days': 5, 'max_items': 2}
+LONG = {'ttl_days': 100, 'max_items': 100}
+
+
+def days_ago(days):
+    return (NOW - timedelta(days=days)).strftime(TIME_FORMAT)
+
+
+def write_feed(products):
+    with open("insta_ready.json", 'w', encoding='utf-8') as f:
+        json.dump(products, f)
+
+
+def run(products, archive=None):
+    write_feed(products)
+    updater = WebsiteUpdater(render_mode="template")
+    updater.retention = RetentionPolicy({"Home & Decor": SHORT}, default=LONG, now=NOW)
+    updater.archive = archive
+    assert updater.update_html()
+    return updater.changes
+
+
+def read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_the_cap_evicts_the_oldest_deals_after_expired_ones_are_flagged():
+    policy = RetentionPolicy({"Fitness": SHORT}, default=LONG, now=NOW)
+    deals = [("new", days_ago(1)), ("stale", days_ago(6)), ("over-cap", days_ago(2)), ("unknown", None)]
+
+    assert policy.select("Fitness", deals) == [("stale", 'expired'), ("over-cap", 'max_items'), ("unknown", 'max_items')]
+    assert policy.select("Electronics", deals) == []  # Default policy
+    assert not policy.is_expired("Fitness", "not a time")
+
+
+def test_expiry_uses_the_category_the_product_is_listed_under(workdir):
+    product = {**make_products(1)[0], 'category': "Kitchen", 'scraped_at': days_ago(10)}
+
+    # "Kitchen" is listed under Home & Decor, whose TTL is 5 days (not the default 100)
+    changes = run([product])
+    assert changes['added'] == []
+    assert "Product 0" not in (workdir / "index.html").read_text(encoding='utf-8')
+
+
+def test_evicted_deals_are_archived_by_month_and_stay_retired(workdir):
+    products = [{**product, 'category': "Home & Decor", 'scraped_at': days_ago(3 - i)}
+                for i, product in enumerate(make_products(3))]
+    archive_dir = workdir / "archive"
+
+    changes = run(products, DealArchive(str(archive_dir)))
+    assert changes['evicted'] == [products[0]['asin']]  # Oldest beyond the cap of 2
+    changes = run(products, DealArchive(str(archive_dir)))
+    assert changes['added'] == changes['evicted'] == []  # Not listed again
+
+    month = datetime.now().strftime('%Y-%m')
+    assert [path.name for path in archive_dir.iterdir()] == [f"deals-{month}.jsonl.gz"]
+    [entry] = read_archive(archive_dir / f"deals-{month}.jsonl.gz")
+    assert (entry['reason'], entry['category']) == ('max_items', "Home & Decor")
+    assert entry['product'] == products[0]
+
+
+def test_archive_files_are_appended_to(tmp_path):
+    archive = DealArchive(str(tmp_path))
+    archive.add({'asin': "B1"}, "Fitness", 'expired', evicted_at=datetime(2026, 1, 31))
+    archive.add({'asin': "B2"}, "Fitness", 'expired', evicted_at=datetime(2026, 2, 1))
+    written = archive.flush()
+    assert [os.path.basename(path) for path in written] == ["deals-2026-01.jsonl.gz", "deals-2026-02.jsonl.gz"]
+    archive.add({'asin': "B3"}, "Fitness", 'max_items', evicted_at=datetime(2026, 1, 1))
+    archive.flush()
+
+    entries = read_archive(tmp_path / "deals-2026-01.jsonl.gz")
+    assert [(entry['product']['asin'], entry['reason']) for entry in entries] == [("B1", 'expired'),
+                                                                                  ("B3", 'max_items')]
+    assert archive.flush() == []
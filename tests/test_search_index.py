@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from benchmark import synthetic_products
+from conftest import make_products
+from product_fields import CATEGORIES
+from product_store import ProductStore, content_hash
+from search_index import DISCOUNT_BUCKETS, PRICE_BUCKETS, SearchIndexBuilder
+
+
+@pytest.fixture
+def store(workdir):
+    store = ProductStore()
+    yield store
+    store.close()
+
+
+def add(store, products):
+    for product in products:
+        store.upsert(product['asin'], product['category'], content_hash(product), "", product)
+    store.commit()
+
+
+def update(store):
+    version, written = SearchIndexBuilder(store, CATEGORIES).update()
+    return version, sorted(os.path.basename(path) for path in written)
+
+
+def read(name):
+    with open(f"search/{name}", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_price_and_discount_buckets_are_cumulative(store):
+    builder = SearchIndexBuilder(store, CATEGORIES)
+    doc = builder.doc({'name': "Mini sealer", 'price': "₹500", 'discount': "70%"}, "Fitness")
+    facets = {token for token in builder.tokens(doc) if ':' in token}
+
+    # Every "under ₹X" bound the price fits, every "X% off or more" bound the discount reaches
+    assert facets == {"c:2", "p:500", "p:1000", "p:2000", "p:5000", "p:10000", "p:20000",
+                      "d:10", "d:20", "d:30", "d:40", "d:50", "d:60", "d:70"}
+    no_price = builder.doc({'name': "Unknown", 'price': "N/A", 'original_price': "₹900"}, "Fitness")
+    assert no_price[2:4] == [0, 0] and {t for t in builder.tokens(no_price) if ':' in t} == {"c:2"}
+    derived = builder.doc({'name': "Derived", 'price': "₹300", 'original_price': "₹1,200"}, "Fitness")
+    assert derived[3] == 75
+
+
+def test_the_bucket_a_query_picks_holds_every_exact_match(store):
+    products = synthetic_products(300)
+    add(store, products)
+    update(store)
+    postings = read("terms-_.json")
+    docs = {int(seq): doc for seq, doc in read("docs-0.json").items()}
+
+    # Bucket choice of the search script: smallest price bound >= the limit, largest discount bound <= the minimum
+    for max_price in (100, 250, 300, 999, 1000, 4500, 19999):
+        bound = min(b for b in PRICE_BUCKETS if b >= max_price)
+        bucket = set(postings.get(f"p:{bound}", []))
+        assert {seq for seq, doc in docs.items() if doc[2] <= max_price} <= bucket
+        assert bucket == {seq for seq, doc in docs.items() if doc[2] <= bound}
+    for min_off in (10, 15, 55, 80, 95):
+        bound = max(b for b in DISCOUNT_BUCKETS if b <= min_off)
+        bucket = set(postings.get(f"d:{bound}", []))
+        assert {seq for seq, doc in docs.items() if doc[3] >= min_off} <= bucket
+        assert bucket == {seq for seq, doc in docs.items() if doc[3] >= bound}
+    # Only the loosest buckets hold everything in this catalog (10-80% off, under ₹20,000)
+    assert [token for token, seqs in postings.items() if len(seqs) == len(products)] == ["d:10", "p:20000"]
+
+
+def test_updates_only_rewrite_the_shards_that_changed(store, workdir):
+    products = [{**product, 'name': name} for product, name in zip(make_products(3),
+                                                                   ("Steel bottle", "Yoga mat", "Desk lamp"))]
+    add(store, products)
+    version, written = update(store)
+    assert written == ["docs-0.json", "meta.json", "search.js", "terms-_.json", "terms-b.json", "terms-d.json",
+                       "terms-l.json", "terms-m.json", "terms-s.json", "terms-y.json"]
+    assert update(store) == (version, [])  # Nothing changed
+
+    store.upsert(products[1]['asin'], products[1]['category'], "changed", "", {**products[1], 'name': "Yoga kettle"})
+    store.delete([products[2]['asin']])
+    store.commit()
+    _, written = update(store)
+    # terms-y.json is re-checked but still holds the same postings
+    assert written == ["docs-0.json", "meta.json", "terms-_.json", "terms-k.json"]
+    assert read("terms-k.json") == {"kettle": [2]} and read("terms-y.json") == {"yoga": [2]}
+    assert not any((workdir / "search" / f"terms-{shard}.json").exists() for shard in "dlm")
+    assert set(read("docs-0.json")) == {"1", "2"}
+    assert all(3 not in seqs for seqs in read("terms-_.json").values())
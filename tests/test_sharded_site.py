@@ -0,0 +1,70 @@
+import pytest
+
+from conftest import make_products
+from product_fields import CATEGORIES
+from product_store import ProductStore, content_hash
+from sharded_site import ShardedSiteBuilder, category_slug
+from template_renderer import TemplateRenderer
+
+
+@pytest.fixture
+def store(workdir):
+    store = ProductStore()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """(category, page) of every page rendered, written or not"""
+    pages = []
+    render_page = ShardedSiteBuilder.render_page
+
+    def spy(self, category, page, page_count):
+        pages.append((category, page))
+        return render_page(self, category, page, page_count)
+
+    monkeypatch.setattr(ShardedSiteBuilder, 'render_page', spy)
+    return pages
+
+
+def add(store, products):
+    renderer = TemplateRenderer(list(CATEGORIES))
+    for product in products:
+        store.upsert(product['asin'], product['category'], content_hash(product),
+                     renderer.render_product(product), product)
+    store.commit()
+
+
+def new_fitness_products(start, count):
+    return [{**product, 'asin': f"N{start + i:09d}", 'category': "Fitness"}
+            for i, product in enumerate(make_products(count))]
+
+
+def build(store):
+    written = ShardedSiteBuilder(store, TemplateRenderer(list(CATEGORIES)), page_size=2).build("today")
+    store.commit()
+    return sorted(written)
+
+
+def page(category, number):
+    return f"deals/{category_slug(category)}/page-{number}.html"
+
+
+def test_appending_to_one_category_leaves_the_other_categories_alone(store, rendered):
+    add(store, make_products(12))  # 4 per category: two full pages each
+    assert len(build(store)) == 3 * 2 + 1
+
+    rendered.clear()
+    add(store, new_fitness_products(0, 1))
+    # The new page plus the previous last page, whose "newer" link appears
+    assert build(store) == sorted([page("Fitness", 2), page("Fitness", 3), "index.html"])
+    # Other categories only re-check their last page, which matches its recorded hash
+    assert rendered == [("Electronics", 2), ("Home & Decor", 2), ("Fitness", 2), ("Fitness", 3)]
+
+    rendered.clear()
+    add(store, new_fitness_products(1, 1))
+    assert build(store) == sorted([page("Fitness", 3), "index.html"])
+    assert rendered == [("Electronics", 2), ("Home & Decor", 2), ("Fitness", 3)]
+
+    assert build(store) == ["index.html"]  # Nothing changed
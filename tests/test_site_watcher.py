@@ -0,0 +1,86 @@
+import json
+
+from git_publisher import GitError
+from job_queue import JobQueue
+from product_store import ProductStore
+from site_watcher import SiteWatcher
+
+
+class FakeUpdater:
+    """The parts of WebsiteUpdater the watcher uses; records the clock time of each update"""
+
+    def __init__(self, now):
+        self.now = now
+        self.html_file = "index.html"
+        self.json_file = "insta_ready.json"
+        self.extra_json_files = []
+        self.store_file = "pandaloon.db"
+        self.updates = []
+
+    def update_html(self):
+        self.updates.append(self.now[0])
+        return True
+
+
+def store_product(asin):
+    store = ProductStore()
+    store.upsert(asin, "Fitness", "hash", "<div></div>", {'asin': asin})
+    store.commit()
+    store.close()
+
+
+def watch(workdir, events, max_updates, debounce=2, max_delay=30, on_update=None):
+    """Run the watcher on a fake clock; events maps clock times to actions run at that time"""
+    now = [0]
+    (workdir / "insta_ready.json").write_text("[]", encoding='utf-8')
+    ProductStore().close()
+    updater = FakeUpdater(now)
+
+    def sleep(seconds):
+        now[0] += seconds
+        if now[0] in events:
+            events[now[0]]()
+
+    SiteWatcher(updater, interval=1, debounce=debounce, max_delay=max_delay, on_update=on_update,
+                clock=lambda: now[0], sleep=sleep).run(max_updates=max_updates)
+    return updater.updates
+
+
+def test_product_commits_are_debounced_into_one_rebuild(workdir):
+    queue = JobQueue()
+    events = {
+        2: lambda: queue.enqueue([{'asin': "B000000001"}]),  # Other tables do not count
+        4: lambda: store_product("B000000001"),
+        5: lambda: store_product("B000000002"),
+    }
+    try:
+        assert watch(workdir, events, max_updates=1) == [0, 7]
+    finally:
+        queue.close()
+
+
+def test_feed_changes_trigger_a_rebuild(workdir):
+    def write_feed():
+        with open("insta_ready.json", 'w', encoding='utf-8') as f:
+            json.dump([{'asin': "B000000001"}], f)
+
+    assert watch(workdir, {3: write_feed}, max_updates=1) == [0, 5]
+
+
+def test_continuous_changes_rebuild_after_max_delay(workdir):
+    events = {t: (lambda t=t: store_product(f"B{t:09d}")) for t in range(2, 40)}
+    assert watch(workdir, events, max_updates=1, max_delay=10) == [0, 12]
+
+
+def test_a_failing_publish_does_not_stop_watching(workdir, capsys):
+    publishes = []
+
+    def publish():
+        publishes.append(len(publishes))
+        raise GitError("git push --quiet origin HEAD:main failed: could not resolve host")
+
+    events = {3: lambda: store_product("B000000001"), 10: lambda: store_product("B000000002")}
+    assert watch(workdir, events, max_updates=2, on_update=publish) == [0, 5, 12]
+    assert publishes == [0, 1, 2]
+    assert "Post-update step failed: GitError" in capsys.readouterr().out
+
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from static_build import MANIFEST_FILE, StaticBuild, hashed_name
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        /* Site styles */
+        body { color: red; }
+    </style>
+</head>
+<body>
+    <img src="Pandaloon_logo.png" alt="logo">
+    <a href="deals/fitness/page-1.html">Fitness</a>
+</body>
+</html>
+"""
+
+
+@pytest.fixture
+def site(workdir):
+    (workdir / "index.html").write_text(PAGE, encoding='utf-8')
+    (workdir / "Pandaloon_logo.png").write_bytes(b"logo v1")
+    (workdir / "deals" / "fitness").mkdir(parents=True)
+    (workdir / "deals" / "fitness" / "page-1.html").write_text(PAGE.replace("Fitness", "Page 1"), encoding='utf-8')
+    return workdir
+
+
+def build():
+    return sorted(os.path.relpath(path, "dist") for path in StaticBuild('.', "dist").run())
+
+
+def outputs(site):
+    return sorted(str(path.relative_to(site / "dist")) for path in (site / "dist").rglob('*') if path.is_file())
+
+
+def test_a_second_build_writes_nothing(site):
+    written = build()
+    assert "index.html" in written and "deals/fitness/page-1.html" in written
+    assert hashed_name("Pandaloon_logo.png", b"logo v1") in written
+    index = (site / "dist" / "index.html").read_text(encoding='utf-8')
+    assert "<style>" not in index and 'href="css/site.' in index
+    before = {name: os.stat(site / "dist" / name).st_mtime_ns for name in outputs(site) if name != MANIFEST_FILE}
+
+    assert build() == []
+    assert {name: os.stat(site / "dist" / name).st_mtime_ns for name in before} == before
+
+
+def test_stale_outputs_are_removed_with_their_compressed_siblings(site):
+    build()
+    (site / "dist" / "deals" / "fitness" / "page-1.html.br").write_bytes(b"br")  # As if brotli was installed
+    (site / "deals" / "fitness" / "page-1.html").unlink()
+    old_logo = [name for name in outputs(site) if name.startswith("Pandaloon_logo.")]
+    (site / "Pandaloon_logo.png").write_bytes(b"logo v2")
+
+    written = build()
+    assert not any(name.startswith("deals/") for name in outputs(site))
+    assert not set(old_logo) & set(outputs(site))  # Replaced by the new fingerprint
+    new_logo = [name for name in written if name.startswith("Pandaloon_logo.")]
+    assert len(new_logo) == 1 and new_logo[0] in (site / "dist" / "index.html").read_text(encoding='utf-8')
+    assert "index.html.gz" in outputs(site)